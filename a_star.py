@@ -0,0 +1,156 @@
+import heapq
+from itertools import count
+
+from constants import DIRECTIONS, IMPASSABLE
+from search_events import EXPAND, GOAL, PUSH, SearchEvent, run
+from solve_worker import PROGRESS_INTERVAL
+
+
+class AStar:
+    """
+    A* search over a cost array indexed like a Grid (i * width + j).
+
+    The best known cost (g) of every reached cell is kept and a cell is only
+    pushed again when a strictly cheaper path to it is found. Heap entries made
+    obsolete by a cheaper push are skipped when popped (lazy deletion). Ties on
+    f are broken towards the higher g and then by push order, so the expansion
+    order only depends on the map and the direction priority.
+
+    After a search ``g``, ``parent`` and ``closed`` describe the explored part of
+    the map, ``pushes``, ``pops`` and ``stale_pops`` count heap operations and
+    ``peak_open`` is the largest size the heap reached.
+    """
+
+    def __init__(self, costs, width, height, directions=DIRECTIONS):
+        self.costs = costs
+        self.width = width
+        self.height = height
+        self.directions = directions
+        self.reset()
+
+    def reset(self):
+        self.g = {}
+        self.parent = {}
+        self.closed = set()
+        self.open = []
+        self.pushes = 0
+        self.pops = 0
+        self.stale_pops = 0
+        self.peak_open = 0
+
+    def manhattan_heuristic(self, end):
+        end_i, end_j = end
+        width = self.width
+        def heuristic(index):
+            i, j = divmod(index, width)
+            return abs(i - end_i) + abs(j - end_j)
+        return heuristic
+
+    def search(self, start, end, heuristic=None, progress=None, stats=None):
+        """
+        Find the cheapest path between two cells.
+
+        :param start: (i, j) position where the search starts
+        :param end: (i, j) position of the target
+        :param heuristic: Function(index) -> estimated cost to the target,
+            Manhattan distance when omitted
+        :param progress: Function(pops) called every PROGRESS_INTERVAL pops,
+            it may raise to abandon the search
+        :param stats: SearchStats that receives the counters of the search
+        :return: Cost of the cheapest path, -1 if the target can't be reached
+        """
+        return run(self.search_steps(start, end, heuristic, progress, stats, events=False))
+
+    def search_steps(self, start, end, heuristic=None, progress=None, stats=None, events=True):
+        """
+        A* search as a stream of events, like search_events.bfs_events.
+
+        A cell is pushed again every time a cheaper path to it is found, heap
+        entries made obsolete that way are skipped without an event. The
+        counters are recorded when the generator ends or is closed.
+
+        :param events: Yield a SearchEvent at every step, when False the
+            search runs to its end at the first next()
+        :return: Generator of SearchEvent, its return value is the cost
+            returned by search
+        """
+        self.reset()
+        if heuristic is None:
+            heuristic = self.manhattan_heuristic(end)
+        costs, width, height = self.costs, self.width, self.height
+        g, parent, closed, open_heap = self.g, self.parent, self.closed, self.open
+        heappush, heappop = heapq.heappush, heapq.heappop
+        sequence = count()
+        trace = stats.node_trace() if stats is not None else None
+
+        if not (0 <= start[0] < height and 0 <= start[1] < width and 0 <= end[0] < height and 0 <= end[1] < width):
+            return -1
+        start_index = start[0] * width + start[1]
+        end_index = end[0] * width + end[1]
+        g[start_index] = 0
+        heappush(open_heap, (heuristic(start_index), 0, next(sequence), start_index))
+        pushes, pops, stale_pops, peak_open = 1, 0, 0, 1
+
+        try:
+            if events:
+                yield SearchEvent(PUSH, start, 0, None)
+            while open_heap:
+                if len(open_heap) > peak_open:
+                    peak_open = len(open_heap)
+                _, neg_cost, _, index = heappop(open_heap)
+                pops += 1
+                if progress is not None and not pops % PROGRESS_INTERVAL:
+                    progress(pops)
+                cost = -neg_cost
+                if index in closed or cost != g[index]:
+                    stale_pops += 1
+                    continue
+                closed.add(index)
+                if trace is not None:
+                    trace("expand %d,%d g=%d open=%d", *divmod(index, width), cost, len(open_heap))
+                i, j = position = divmod(index, width)
+                if index == end_index:
+                    if events:
+                        yield SearchEvent(GOAL, position, cost, divmod(parent[index], width) if index in parent else None)
+                    return cost
+                if events:
+                    yield SearchEvent(EXPAND, position, cost, divmod(parent[index], width) if index in parent else None)
+
+                for di, dj in self.directions:
+                    x, y = i + di, j + dj
+                    if not (0 <= x < height and 0 <= y < width):
+                        continue
+                    neighbour = x * width + y
+                    step = costs[neighbour]
+                    if step >= IMPASSABLE or neighbour in closed:
+                        continue
+                    new_cost = cost + step
+                    if new_cost < g.get(neighbour, new_cost + 1):
+                        g[neighbour] = new_cost
+                        parent[neighbour] = index
+                        heappush(open_heap, (new_cost + heuristic(neighbour), -new_cost, next(sequence), neighbour))
+                        pushes += 1
+                        if events:
+                            yield SearchEvent(PUSH, (x, y), new_cost, position)
+            return -1
+        finally:
+            self.pushes, self.pops, self.stale_pops, self.peak_open = pushes, pops, stale_pops, peak_open
+            if stats is not None:
+                stats.record(len(closed), pushes, pops, stale_pops, peak_open)
+
+    def path(self, end):
+        """
+        Cells of the path found by the last search, from start to end.
+
+        :param end: (i, j) position of the target
+        :return: List of (i, j) positions, empty if the target wasn't reached
+        """
+        index = end[0] * self.width + end[1]
+        if index not in self.closed:
+            return []
+        path = [index]
+        while index in self.parent:
+            index = self.parent[index]
+            path.append(index)
+        path.reverse()
+        return [divmod(index, self.width) for index in path]
@@ -0,0 +1,154 @@
+from operator import add
+
+INFINITY = float("inf")
+
+
+def best_routes(agent, objectives, cost, start, terminal=None):
+    """
+    Cheapest route of one agent for every subset of objectives (Held-Karp).
+
+    :param agent: Name of the agent, passed through to cost
+    :param objectives: List of objective letters the agent may visit
+    :param cost: Function(agent, from letter, to letter) -> cost, -1 if unreachable
+    :param start: Letter where the agent starts
+    :param terminal: Letter where the agent must finish, None to stop anywhere
+    :return: Tuple (costs, orders) where costs[mask] is the cheapest route
+        visiting exactly the objectives in mask (INFINITY if impossible) and
+        orders(mask) gives the objective indexes of that route in visit order
+    """
+    def leg(source, target):
+        value = cost(agent, source, target)
+        return INFINITY if value == -1 else value
+
+    m = len(objectives)
+    size = 1 << m
+    from_start = [leg(start, objective) for objective in objectives]
+    between = [[leg(source, target) for target in objectives] for source in objectives]
+    to_end = [leg(objective, terminal) if terminal else 0 for objective in objectives]
+
+    # dp[mask][last]: cheapest walk from start through mask, ending at objective last
+    dp = [[INFINITY] * m for _ in range(size)]
+    back = [[-1] * m for _ in range(size)]
+    for k in range(m):
+        dp[1 << k][k] = from_start[k]
+    for mask in range(1, size):
+        row = dp[mask]
+        # Rows of the masks one objective larger, fetched once for every last
+        following = [(k, dp[mask | 1 << k], back[mask | 1 << k]) for k in range(m) if not mask >> k & 1]
+        for last in range(m):
+            walked = row[last]
+            if walked == INFINITY:
+                continue
+            distances = between[last]
+            for k, target, parents in following:
+                new_cost = walked + distances[k]
+                if new_cost < target[k]:
+                    target[k] = new_cost
+                    parents[k] = last
+
+    costs = [INFINITY] * size
+    ends = [-1] * size
+    costs[0] = leg(start, terminal) if terminal else 0
+    for mask in range(1, size):
+        totals = list(map(add, dp[mask], to_end))
+        costs[mask] = min(totals)
+        ends[mask] = totals.index(costs[mask])
+
+    def orders(mask):
+        order = []
+        last = ends[mask]
+        while mask:
+            order.append(last)
+            mask, last = mask ^ (1 << last), back[mask][last]
+        order.reverse()
+        return order
+
+    return costs, orders
+
+
+def subset_minimum(values, m):
+    """
+    :param values: List indexed by the masks of m objectives
+    :return: List where entry mask is the smallest value of any subset of mask
+    """
+    lowest = list(values)
+    for k in range(m):
+        bit = 1 << k
+        for mask in range(len(lowest)):
+            if mask & bit and lowest[mask ^ bit] < lowest[mask]:
+                lowest[mask] = lowest[mask ^ bit]
+    return lowest
+
+
+def best_assignment(agents, objectives, cost, start="I", terminal="P"):
+    """
+    Split the objectives between the agents and order each agent's visits.
+
+    Every objective is visited by exactly one agent, every agent goes from
+    start to terminal, and the sum of the agents' route costs is minimised.
+    Agents are added one at a time: for every mask, agent k takes a subset of
+    it and agents 0..k-1 cover the rest. The rest costs at least the cheapest
+    entry of agents 0..k-1 over the subsets of the mask, so a subset is
+    skipped without looking at the rest as soon as the agent's own route plus
+    that lower bound costs as much as the best split found so far.
+
+    The routes cost O(2^m * m^2) per agent and every split O(3^m) for m
+    objectives. With 12 objectives that is about 0.1 s for two agents and
+    0.25 to 0.35 s for four on CPython, two thirds of it in best_routes, so
+    each objective past proyecto's handful roughly triples the time.
+
+    :param agents: List of agent names, passed through to cost
+    :param objectives: List of objective letters that must be visited
+    :param cost: Function(agent, from letter, to letter) -> cost, -1 if unreachable
+    :param start: Letter where every agent starts
+    :param terminal: Letter where every agent must finish, None to stop anywhere
+    :return: Tuple (routes, total) where routes holds one (route letters, cost)
+        pair per agent, or (None, -1) if no assignment reaches everything
+    """
+    n = len(agents)
+    size = 1 << len(objectives)
+    full = size - 1
+    routes = [best_routes(agent, objectives, cost, start, terminal) for agent in agents]
+
+    combined = routes[0][0]
+    picks = [None]
+    for k in range(1, n):
+        own_costs = routes[k][0]
+        lowest = subset_minimum(combined, len(objectives))
+        new_combined = [INFINITY] * size
+        pick = [0] * size
+        # The last agent only has to complete the full set
+        for mask in ([full] if k == n - 1 else range(size)):
+            # Agent k visiting nothing, then every non-empty subset it may take
+            best_cost, best_subset = own_costs[0] + combined[mask], 0
+            limit = best_cost - lowest[mask]
+            subset = mask
+            while subset:
+                if own_costs[subset] < limit:
+                    total = own_costs[subset] + combined[mask ^ subset]
+                    if total < best_cost:
+                        best_cost, best_subset = total, subset
+                        limit = best_cost - lowest[mask]
+                subset = (subset - 1) & mask
+            new_combined[mask] = best_cost
+            pick[mask] = best_subset
+        combined = new_combined
+        picks.append(pick)
+
+    total = combined[full]
+    if total == INFINITY:
+        return None, -1
+
+    subsets = [0] * n
+    mask = full
+    for k in range(n - 1, 0, -1):
+        subsets[k] = picks[k][mask]
+        mask ^= subsets[k]
+    subsets[0] = mask
+
+    assignment = []
+    for k, subset in enumerate(subsets):
+        costs, orders = routes[k]
+        letters = start + "".join(objectives[index] for index in orders(subset)) + (terminal or "")
+        assignment.append((letters, costs[subset]))
+    return tuple(assignment), total
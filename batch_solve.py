@@ -0,0 +1,157 @@
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from constants import CHARACTERS, DIRECTION_OF_LETTER
+from cost_matrix import CostMatrixCache
+from reachability import ReachabilityIndex
+from search_stats import SUMMARY, SearchStats, TRACE_LEVELS, TraceSink
+from solvers import SOLVERS, heuristic_arguments
+from tiled_map import MEMORY_BUDGET, TiledMap, is_tiled_map
+from tree_export import write_tree_dot, write_tree_jsonl
+from tree_node import TreeNode, attach_search_tree
+from utils import read_map_from_file
+
+
+def parse_position(text):
+    try:
+        i, j = (int(value) for value in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected a position like 3,4, got {text!r}")
+    return i, j
+
+
+def parse_directions(text):
+    letters = text.upper()
+    if sorted(letters) != sorted(DIRECTION_OF_LETTER):
+        raise argparse.ArgumentTypeError(f"Expected an order of the letters U, R, D and L, got {text!r}")
+    return [DIRECTION_OF_LETTER[letter] for letter in letters]
+
+
+def solve_map(job):
+    """
+    Load one map and run one search on it, in a worker process.
+
+    :param job: Tuple (filename, character, algorithm, directions, start, target,
+        trees, trace, memory_budget), trees is the directory the search tree is
+        exported to, or None, trace a TraceSink.from_spec string, or None, and
+        memory_budget the bytes of tiles a tiled map keeps in memory
+    :return: Dictionary with the result, written as one JSON line
+    """
+    filename, character, algorithm, directions, start, target, trees, trace, memory_budget = job
+    result = {"map": filename, "character": character, "algorithm": algorithm}
+    stats = SearchStats(TraceSink.from_spec(trace, lambda line: print(f"{filename}: {line}", file=sys.stderr)))
+    try:
+        with stats.phase("load"):
+            if is_tiled_map(filename):
+                # Tiles are only read when the search reaches them
+                grid = TiledMap(filename, memory_budget, {character: CHARACTERS[character]})
+            else:
+                grid = read_map_from_file(filename)
+    except (OSError, ValueError) as error:
+        result["error"] = str(error)
+        return result
+    if not (grid.is_valid_cell(*start) and grid.is_valid_cell(*target)):
+        result["error"] = f"start {start} or target {target} is outside the {grid.height}x{grid.width} map"
+        return result
+
+    reachable = True
+    with stats.phase("costs"):
+        if isinstance(grid, TiledMap):
+            costs = grid.costs(character)
+        else:
+            cost_matrices = CostMatrixCache(grid, {character: CHARACTERS[character]})
+            costs = cost_matrices.get(character)
+    if not isinstance(grid, TiledMap):
+        # One pass over the terrain, much cheaper than a search flooding the
+        # component of the start. Tiled maps would have to be read whole
+        with stats.phase("reachability"):
+            reachable = ReachabilityIndex(grid, cost_matrices).reachable(character, start, target)
+    arguments = (costs, grid.width, grid.height, start, target, directions)
+    started = time.perf_counter()
+    if reachable:
+        with stats.phase("search"):
+            heuristics = heuristic_arguments(algorithm, character, grid.width, start, target)
+            cost, path, expanded, (parent, g) = SOLVERS[algorithm](*arguments, stats=stats, **heuristics)
+    else:
+        cost, path, expanded, (parent, g) = -1, [], 0, ({}, {})
+    result.update(cost=cost, path=path, expanded=expanded, time=time.perf_counter() - started)
+    if isinstance(grid, TiledMap):
+        result["tile_cache"] = grid.cache_stats()
+        grid.close()
+    if trees is not None:
+        with stats.phase("export"):
+            result.update(export_tree(filename, trees, start, target if cost != -1 else None, parent, g, grid.width))
+    stats.emit(SUMMARY, "%s %s: cost %d, %s", algorithm, character, cost, stats.summary())
+    result["stats"] = stats.as_dict()
+    return result
+
+
+def export_tree(filename, trees, start, target, parent, g, width):
+    """
+    Write the search tree of one map next to the others, as JSONL and DOT.
+
+    :param target: (i, j) position marked as the end of the path, None if it wasn't reached
+    :return: Dictionary with the paths of the two files
+    """
+    root = TreeNode((start[0], start[1], 'I'))
+    root.other = "Initial Point"
+    nodes = attach_search_tree(root, parent, g, width)
+    if target is not None and target != start:
+        nodes[target[0] * width + target[1]].other = "Closed Path"
+    base = os.path.join(trees, os.path.splitext(os.path.basename(filename))[0])
+    write_tree_jsonl(root, base + ".jsonl")
+    write_tree_dot(root, base + ".dot")
+    return {"tree_jsonl": base + ".jsonl", "tree_dot": base + ".dot"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve many maps without the GUI, one JSON line per map.")
+    parser.add_argument("maps", nargs="+",
+                        help="Map files, in the map_data*.txt text format, the binary format of map_format.py "
+                             "or the tiled format of tiled_map.py")
+    parser.add_argument("--character", choices=list(CHARACTERS), default="Human")
+    parser.add_argument("--algorithm", choices=list(SOLVERS), default="A*")
+    parser.add_argument("--directions", type=parse_directions, default="RDLU",
+                        help="Direction priority as four letters, for example RDLU")
+    parser.add_argument("--start", type=parse_position, required=True, help="Start cell as i,j")
+    parser.add_argument("--target", type=parse_position, required=True, help="Target cell as i,j")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes, one per CPU by default")
+    parser.add_argument("--output", default="-", help="File to write the results to, stdout by default")
+    parser.add_argument("--trees", default=None,
+                        help="Directory to export every search tree to, as <map>.jsonl and <map>.dot")
+    parser.add_argument("--trace", default=None,
+                        help=f"Trace the searches to stderr: a level among {', '.join(TRACE_LEVELS)}, "
+                             f"optionally followed by /N to keep one expanded cell in N, for example node/100")
+    parser.add_argument("--memory-budget", type=int, default=MEMORY_BUDGET // (1024 * 1024),
+                        help="Megabytes of decoded tiles every worker keeps in memory for tiled maps")
+    args = parser.parse_args(argv)
+
+    if args.trace is not None:
+        # Fail before starting the workers if the spec is wrong
+        try:
+            TraceSink.from_spec(args.trace)
+        except ValueError as error:
+            parser.error(str(error))
+    if args.trees is not None:
+        os.makedirs(args.trees, exist_ok=True)
+    jobs = [(filename, args.character, args.algorithm, args.directions, args.start, args.target, args.trees, args.trace,
+             args.memory_budget * 1024 * 1024)
+            for filename in args.maps]
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        with Pool(args.workers) as pool:
+            # Results come back in input order as soon as each one is ready
+            for result in pool.imap(solve_map, jobs, chunksize=max(1, len(jobs) // 256)):
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
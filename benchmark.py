@@ -0,0 +1,284 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+from assignment import best_assignment
+from constants import CELL_STATES, CHARACTERS, DIRECTIONS, OBJECTIVES, TERRAINS
+from cost_matrix import CostMatrixCache
+from grid import Grid
+from heuristics import ScaledManhattan
+from hpa_star import HierarchicalMap
+from lpa_star import LPAStar
+from reachability import ReachabilityIndex
+from route_matrix import RouteMatrix
+from search_stats import SearchStats
+from solvers import SOLVERS, heuristic_arguments
+from utils import read_map_from_file
+
+SIZES = (15, 64, 256, 1024, 2048)
+# Share of every terrain in generated maps, mostly passable for everyone
+TERRAIN_WEIGHTS = {"Land": 40, "Forest": 20, "Water": 15, "Sand": 15, "Mountain": 10}
+MULTI_OBJECTIVE = "Multi-objective"
+# The engines of map_app that aren't in SOLVERS, under the names of its chooser
+INCREMENTAL, HIERARCHICAL = "Incremental A*", "Hierarchical A*"
+ALGORITHMS = list(SOLVERS) + [INCREMENTAL, HIERARCHICAL, MULTI_OBJECTIVE]
+# Largest map side the deepening searches are run on, they redo the work of
+# every shallower bound and take minutes past these sizes
+MAX_SIDE = {"Iterative Deepening DFS": 64, "IDA*": 256}
+# Random cells tried for one position before giving up, see objective_positions
+MAX_DRAWS = 10000
+
+
+def generate_map(size, seed):
+    """
+    Random square map with the terrain shares of TERRAIN_WEIGHTS.
+
+    :param size: Number of rows and columns
+    :param seed: Seed of the generator, the same seed gives the same map
+    :return: Grid
+    """
+    rng = random.Random(seed)
+    values = [TERRAINS[name]["value"].encode("ascii") for name in TERRAIN_WEIGHTS]
+    weights = list(TERRAIN_WEIGHTS.values())
+    return Grid(size, size, b"".join(rng.choices(values, weights, k=size * size)))
+
+
+def largest_component(components):
+    """
+    :param components: Components of a character, see ReachabilityIndex.get
+    :return: Id of the component with the most cells, -1 if no cell is passable
+    """
+    sizes = {}
+    for run, cells in Counter(components.labels).items():
+        if run >= 0:
+            root = components.find(run)
+            sizes[root] = sizes.get(root, 0) + cells
+    return max(sizes, key=sizes.get) if sizes else -1
+
+
+def partner_of(character):
+    """
+    :return: Second agent of the multi-objective cases of a character, the
+        character after it in CHARACTERS
+    """
+    names = list(CHARACTERS)
+    return names[(names.index(character) + 1) % len(names)]
+
+
+def objective_positions(grid, components, seed, partner=None):
+    """
+    Random cells for the start, the target of the single searches and every
+    objective, all in the largest component of a character so every case
+    has a path to measure.
+
+    :param components: Components of the character, see ReachabilityIndex.get
+    :param partner: Components of a second character, the cells are then in
+        its largest component too so both agents can reach every objective
+    :return: Dictionary {objective letter: (i, j) position}, None if the
+        character can't enter any cell or no cell was found in both largest
+        components after MAX_DRAWS tries
+    """
+    wanted = [(components, largest_component(components))]
+    if partner is not None:
+        wanted.append((partner, largest_component(partner)))
+    if any(component < 0 for _, component in wanted):
+        return None
+    rng = random.Random(seed)
+    positions = {}
+    for letter in OBJECTIVES + (CELL_STATES["Target"],):
+        for _ in range(MAX_DRAWS):
+            position = (rng.randrange(grid.height), rng.randrange(grid.width))
+            index = grid.index(*position)
+            if all(labels.component(index) == component for labels, component in wanted):
+                break
+        else:
+            return None
+        positions[letter] = position
+    return positions
+
+
+def run_case(grid, cost_matrices, character, algorithm, positions):
+    """
+    Run one search and collect what it reports.
+
+    :return: Dictionary with the cost, the cells expanded and the peak frontier
+    """
+    stats = SearchStats()
+    if algorithm == MULTI_OBJECTIVE:
+        # What proyecto runs: one Dijkstra per objective and agent, then the
+        # split of the objectives between the two agents
+        agents = [character, partner_of(character)]
+        route_matrix = RouteMatrix(grid, cost_matrices, DIRECTIONS)
+        for agent in agents:
+            route_matrix.add_character(agent, {letter: positions[letter] for letter in OBJECTIVES}, stats=stats)
+        objectives = [letter for letter in OBJECTIVES if letter not in ("I", "P")]
+        _, cost = best_assignment(agents, objectives, route_matrix.cost)
+        return {"cost": cost, "expanded": stats.expanded, "peak_frontier": stats.peak_frontier}
+
+    start, target = positions["I"], positions[CELL_STATES["Target"]]
+    costs = cost_matrices.get(character)
+    if algorithm == INCREMENTAL:
+        # The first search of a planner, which is a plain A* with LPA*'s bookkeeping
+        heuristic = ScaledManhattan(character, grid.width).for_target(target)
+        cost = LPAStar(costs, grid.width, grid.height, start, target, heuristic, DIRECTIONS).search(stats=stats)
+    elif algorithm == HIERARCHICAL:
+        # Built in the timed run, like the first query of a character in the apps
+        heuristic = ScaledManhattan(character, grid.width).for_target(target)
+        cost = HierarchicalMap(costs, grid.width, grid.height, directions=DIRECTIONS).search(start, target, heuristic,
+                                                                                           stats=stats)
+    else:
+        arguments = (costs, grid.width, grid.height, start, target, DIRECTIONS)
+        heuristics = heuristic_arguments(algorithm, character, grid.width, start, target)
+        cost = SOLVERS[algorithm](*arguments, stats=stats, **heuristics)[0]
+    return {"cost": cost, "expanded": stats.expanded, "peak_frontier": stats.peak_frontier}
+
+
+def measure(grid, cost_matrices, character, algorithm, positions, repeat):
+    """
+    Time a case over several runs, then run it once more under tracemalloc.
+
+    Memory is measured in its own run because tracing allocations slows the
+    search down and would distort the timings.
+    """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = run_case(grid, cost_matrices, character, algorithm, positions)
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        run_case(grid, cost_matrices, character, algorithm, positions)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result.update(time=min(times), peak_memory=peak_memory)
+    return result
+
+
+def run_benchmark(maps, algorithms, characters, repeat, seed, log=None):
+    """
+    :param maps: List of (name, Grid) pairs
+    :return: List of result dictionaries, one per map, character and algorithm.
+        Cases that weren't run have a "skipped" entry with the reason instead
+        of measurements
+    """
+    results = []
+    for name, grid in maps:
+        cost_matrices = CostMatrixCache(grid)
+        reachability = ReachabilityIndex(grid, cost_matrices)
+        side = max(grid.height, grid.width)
+        for character in characters:
+            positions = objective_positions(grid, reachability.get(character), seed)
+            for algorithm in algorithms:
+                result = {"map": name, "size": [grid.height, grid.width], "character": character, "algorithm": algorithm}
+                case_positions = positions
+                if positions is None:
+                    result["skipped"] = f"{character} can't enter any cell"
+                elif side > MAX_SIDE.get(algorithm, side):
+                    result["skipped"] = f"maps wider than {MAX_SIDE[algorithm]} cells take too long"
+                elif algorithm == MULTI_OBJECTIVE:
+                    partner = partner_of(character)
+                    result["agents"] = [character, partner]
+                    case_positions = objective_positions(grid, reachability.get(character), seed, reachability.get(partner))
+                    if case_positions is None:
+                        result["skipped"] = f"no cell found that both {character} and {partner} can reach"
+                if "skipped" not in result:
+                    result.update(measure(grid, cost_matrices, character, algorithm, case_positions, repeat))
+                results.append(result)
+                if log is not None and "skipped" in result:
+                    log(f"{name} {character} {algorithm}: skipped, {result['skipped']}")
+                elif log is not None:
+                    log(f"{name} {character} {algorithm}: {result['time']:.4f} s, {result['expanded']} expanded, "
+                        f"peak frontier {result['peak_frontier']}, {result['peak_memory']} B, cost {result['cost']}")
+    return results
+
+
+def case_key(result):
+    return result["map"], result["character"], result["algorithm"]
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results against a saved report.
+
+    A case regresses when it is slower than the baseline by more than the
+    tolerance, or when its cost or number of expanded cells changed. A case
+    skipped in only one of the two runs is reported too, one skipped in both
+    isn't compared.
+
+    :param tolerance: Allowed relative slowdown, 0.25 for 25 %
+    :param baseline: Report run with the same seed, cases are matched by
+        map, character and algorithm
+    :return: List of messages, one per regression
+    """
+    saved = {case_key(result): result for result in baseline["results"]}
+    problems = []
+    for result in results:
+        before = saved.get(case_key(result))
+        if before is None:
+            continue
+        label = " ".join(case_key(result))
+        if "skipped" in result or "skipped" in before:
+            if "skipped" not in before:
+                problems.append(f"{label}: skipped ({result['skipped']}), run in the baseline")
+            elif "skipped" not in result:
+                problems.append(f"{label}: run, skipped in the baseline ({before['skipped']})")
+            continue
+        if result["time"] > before["time"] * (1 + tolerance):
+            problems.append(f"{label}: {result['time']:.4f} s, baseline {before['time']:.4f} s")
+        for field in ("cost", "expanded"):
+            if result[field] != before[field]:
+                problems.append(f"{label}: {field} {result[field]}, baseline {before[field]}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every search algorithm for every character.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(SIZES), help="Sides of the generated square maps")
+    parser.add_argument("--maps", nargs="*", default=[], help="Map files to benchmark as well")
+    parser.add_argument("--algorithms", nargs="+", default=ALGORITHMS, choices=ALGORITHMS)
+    parser.add_argument("--characters", nargs="+", default=list(CHARACTERS), choices=list(CHARACTERS))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case, the fastest is kept")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json", help="Report to write")
+    parser.add_argument("--baseline", default=None, help="Saved report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown against the baseline")
+    args = parser.parse_args(argv)
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        # Another seed generates other maps and positions, nothing would be comparable
+        if baseline.get("seed") != args.seed:
+            parser.error(f"{args.baseline} was run with seed {baseline.get('seed')}, not {args.seed}")
+
+    maps = [(f"random-{size}", generate_map(size, args.seed)) for size in args.sizes]
+    maps += [(filename, read_map_from_file(filename)) for filename in args.maps]
+    log = lambda message: print(message, file=sys.stderr)
+    results = run_benchmark(maps, args.algorithms, args.characters, args.repeat, args.seed, log)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=1)
+
+    if args.baseline is not None:
+        problems = compare(results, baseline, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"No regression against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
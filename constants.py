@@ -1,15 +1,16 @@
-import wx
-
 TERRAINS = {
-    "Mountain": {"value": "1", "color": wx.Colour(50, 50, 50)},
-    "Land": {"value": "2", "color": wx.Colour(255, 218, 185)},
-    "Water": {"value": "3", "color": wx.Colour(0, 0, 255)},
-    "Sand": {"value": "4", "color": wx.Colour(255, 165, 0)},
-    "Forest": {"value": "5", "color": wx.Colour(0, 255, 0)}
+    "Mountain": {"value": "1", "color": (50, 50, 50)},
+    "Land": {"value": "2", "color": (255, 218, 185)},
+    "Water": {"value": "3", "color": (0, 0, 255)},
+    "Sand": {"value": "4", "color": (255, 165, 0)},
+    "Forest": {"value": "5", "color": (0, 255, 0)}
 }
 
+TERRAIN_NAME_OF_VALUE = {attributes["value"]: name for name, attributes in TERRAINS.items()}
+
 DIRECTIONS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
 DIRECTION_OF_LETTER = {'U':(-1,0), 'R':(0,1), 'D':(1,0), 'L':(0,-1)}
+LETTER_OF_DIRECTION = {direction: letter for letter, direction in DIRECTION_OF_LETTER.items()}
 
 CHARACTERS = {
     "Human": {
@@ -42,7 +43,10 @@ CHARACTERS = {
     }
 }
 
-MASK_COLOR = wx.Colour(0, 0, 0)  # Black color for masking
+# Any movement cost at or above this value means the cell can't be entered
+IMPASSABLE = 1000
+
+MASK_COLOR = (0, 0, 0)  # Black color for masking
 
 CELL_STATES = {
     "Initial Point": "I",
@@ -0,0 +1,89 @@
+import sys
+from array import array
+
+from constants import CHARACTERS, IMPASSABLE, TERRAINS
+
+
+def terrain_cost_table(character_costs):
+    """
+    Map every possible terrain byte to the cost of entering it.
+
+    :param character_costs: Dictionary {terrain name: cost} of one character
+    :return: List of 256 costs, IMPASSABLE for unknown or blocked terrain
+    """
+    table = [IMPASSABLE] * 256
+    for name, attributes in TERRAINS.items():
+        table[ord(attributes["value"])] = min(character_costs[name], IMPASSABLE)
+    return table
+
+
+def byte_tables(table):
+    """
+    Split a cost table into translation tables for the low and high bytes.
+
+    :param table: List of 256 costs, as returned by terrain_cost_table
+    :return: Tuple (first, second) of bytes.translate tables, in the order the
+        two bytes of a cost are laid out in memory
+    """
+    low = bytes(cost & 0xFF for cost in table)
+    high = bytes(cost >> 8 for cost in table)
+    return (low, high) if sys.byteorder == "little" else (high, low)
+
+
+class CostMatrixCache:
+    """
+    Cost of entering every cell of a grid, precomputed for every character.
+
+    Each character gets one array indexed like the grid (i * width + j) so the
+    searches read a cell cost with a single lookup. Cells the character can't
+    enter hold IMPASSABLE. The arrays belong to one version of the grid: edits
+    reported through update_cell patch them in place, any other edit triggers
+    a full rebuild on the next access.
+    """
+
+    def __init__(self, grid, characters=CHARACTERS):
+        self.grid = grid
+        self.tables = {name: terrain_cost_table(costs) for name, costs in characters.items()}
+        self.byte_tables = {name: byte_tables(table) for name, table in self.tables.items()}
+        self.matrices = {}
+        self.version = -1
+
+    def rebuild(self):
+        # Both bytes of every cost are filled with bytes.translate, which runs
+        # in C, so building the arrays stays fast on maps with millions of cells
+        terrain = bytes(self.grid.terrain)
+        for name, (first, second) in self.byte_tables.items():
+            cells = bytearray(2 * len(terrain))
+            cells[0::2] = terrain.translate(first)
+            cells[1::2] = terrain.translate(second)
+            matrix = array('H')
+            matrix.frombytes(cells)
+            self.matrices[name] = matrix
+        self.version = self.grid.version
+
+    def get(self, character):
+        """
+        Cost array of a character for the current version of the grid.
+
+        :param character: Name of the character, a key of CHARACTERS
+        :return: Array of costs indexed by flat cell index
+        """
+        if self.version != self.grid.version:
+            self.rebuild()
+        return self.matrices[character]
+
+    def update_cell(self, i, j):
+        """
+        Patch the arrays after the terrain of a single cell was edited.
+
+        :param i: Row of the edited cell
+        :param j: Column of the edited cell
+        """
+        if self.version != self.grid.version - 1:
+            self.rebuild()
+            return
+        index = self.grid.index(i, j)
+        terrain = self.grid.terrain[index]
+        for name, table in self.tables.items():
+            self.matrices[name][index] = table[terrain]
+        self.version = self.grid.version
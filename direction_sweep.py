@@ -0,0 +1,144 @@
+import argparse
+import json
+import mmap
+import os
+import sys
+import tempfile
+import time
+from itertools import permutations
+from multiprocessing import TimeoutError, get_context
+
+from batch_solve import parse_position
+from constants import CHARACTERS, DIRECTION_OF_LETTER
+from cost_matrix import CostMatrixCache
+from reachability import ReachabilityIndex
+from solvers import SOLVERS, heuristic_arguments
+from utils import read_map_from_file
+
+# Every priority order of the four directions, as letters like "URDL"
+ORDERS = ["".join(order) for order in permutations(DIRECTION_OF_LETTER)]
+
+# Map of the worker process, set once by share_map instead of sent with every order
+shared = {}
+
+# The apps sweep from a thread of a wx process, which can't be forked safely
+START_METHOD = "spawn"
+
+# Seconds between two progress calls while no order finishes
+POLL_INTERVAL = 0.2
+
+
+def share_map(path, item_format, width, height):
+    # Maps the costs written by sweep read-only, every worker reads the same
+    # pages of the page cache instead of a copy of its own
+    with open(path, "rb") as file:
+        costs = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    shared.update(costs=memoryview(costs).cast(item_format), width=width, height=height)
+
+
+def solve_order(job):
+    """
+    Run one search with one direction order, in a worker process.
+
+    :param job: Tuple (algorithm, character, order, start, target)
+    :return: Dictionary with the order, cost, path length, expanded cells and time
+    """
+    algorithm, character, order, start, target = job
+    costs, width, height = shared["costs"], shared["width"], shared["height"]
+    directions = [DIRECTION_OF_LETTER[letter] for letter in order]
+    heuristics = heuristic_arguments(algorithm, character, width, start, target)
+    started = time.perf_counter()
+    cost, path, expanded, _ = SOLVERS[algorithm](costs, width, height, start, target, directions, **heuristics)
+    return {"order": order, "cost": cost, "steps": max(0, len(path) - 1), "expanded": expanded,
+            "time": time.perf_counter() - started}
+
+
+def rank(result):
+    # Reached targets first, then the cheapest path, the fewest expanded cells and the fastest
+    return result["cost"] == -1, result["cost"], result["expanded"], result["time"]
+
+
+def sweep(costs, width, height, character, algorithm, start, target, workers=None, progress=None, reachability=None):
+    """
+    Run a search once per direction order, in parallel worker processes.
+
+    The cost array is written once to a temporary file that every worker maps
+    read-only when the pool starts, so the workers don't unpickle a copy each
+    and the jobs themselves are a few bytes each. The workers are spawned,
+    forking a process with other threads running isn't safe.
+
+    :param costs: Cost array of the character, indexed like a Grid (i * width + j)
+    :param character: Name of the character, a key of CHARACTERS
+    :param algorithm: Name of the search, a key of SOLVERS
+    :param workers: Worker processes, one per CPU by default
+    :param progress: Function(done) called every time an order finishes and
+        every POLL_INTERVAL while none does, it may raise to abandon the
+        sweep, which terminates the workers at once
+    :param reachability: ReachabilityIndex of the map, when the target can't
+        be reached every order gets cost -1 without starting the workers
+    :return: List of the results of solve_order, best order first
+    """
+    if reachability is not None and not reachability.reachable(character, start, target):
+        return [{"order": order, "cost": -1, "steps": 0, "expanded": 0, "time": 0.0} for order in ORDERS]
+    jobs = [(algorithm, character, order, start, target) for order in ORDERS]
+    results = []
+    descriptor, path = tempfile.mkstemp(prefix="sweep-", suffix=".costs")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(costs)
+        initargs = (path, memoryview(costs).format, width, height)
+        # Leaving the block terminates the workers, and they unmap the file
+        with get_context(START_METHOD).Pool(workers, initializer=share_map, initargs=initargs) as pool:
+            finished = pool.imap_unordered(solve_order, jobs)
+            while len(results) < len(jobs):
+                try:
+                    results.append(finished.next(POLL_INTERVAL if progress is not None else None))
+                except TimeoutError:
+                    pass
+                if progress is not None:
+                    progress(len(results))
+    finally:
+        os.remove(path)
+    results.sort(key=rank)
+    return results
+
+
+def format_table(results):
+    """
+    :return: Lines of a text table of ranked sweep results
+    """
+    lines = [f"{'rank':>4}  order  {'cost':>8}  {'steps':>7}  {'expanded':>9}  {'time (ms)':>9}"]
+    for position, result in enumerate(results, 1):
+        cost = "-" if result["cost"] == -1 else result["cost"]
+        lines.append(f"{position:>4}  {result['order']:<5}  {cost:>8}  {result['steps']:>7}  "
+                     f"{result['expanded']:>9}  {result['time'] * 1000:>9.1f}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank the 24 direction priority orders of a search on one map.")
+    parser.add_argument("map", help="Map file, in the map_data*.txt text format or the binary format of map_format.py")
+    parser.add_argument("--character", choices=list(CHARACTERS), default="Human")
+    parser.add_argument("--algorithm", choices=list(SOLVERS), default="BFS")
+    parser.add_argument("--start", type=parse_position, required=True, help="Start cell as i,j")
+    parser.add_argument("--target", type=parse_position, required=True, help="Target cell as i,j")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes, one per CPU by default")
+    parser.add_argument("--json", action="store_true", help="Write the ranked results as JSON lines instead of a table")
+    args = parser.parse_args(argv)
+
+    try:
+        grid = read_map_from_file(args.map)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    if not (grid.is_valid_cell(*args.start) and grid.is_valid_cell(*args.target)):
+        parser.error(f"start {args.start} or target {args.target} is outside the {grid.height}x{grid.width} map")
+    cost_matrices = CostMatrixCache(grid, {args.character: CHARACTERS[args.character]})
+    costs = cost_matrices.get(args.character)
+    results = sweep(costs, grid.width, grid.height, args.character, args.algorithm, args.start, args.target, args.workers,
+                    reachability=ReachabilityIndex(grid, cost_matrices))
+    for line in (json.dumps(result) for result in results) if args.json else format_table(results):
+        sys.stdout.write(line + "\n")
+
+
+if __name__ == '__main__':
+    main()
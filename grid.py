@@ -0,0 +1,76 @@
+class Grid:
+    """
+    Map storage with one contiguous layer per kind of data.
+
+    Cells are addressed by a flat index ``i * width + j``. The terrain layer is a
+    bytearray holding the terrain digit of every cell (b"1" to b"5") and the
+    state layer holds the label displayed on a cell ("I", "X", "V", ...), only
+    for the cells that have one. ``version`` is bumped on every terrain edit
+    so derived data can tell when it is stale.
+
+    With ``copy=False`` the terrain buffer is used as is, for example a
+    read-only memoryview over a memory-mapped file. The first edit then
+    copies it into a bytearray, so only maps that are edited pay for a copy.
+    """
+
+    def __init__(self, height, width, terrain=None, copy=True):
+        self.height = height
+        self.width = width
+        self.size = height * width
+        if terrain is None:
+            terrain = b"2" * self.size
+        if len(terrain) != self.size:
+            raise ValueError(f"Expected {self.size} terrain cells, got {len(terrain)}")
+        self.terrain = bytearray(terrain) if copy else terrain
+        self.states = {}
+        self.version = 0
+
+    def index(self, i, j):
+        return i * self.width + j
+    def position(self, index):
+        return divmod(index, self.width)
+    def is_valid_cell(self, i, j):
+        return 0 <= i < self.height and 0 <= j < self.width
+
+    def get_terrain(self, i, j):
+        return chr(self.terrain[i * self.width + j])
+    def set_terrain(self, i, j, value):
+        if not isinstance(self.terrain, bytearray):
+            self.terrain = bytearray(self.terrain)
+        self.terrain[i * self.width + j] = ord(value)
+        self.version += 1
+    def get_state(self, i, j):
+        return self.states.get(i * self.width + j, "")
+    def set_state(self, i, j, state):
+        if state:
+            self.states[i * self.width + j] = state
+        else:
+            self.states.pop(i * self.width + j, None)
+
+    def cells(self):
+        """
+        Iterate over every cell of the grid in row-major order.
+
+        :return: Iterator of (i, j, terrain, state) tuples
+        """
+        width, terrain, states = self.width, self.terrain, self.states
+        for index in range(self.size):
+            i, j = divmod(index, width)
+            yield i, j, chr(terrain[index]), states.get(index, "")
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build a grid from rows of terrain digits.
+
+        :param rows: List of bytes (or str) rows, all of the same length
+        :return: Grid holding the given terrain and empty states
+        """
+        rows = [row.encode("ascii") if isinstance(row, str) else bytes(row) for row in rows]
+        if not rows:
+            raise ValueError("A map needs at least one row")
+        width = len(rows[0])
+        for row in rows:
+            if len(row) != width:
+                raise ValueError(f"All map rows must have {width} cells")
+        return cls(len(rows), width, b"".join(rows))
@@ -0,0 +1,105 @@
+import heapq
+
+from constants import CHARACTERS, DIRECTIONS, IMPASSABLE
+
+
+def min_passable_cost(character, characters=CHARACTERS):
+    """
+    Cheapest cost of entering any terrain the character can cross.
+
+    :param character: Name of the character, a key of characters
+    :param characters: Dictionary of cost tables {character: {terrain: cost}}
+    :return: Smallest cost below IMPASSABLE, 1 if every terrain is blocked
+    """
+    costs = [cost for cost in characters[character].values() if cost < IMPASSABLE]
+    return min(costs) if costs else 1
+
+
+class ScaledManhattan:
+    """
+    Manhattan distance multiplied by the cheapest terrain cost of a character.
+
+    Every step enters a new cell and no cell is cheaper than that minimum, so
+    the estimate never exceeds the real cost and stays consistent whatever the
+    cost tables are.
+    """
+
+    def __init__(self, character, width, characters=CHARACTERS):
+        self.character = character
+        self.width = width
+        self.scale = min_passable_cost(character, characters)
+
+    def for_target(self, end):
+        """
+        :param end: (i, j) position of the target
+        :return: Function(index) -> estimated cost from the cell to the target
+        """
+        end_i, end_j = end
+        width, scale = self.width, self.scale
+        def heuristic(index):
+            i, j = divmod(index, width)
+            return scale * (abs(i - end_i) + abs(j - end_j))
+        return heuristic
+
+
+class DistanceTableHeuristic:
+    """
+    Exact cost to the target, precomputed with a backward Dijkstra.
+
+    Building a table costs one full search, so it pays off when the same
+    target is queried several times on an unchanged map. Tables are kept per
+    target until clear() is called. Cells that can't reach the target get
+    IMPASSABLE times the size of the map, which is larger than any real path.
+    """
+
+    def __init__(self, costs, width, height, directions=DIRECTIONS):
+        self.costs = costs
+        self.width = width
+        self.height = height
+        self.directions = directions
+        self.tables = {}
+
+    def clear(self):
+        self.tables = {}
+
+    def distances_to(self, end):
+        """
+        :param end: (i, j) position of the target
+        :return: Dictionary {index: cost of the cheapest path to end}
+        """
+        if end in self.tables:
+            return self.tables[end]
+        costs, width, height = self.costs, self.width, self.height
+        end_index = end[0] * width + end[1]
+        distances = {end_index: 0}
+        queue = [(0, end_index)]
+        while queue:
+            distance, index = heapq.heappop(queue)
+            if distance != distances[index]:
+                continue
+            # Moving from a neighbour into this cell costs the cell's terrain
+            step = costs[index]
+            if step >= IMPASSABLE:
+                continue
+            i, j = divmod(index, width)
+            for di, dj in self.directions:
+                x, y = i + di, j + dj
+                if 0 <= x < height and 0 <= y < width:
+                    neighbour = x * width + y
+                    new_distance = distance + step
+                    if new_distance < distances.get(neighbour, new_distance + 1):
+                        distances[neighbour] = new_distance
+                        heapq.heappush(queue, (new_distance, neighbour))
+        self.tables[end] = distances
+        return distances
+
+    def for_target(self, end):
+        """
+        :param end: (i, j) position of the target
+        :return: Function(index) -> exact cost from the cell to the target
+        """
+        distances = self.distances_to(end)
+        unreachable = IMPASSABLE * self.width * self.height
+        def heuristic(index):
+            return distances.get(index, unreachable)
+        return heuristic
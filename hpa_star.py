@@ -0,0 +1,433 @@
+import heapq
+from itertools import count
+
+from constants import DIRECTIONS, IMPASSABLE
+from solve_worker import PROGRESS_INTERVAL
+
+# Side of the square clusters the map is divided into
+CLUSTER_SIZE = 16
+# Entrances shorter than this get one transition in their middle, longer
+# ones get one at each end
+MAX_SINGLE_TRANSITION = 6
+
+
+class HierarchicalMap:
+    """
+    HPA* abstraction of one cost array.
+
+    The map is divided into square clusters. Along the border between two
+    neighbouring clusters, every run of cells passable on both sides is an
+    entrance, crossed by one or two transitions: pairs of facing cells. The
+    transition cells are the nodes of an abstract graph whose edges are the
+    crossings themselves and the cheapest path between two nodes of the same
+    cluster that stays inside the cluster.
+
+    A query connects the start and the target to the nodes of their clusters,
+    searches the abstract graph and only refines the chosen edges back into
+    cells. Paths are optimal up to the choice of transitions, on random
+    512x512 maps about 5 % dearer than A* on average. Once the clusters on the
+    way are built a query settles a small fraction of the cells A* expands.
+
+    Everything is built on demand and cached per cluster: the entrances of a
+    border when one of its clusters is first reached, the edges inside a
+    cluster when one of its nodes is first expanded. update_cell drops what a
+    terrain edit invalidates, which is rebuilt by the next query.
+
+    After a search ``expanded`` counts the cells settled by the cluster
+    searches and ``pops`` the abstract nodes taken from the heap.
+    """
+
+    def __init__(self, costs, width, height, cluster_size=CLUSTER_SIZE, directions=DIRECTIONS):
+        self.costs = costs
+        self.width = width
+        self.height = height
+        self.cluster_size = cluster_size
+        self.directions = directions
+        self.rows = -(-height // cluster_size)
+        self.columns = -(-width // cluster_size)
+        # (cluster, cluster below or to the right) -> list of (cell, facing cell)
+        self.borders = {}
+        # cluster -> {node: list of facing nodes in neighbouring clusters}
+        self.exits = {}
+        # cluster -> {node: list of (other node, cost)}
+        self.edges = {}
+        self.expanded = 0
+        self.pops = 0
+        self.parent = {}
+        self.g = {}
+        self.progress = None
+
+    def cluster_of(self, index):
+        i, j = divmod(index, self.width)
+        return i // self.cluster_size, j // self.cluster_size
+
+    def bounds(self, cluster):
+        size = self.cluster_size
+        ci, cj = cluster
+        return ci * size, min((ci + 1) * size, self.height), cj * size, min((cj + 1) * size, self.width)
+
+    def border(self, first, second):
+        """
+        Transitions between two neighbouring clusters, second being below or
+        to the right of first.
+
+        :return: List of (cell in first, cell in second) pairs
+        """
+        key = (first, second)
+        transitions = self.borders.get(key)
+        if transitions is not None:
+            return transitions
+        costs, width = self.costs, self.width
+        top, bottom, left, right = self.bounds(first)
+        if second[0] != first[0]:
+            # Horizontal border, first's last row faces second's first row
+            pairs = [((bottom - 1) * width + j, bottom * width + j) for j in range(left, right)]
+        else:
+            pairs = [(i * width + right - 1, i * width + right) for i in range(top, bottom)]
+        transitions = []
+        run = []
+        for a, b in pairs + [(None, None)]:
+            if a is not None and costs[a] < IMPASSABLE and costs[b] < IMPASSABLE:
+                run.append((a, b))
+                continue
+            if len(run) >= MAX_SINGLE_TRANSITION:
+                transitions += (run[0], run[-1])
+            elif run:
+                transitions.append(run[len(run) // 2])
+            run = []
+        self.borders[key] = transitions
+        return transitions
+
+    def cluster_exits(self, cluster):
+        """
+        Nodes of a cluster and the nodes they face across its borders.
+
+        :return: Dictionary {node: list of facing nodes}
+        """
+        exits = self.exits.get(cluster)
+        if exits is not None:
+            return exits
+        exits = {}
+        ci, cj = cluster
+        for other, inside in (((ci - 1, cj), 1), ((ci, cj - 1), 1), ((ci + 1, cj), 0), ((ci, cj + 1), 0)):
+            if not (0 <= other[0] < self.rows and 0 <= other[1] < self.columns):
+                continue
+            pairs = self.border(*((other, cluster) if inside else (cluster, other)))
+            for pair in pairs:
+                exits.setdefault(pair[inside], []).append(pair[1 - inside])
+        self.exits[cluster] = exits
+        return exits
+
+    def cluster_edges(self, cluster):
+        """
+        Cheapest path inside a cluster between every two of its nodes.
+
+        :return: Dictionary {node: list of (other node, cost)}
+        """
+        edges = self.edges.get(cluster)
+        if edges is not None:
+            return edges
+        nodes = self.cluster_exits(cluster)
+        bounds = self.bounds(cluster)
+        edges = {}
+        for node in nodes:
+            reached = self.cluster_search(node, bounds, targets=nodes)[0]
+            edges[node] = [(other, reached[other]) for other in nodes if other != node and other in reached]
+        # Only stored once complete, an abandoned search leaves nothing half built
+        self.edges[cluster] = edges
+        return edges
+
+    def build(self, progress=None):
+        """
+        Build the edges of every cluster now instead of during the queries.
+
+        :param progress: Function(expanded) called every PROGRESS_INTERVAL
+            settled cells, it may raise to abandon the build; the clusters
+            built so far are kept
+        """
+        self.progress = progress
+        try:
+            for ci in range(self.rows):
+                for cj in range(self.columns):
+                    self.cluster_edges((ci, cj))
+        finally:
+            self.progress = None
+
+    def cluster_search(self, source, bounds, targets=None, reverse=False):
+        """
+        Dijkstra from one cell that never leaves a cluster.
+
+        :param source: Flat index of the cell the search starts from
+        :param bounds: Tuple (top, bottom, left, right), bottom and right excluded
+        :param targets: Cells after which the search may stop, None to settle
+            every reachable cell
+        :param reverse: Search towards source instead of away from it, the
+            costs are those of the paths ending at source
+        :return: Tuple (cost, parent) of dictionaries indexed by settled cell
+        """
+        costs, width, directions = self.costs, self.width, self.directions
+        top, bottom, left, right = bounds
+        g, parent, settled = {source: 0}, {}, {}
+        remaining = set(targets) if targets is not None else None
+        open_heap = [(0, source)]
+        heappush, heappop = heapq.heappush, heapq.heappop
+        expanded, progress = self.expanded, self.progress
+        try:
+            while open_heap:
+                cost, index = heappop(open_heap)
+                if index in settled:
+                    continue
+                settled[index] = cost
+                expanded += 1
+                if progress is not None and not expanded % PROGRESS_INTERVAL:
+                    progress(expanded)
+                if remaining is not None:
+                    remaining.discard(index)
+                    if not remaining:
+                        break
+                i, j = divmod(index, width)
+                for di, dj in directions:
+                    x, y = i + di, j + dj
+                    if not (top <= x < bottom and left <= y < right):
+                        continue
+                    neighbour = x * width + y
+                    step = costs[neighbour]
+                    if step >= IMPASSABLE or neighbour in settled:
+                        continue
+                    new_cost = cost + (costs[index] if reverse else step)
+                    if new_cost < g.get(neighbour, new_cost + 1):
+                        g[neighbour] = new_cost
+                        parent[neighbour] = index
+                        heappush(open_heap, (new_cost, neighbour))
+        finally:
+            self.expanded = expanded
+        return settled, parent
+
+    def search(self, start, end, heuristic=None, progress=None, stats=None):
+        """
+        Find a path between two cells through the abstract graph.
+
+        :param start: (i, j) position where the search starts
+        :param end: (i, j) position of the target
+        :param heuristic: Function(index) -> estimated cost to the target,
+            Manhattan distance when omitted
+        :param progress: Function(expanded) called every PROGRESS_INTERVAL
+            settled cells, it may raise to abandon the search
+        :param stats: SearchStats that receives the counters of the search
+        :return: Cost of the path found, -1 if the target can't be reached
+        """
+        self.expanded = self.pops = 0
+        self.parent, self.g = {}, {}
+        self.progress = progress
+        try:
+            return self.run_search(start, end, heuristic, stats)
+        finally:
+            self.progress = None
+            if stats is not None:
+                stats.record(self.expanded, pops=self.pops)
+
+    def run_search(self, start, end, heuristic, stats):
+        width, height = self.width, self.height
+        if not (0 <= start[0] < height and 0 <= start[1] < width and 0 <= end[0] < height and 0 <= end[1] < width):
+            return -1
+        start_index = start[0] * width + start[1]
+        end_index = end[0] * width + end[1]
+        if start_index == end_index:
+            self.g[start_index] = 0
+            return 0
+        if self.costs[end_index] >= IMPASSABLE:
+            return -1
+        if heuristic is None:
+            end_i, end_j = end
+            heuristic = lambda index: abs(index // width - end_i) + abs(index % width - end_j)
+        trace = stats.node_trace() if stats is not None else None
+
+        end_cluster = self.cluster_of(end_index)
+        # The start and the cells it steps to in neighbouring clusters, which
+        # are not nodes when the start itself is impassable, are linked to the
+        # nodes of their clusters
+        start_links = {start_index: self.entry_links(start_index, end_index)}
+        i, j = start
+        for di, dj in self.directions:
+            x, y = i + di, j + dj
+            if 0 <= x < height and 0 <= y < width:
+                neighbour = x * width + y
+                if self.costs[neighbour] < IMPASSABLE and self.cluster_of(neighbour) != self.cluster_of(start_index):
+                    start_links[start_index].append((neighbour, self.costs[neighbour]))
+                    start_links.setdefault(neighbour, self.entry_links(neighbour, end_index))
+        end_nodes = self.cluster_exits(end_cluster)
+        end_links = self.cluster_search(end_index, self.bounds(end_cluster), end_nodes, reverse=True)[0]
+
+        # Abstract A*, nodes are flat cell indexes
+        g, parent, closed = {start_index: 0}, {}, set()
+        sequence = count()
+        open_heap = [(heuristic(start_index), 0, next(sequence), start_index)]
+        heappush, heappop = heapq.heappush, heapq.heappop
+        while open_heap:
+            _, neg_cost, _, node = heappop(open_heap)
+            self.pops += 1
+            cost = -neg_cost
+            if node in closed or cost != g[node]:
+                continue
+            closed.add(node)
+            if trace is not None:
+                trace("abstract %d,%d g=%d", *divmod(node, width), cost)
+            if node == end_index:
+                break
+            cluster = self.cluster_of(node)
+            if node in start_links:
+                links = list(start_links[node])
+            else:
+                links = list(self.cluster_edges(cluster).get(node, ()))
+            links += [(other, self.costs[other]) for other in self.cluster_exits(cluster).get(node, ())]
+            if node in end_links and node != end_index:
+                links.append((end_index, end_links[node]))
+            for other, link in links:
+                new_cost = cost + link
+                if other not in closed and new_cost < g.get(other, new_cost + 1):
+                    g[other] = new_cost
+                    parent[other] = node
+                    heappush(open_heap, (new_cost + heuristic(other), -new_cost, next(sequence), other))
+
+        if end_index not in closed:
+            return -1
+        corridor = [end_index]
+        while corridor[-1] in parent:
+            corridor.append(parent[corridor[-1]])
+        corridor.reverse()
+        return self.refine(corridor)
+
+    def entry_links(self, source, end_index):
+        """
+        Links from a cell that may not be a node to the nodes of its cluster,
+        and to the target when it lies in the same cluster.
+
+        :return: List of (node, cost)
+        """
+        cluster = self.cluster_of(source)
+        targets = set(self.cluster_exits(cluster))
+        if self.cluster_of(end_index) == cluster:
+            targets.add(end_index)
+        targets.discard(source)
+        reached = self.cluster_search(source, self.bounds(cluster), targets)[0]
+        return [(target, reached[target]) for target in targets if target in reached]
+
+    def refine(self, corridor):
+        """
+        Turn a path of abstract nodes into cells, filling parent and g.
+
+        Two refined edges can meet in a cell the path already went through;
+        the loop in between is cut, so the path may end up cheaper than the
+        abstract one.
+
+        :param corridor: Flat indexes of the abstract nodes from start to end
+        :return: Cost of the refined path
+        """
+        cells = [corridor[0]]
+        for source, target in zip(corridor, corridor[1:]):
+            cluster = self.cluster_of(source)
+            if cluster != self.cluster_of(target):
+                # A crossing, the two cells are neighbours
+                cells.append(target)
+                continue
+            links = self.cluster_search(source, self.bounds(cluster), (target,))[1]
+            steps = [target]
+            while steps[-1] in links:
+                steps.append(links[steps[-1]])
+            cells += reversed(steps[:-1])
+
+        walk, position = [], {}
+        for index in cells:
+            if index in position:
+                for dropped in walk[position[index] + 1:]:
+                    del position[dropped]
+                del walk[position[index] + 1:]
+                continue
+            position[index] = len(walk)
+            walk.append(index)
+
+        parent, g, costs = self.parent, self.g, self.costs
+        g[walk[0]] = 0
+        for previous, index in zip(walk, walk[1:]):
+            parent[index] = previous
+            g[index] = g[previous] + costs[index]
+        return g[walk[-1]]
+
+    def path(self, end):
+        """
+        Cells of the path found by the last search, from start to end.
+
+        :param end: (i, j) position of the target
+        :return: List of (i, j) positions, empty if the target wasn't reached
+        """
+        index = end[0] * self.width + end[1]
+        if index not in self.g:
+            return []
+        path = [index]
+        while index in self.parent:
+            index = self.parent[index]
+            path.append(index)
+        path.reverse()
+        return [divmod(index, self.width) for index in path]
+
+    def update_cell(self, i, j):
+        """
+        Forget what depends on a cell whose cost changed in the cost array.
+
+        The edges of its cluster are rebuilt on the next query. When the cell
+        lies on a border the entrances of that border change too, and so do
+        the nodes and edges of the cluster on the other side.
+
+        :param i: Row of the edited cell
+        :param j: Column of the edited cell
+        """
+        size = self.cluster_size
+        cluster = (i // size, j // size)
+        self.edges.pop(cluster, None)
+        top, bottom, left, right = self.bounds(cluster)
+        ci, cj = cluster
+        for on_border, other in ((i == top, (ci - 1, cj)), (i == bottom - 1, (ci + 1, cj)),
+                                 (j == left, (ci, cj - 1)), (j == right - 1, (ci, cj + 1))):
+            if not on_border:
+                continue
+            self.borders.pop((cluster, other), None)
+            self.borders.pop((other, cluster), None)
+            for changed in (cluster, other):
+                self.exits.pop(changed, None)
+                self.edges.pop(changed, None)
+
+
+class HierarchyCache:
+    """
+    HierarchicalMap of every character, kept in step with a CostMatrixCache.
+
+    A hierarchy is dropped when the character's cost array is replaced by a
+    full rebuild; cell edits reported through update_cell only invalidate the
+    clusters around the cell.
+    """
+
+    def __init__(self, grid, cost_matrices, cluster_size=CLUSTER_SIZE, directions=DIRECTIONS):
+        self.grid = grid
+        self.cost_matrices = cost_matrices
+        self.cluster_size = cluster_size
+        self.directions = directions
+        self.hierarchies = {}
+
+    def get(self, character):
+        """
+        :param character: Name of the character, a key of CHARACTERS
+        :return: HierarchicalMap over the character's current cost array
+        """
+        costs = self.cost_matrices.get(character)
+        hierarchy = self.hierarchies.get(character)
+        if hierarchy is None or hierarchy.costs is not costs:
+            hierarchy = HierarchicalMap(costs, self.grid.width, self.grid.height, self.cluster_size, self.directions)
+            self.hierarchies[character] = hierarchy
+        return hierarchy
+
+    def update_cell(self, i, j):
+        """
+        Report a terrain edit, after it was applied to the cost matrices.
+        """
+        for hierarchy in self.hierarchies.values():
+            hierarchy.update_cell(i, j)
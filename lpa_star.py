@@ -0,0 +1,201 @@
+import heapq
+from itertools import count
+
+from constants import DIRECTIONS, IMPASSABLE
+from solve_worker import PROGRESS_INTERVAL
+
+INFINITY = float("inf")
+
+
+class LPAStar:
+    """
+    Lifelong Planning A* between a fixed start and target.
+
+    Every reached cell keeps its cost g and a one-step lookahead rhs, the best
+    g of a neighbour plus the cost of entering the cell. A cell is only queued
+    while the two disagree, so once a search finished the state stays valid and
+    a terrain edit only touches the cell whose cost changed. The next search
+    then repairs the costs that depend on it instead of starting over.
+
+    Entering a cell costs the same from every neighbour, so an edit only
+    changes the rhs of the edited cell itself. Edits are recorded with
+    update_cell and applied at the start of the next search. ``expanded``,
+    ``pushes``, ``pops`` and ``stale_pops`` count the work of the last search.
+    """
+
+    def __init__(self, costs, width, height, start, end, heuristic, directions=DIRECTIONS):
+        self.costs = costs
+        self.width = width
+        self.height = height
+        self.start = start[0] * width + start[1]
+        self.end = end[0] * width + end[1]
+        self.heuristic = heuristic
+        self.directions = directions
+        self.g = {}
+        self.rhs = {self.start: 0}
+        self.parent = {}
+        self.open = []
+        self.changed = set()
+        self.sequence = count()
+        self.expanded = 0
+        self.pushes = 0
+        self.pops = 0
+        self.stale_pops = 0
+        self.push(self.start)
+
+    def key(self, index):
+        best = min(self.g.get(index, INFINITY), self.rhs.get(index, INFINITY))
+        return best + self.heuristic(index), best
+
+    def push(self, index):
+        first, second = self.key(index)
+        heapq.heappush(self.open, (first, second, next(self.sequence), index))
+        self.pushes += 1
+
+    def neighbours(self, index):
+        width, height = self.width, self.height
+        i, j = divmod(index, width)
+        for di, dj in self.directions:
+            x, y = i + di, j + dj
+            if 0 <= x < height and 0 <= y < width:
+                yield x * width + y
+
+    def update_vertex(self, index):
+        """
+        Recompute the rhs of a cell and queue it if it became inconsistent.
+        """
+        if index != self.start:
+            step = self.costs[index]
+            best, best_parent = INFINITY, None
+            if step < IMPASSABLE:
+                g = self.g
+                for neighbour in self.neighbours(index):
+                    cost = g.get(neighbour, INFINITY) + step
+                    if cost < best:
+                        best, best_parent = cost, neighbour
+            if best_parent is None:
+                self.rhs.pop(index, None)
+                self.parent.pop(index, None)
+            else:
+                self.rhs[index] = best
+                self.parent[index] = best_parent
+        if self.g.get(index, INFINITY) != self.rhs.get(index, INFINITY):
+            self.push(index)
+
+    def update_cell(self, i, j):
+        """
+        Record that the cost of entering a cell changed in the cost array.
+
+        :param i: Row of the edited cell
+        :param j: Column of the edited cell
+        """
+        self.changed.add(i * self.width + j)
+
+    def search(self, progress=None, stats=None):
+        """
+        Bring the costs up to date with the recorded edits and the target.
+
+        :param progress: Function(expanded) called every PROGRESS_INTERVAL
+            expansions, it may raise to abandon the search; the state stays
+            valid and the next search carries on from it
+        :param stats: SearchStats that receives the counters of the search
+        :return: Cost of the cheapest path, -1 if the target can't be reached
+        """
+        self.expanded = self.pushes = self.pops = self.stale_pops = 0
+        for index in self.changed:
+            self.update_vertex(index)
+        self.changed.clear()
+
+        g, rhs, open_heap, end = self.g, self.rhs, self.open, self.end
+        heappop = heapq.heappop
+        trace = stats.node_trace() if stats is not None else None
+        peak_open = len(open_heap)
+        while open_heap:
+            first, second, _, index = open_heap[0]
+            if g.get(index, INFINITY) == rhs.get(index, INFINITY) or (first, second) != self.key(index):
+                heappop(open_heap)
+                self.pops += 1
+                self.stale_pops += 1
+                continue
+            if (first, second) >= self.key(end) and g.get(end, INFINITY) == rhs.get(end, INFINITY):
+                break
+            # Checked before popping so an abandoned search leaves the cell queued
+            if progress is not None and self.expanded and not self.expanded % PROGRESS_INTERVAL:
+                progress(self.expanded)
+            if len(open_heap) > peak_open:
+                peak_open = len(open_heap)
+            heappop(open_heap)
+            self.pops += 1
+            self.expanded += 1
+            best = rhs.get(index, INFINITY)
+            if trace is not None:
+                trace("expand %d,%d g=%s rhs=%s open=%d", *divmod(index, self.width), g.get(index, INFINITY), best, len(open_heap))
+            if g.get(index, INFINITY) > best:
+                g[index] = best
+            else:
+                g.pop(index, None)
+                self.update_vertex(index)
+            for neighbour in self.neighbours(index):
+                self.update_vertex(neighbour)
+
+        if stats is not None:
+            stats.record(self.expanded, self.pushes, self.pops, self.stale_pops, peak_open)
+        cost = g.get(end, INFINITY)
+        return -1 if cost == INFINITY else cost
+
+    def search_tree(self):
+        """
+        Parent links of the cells whose cost is known, rooted at the start.
+
+        Cells still waiting for a repair are left out, so the links always
+        form a tree that attach_search_tree can rebuild.
+
+        :return: Tuple (parent, g) of dictionaries indexed by flat cell index
+        """
+        g, parent = self.g, self.parent
+        tree_parent, tree_g = {}, {self.start: 0}
+        for index in sorted(g, key=g.__getitem__):
+            source = parent.get(index)
+            if source in tree_g and g[source] < g[index] and g[index] == self.rhs.get(index):
+                tree_parent[index] = source
+                tree_g[index] = g[index]
+        return tree_parent, tree_g
+
+    def path(self):
+        """
+        Cells of the cheapest path found by the last search, from start to end.
+
+        Parent links are followed back from the target, checking that every
+        link is consistent (g of the cell is g of its parent plus the cost of
+        entering it), so the path costs its own length instead of a pass over
+        every known cell. If a link is still waiting for a repair the path is
+        read from search_tree instead.
+
+        :return: List of (i, j) positions, empty if the target wasn't reached
+        """
+        g, rhs, parent, costs = self.g, self.rhs, self.parent, self.costs
+        index = self.end
+        cost = g.get(index, INFINITY)
+        if cost == INFINITY or cost != rhs.get(index):
+            return []
+        path = [index]
+        while index != self.start:
+            source = parent.get(index)
+            if source is None or g.get(source, INFINITY) + costs[index] != g[index] or g[source] != rhs.get(source):
+                return self.tree_path()
+            index = source
+            path.append(index)
+        path.reverse()
+        return [divmod(index, self.width) for index in path]
+
+    def tree_path(self):
+        tree_parent, _ = self.search_tree()
+        index = self.end
+        if index != self.start and index not in tree_parent:
+            return []
+        path = [index]
+        while index in tree_parent:
+            index = tree_parent[index]
+            path.append(index)
+        path.reverse()
+        return [divmod(index, self.width) for index in path]
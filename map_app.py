@@ -1,17 +1,36 @@
+import os
+
 import wx
-import networkx as nx
-import matplotlib.pyplot as plt
-import heapq
-from networkx.drawing.nx_pydot import graphviz_layout
 
-from constants import TERRAINS, DIRECTIONS, DIRECTION_OF_LETTER, CHARACTERS, MASK_COLOR, CELL_STATES
-from utils import hierarchy_pos, read_map_from_file
-from tree_node import TreeNode
+from constants import TERRAINS, TERRAIN_NAME_OF_VALUE, DIRECTION_OF_LETTER, CHARACTERS, IMPASSABLE, CELL_STATES
+from cost_matrix import CostMatrixCache
+from direction_sweep import ORDERS, format_table, sweep
+from map_canvas import MapCanvas, PathAnimation
+from utils import read_map_from_file
+from tree_node import TreeNode, attach_search_tree
+from a_star import AStar
+from lpa_star import INFINITY, LPAStar
+from hpa_star import HierarchyCache
+from reachability import ReachabilityIndex
+from heuristics import ScaledManhattan
+from search_path import SearchPath
+from search_scratch import SearchScratch
+from search_events import EXPAND, GOAL, PUSH
+from search_stats import STEP, SUMMARY, SearchStats, trace_from_environment
+from solve_worker import SolveWorker
+from solvers import EVENT_SEARCHES, SOLVERS, heuristic_arguments
+from tree_export import write_tree_dot, write_tree_jsonl
+
+# Colors of the cells replayed by "Play the search"
+PLAYBACK_COLORS = {PUSH: (170, 200, 255), EXPAND: (60, 110, 220), GOAL: (255, 0, 0)}
 
 class MapApp(wx.Frame):
-    def __init__(self, map_data):
+    def __init__(self, grid):
         super(MapApp, self).__init__(None, title="Map Editor", size=(800, 600))
-        self.map_data = map_data
+        self.grid = grid
+        self.cost_matrices = CostMatrixCache(grid)
+        self.hierarchies = HierarchyCache(grid, self.cost_matrices)
+        self.reachability = ReachabilityIndex(grid, self.cost_matrices)
         self.initUI()
         self.masked = False
         self.hasInitialPoint = False
@@ -19,44 +38,74 @@ class MapApp(wx.Frame):
         self.initialPoint = (0, 0)
         self.finalPoint = (0, 0)
         self.path = []
+        self.planner = None
+        # Reused by BFS and both DFS from one solve to the next, see get_scratch
+        self.scratch = None
+        self.worker = None
+        # Cancelled worker that may still be unwinding, see stop_solving
+        self.stopping = None
+        self.progress = None
+        # Set SEARCH_TRACE, e.g. to "node/100", to trace the searches to stderr
+        self.trace = trace_from_environment()
+        self.stats = SearchStats(self.trace)
+        self.algorithm = None
+        # Path of the last search, highlighted without walking the tree
+        self.solution = SearchPath()
+        self.overlay = None
+        self.build_tree = True
+        # Replays searches one event per frame, see play_search
+        self.animation = PathAnimation(self.canvas, frames_per_second=50)
 
     
     """UI INITIALIZATION"""
     def initUI(self):
         panel = wx.Panel(self)
-        # +1 for the finish button
-        grid = wx.GridSizer(len(self.map_data) + 1,
-                            len(self.map_data[0]), 10, 10)
+        sizer = wx.BoxSizer(wx.VERTICAL)
         panel.SetBackgroundColour(wx.Colour(0, 0, 0))
 
-        self.buttons = []
-        for i, row in enumerate(self.map_data):
-            button_row = []
-            for j, cell in enumerate(row):
-                terrain, state = cell
-                btn = wx.Button(panel, label=state, size=(
-                    40, 40), style=wx.BORDER_NONE)
-                btn.SetBackgroundColour(self.get_terrain_color(terrain))
-                btn.Bind(wx.EVT_LEFT_DOWN, lambda event, x=i,
-                         y=j: self.on_left_click(event, x, y))
-                btn.Bind(wx.EVT_RIGHT_DOWN, lambda event, x=i,
-                         y=j: self.on_right_click(event, x, y))
-                grid.Add(btn, 0, wx.EXPAND)
-                button_row.append(btn)
-            self.buttons.append(button_row)
+        # One canvas draws every cell and maps clicks to cells
+        self.canvas = MapCanvas(panel, self.grid, self.on_left_click, self.on_right_click)
+        sizer.Add(self.canvas, 1, wx.EXPAND)
 
+        buttons = wx.BoxSizer(wx.HORIZONTAL)
         # Add the "Finish Editing and Start Playing" button at the bottom
         self.finish_btn = wx.Button(panel, label="Finish Editing")
         self.finish_btn.Bind(wx.EVT_BUTTON, self.on_finish_editing)
-        grid.Add(self.finish_btn, 0, wx.EXPAND)
+        buttons.Add(self.finish_btn, 1, wx.EXPAND)
 
         # Add the auto solve button that is disabled until the user finishes editing
         self.auto_solve_btn = wx.Button(panel, label="Auto Solve")
         self.auto_solve_btn.Bind(wx.EVT_BUTTON, self.auto_solve)
-        grid.Add(self.auto_solve_btn, 10, wx.EXPAND)
+        buttons.Add(self.auto_solve_btn, 1, wx.EXPAND)
         self.auto_solve_btn.Disable()
 
-        panel.SetSizer(grid)
+        # Ranks every direction order of a search, enabled with the auto solve button
+        self.sweep_btn = wx.Button(panel, label="Sweep Orders")
+        self.sweep_btn.Bind(wx.EVT_BUTTON, self.sweep_orders)
+        buttons.Add(self.sweep_btn, 1, wx.EXPAND)
+        self.sweep_btn.Disable()
+
+        # Stops the search running in the background
+        self.cancel_btn = wx.Button(panel, label="Cancel")
+        self.cancel_btn.Bind(wx.EVT_BUTTON, lambda _: self.stop_solving("Cancelled"))
+        buttons.Add(self.cancel_btn, 1, wx.EXPAND)
+        self.cancel_btn.Disable()
+
+        # Pauses and resumes the search replayed by play_search
+        self.pause_btn = wx.Button(panel, label="Pause")
+        self.pause_btn.Bind(wx.EVT_BUTTON, self.on_pause)
+        buttons.Add(self.pause_btn, 1, wx.EXPAND)
+        self.pause_btn.Disable()
+
+        # Builds the TreeNode tree the plots and exports need, searches that
+        # leave parent links behind skip it when unchecked
+        self.tree_box = wx.CheckBox(panel, label="Search tree")
+        self.tree_box.SetValue(True)
+        buttons.Add(self.tree_box, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT, 10)
+        sizer.Add(buttons, 0, wx.EXPAND | wx.TOP, 10)
+
+        self.CreateStatusBar()
+        panel.SetSizer(sizer)
         self.Centre()
 
     
@@ -68,30 +117,40 @@ class MapApp(wx.Frame):
         count_possible = 0
         for dx, dy in directions:
             x, y = i + dx, j + dy
-            if 0 <= x < len(self.map_data) and 0 <= y < len(self.map_data[0]):
-                terrain_value, state = self.map_data[x][y]
-                terrain_name = [name for name, attributes in TERRAINS.items(
-                ) if attributes["value"] == terrain_value][0]
-                if CHARACTERS[self.selected_character][terrain_name] < 1000 and ("V" not in state and "O" not in state and "I" not in state):
+            if self.is_valid_cell(x, y):
+                state = self.grid.get_state(x, y)
+                if self.get_cell_cost(x, y) < IMPASSABLE and ("V" not in state and "O" not in state and "I" not in state):
                     count_possible += 1
         return count_possible > 1
 
     """USER ACTIONS HANDLERS"""
-    def on_left_click(self, event, i, j):
+    def on_left_click(self, i, j):
         if self.masked:
             self.handle_masked_click(i, j)
         else:
-            self.handle_unmasked_click(i, j, event)
-    def on_right_click(self, event, i, j):
+            self.handle_unmasked_click(i, j)
+    def on_right_click(self, i, j):
         dlg = wx.SingleChoiceDialog(
             self, 'Choose terrain type:', 'Terrain Selection', list(TERRAINS.keys()))
         if dlg.ShowModal() == wx.ID_OK:
             selected_terrain = dlg.GetStringSelection()
-            self.map_data[i][j] = (
-                TERRAINS[selected_terrain]["value"], self.map_data[i][j][1])
-            event.GetEventObject().SetBackgroundColour(
-                TERRAINS[selected_terrain]["color"])
-            self.buttons[i][j].Refresh()
+            if self.worker is not None and self.worker.is_running():
+                # The running search reads the costs being edited
+                self.stop_solving("Map edited, solve again")
+            # A replayed search reads the costs being edited too
+            self.stop_playback()
+            self.grid.set_terrain(i, j, TERRAINS[selected_terrain]["value"])
+            self.cost_matrices.update_cell(i, j)
+            if self.stopping is not None and self.stopping.is_running():
+                # The cancelled search may still be inside them, start afresh
+                self.planner = None
+                self.hierarchies = HierarchyCache(self.grid, self.cost_matrices)
+            else:
+                if self.planner is not None:
+                    self.planner.update_cell(i, j)
+                self.hierarchies.update_cell(i, j)
+            self.reachability.update_cell(i, j)
+            self.canvas.set_color(i, j, TERRAINS[selected_terrain]["color"])
         dlg.Destroy()
     def on_finish_editing(self, _):
         self.start_masking()
@@ -107,47 +166,100 @@ class MapApp(wx.Frame):
         dlg.Destroy()
 
         self.auto_solve_btn.Enable()
+        self.sweep_btn.Enable()
     def solve(self, algorithm):
         # Solve the map using the selected algorithm
+        self.stop_solving()
+        self.stop_playback()
+        # The labels of the last search may read from the scratch this one resets
+        self.canvas.set_overlay(None)
+        self.algorithm = algorithm
+        self.build_tree = self.tree_box.GetValue()
+        self.stats = SearchStats(self.trace)
         self.DIRECTIONS = []
         self.select_direction_priority()
-        if algorithm == "DFS":
-            self.solve_dfs()
-        elif algorithm == "BFS":
-            self.solve_bfs()
-        elif algorithm == "Iterative DFS":
-            self.solve_iterative_dfs()
-        elif algorithm == "A*":
-            self.solve_a_star()
+        solvers = {
+            "DFS": self.solve_dfs,
+            "BFS": self.solve_bfs,
+            "Iterative DFS": self.solve_iterative_dfs,
+            "A*": self.solve_a_star,
+            "Incremental A*": self.solve_incremental_a_star,
+            "Hierarchical A*": self.solve_hierarchical_a_star,
+            "Bidirectional BFS": lambda: self.solve_headless("Bidirectional BFS"),
+            "Bidirectional A*": lambda: self.solve_headless("Bidirectional A*"),
+            "Iterative Deepening DFS": lambda: self.solve_headless("Iterative Deepening DFS"),
+            "IDA*": lambda: self.solve_headless("IDA*"),
+        }
+        # Built here so the worker never rebuilds them while the map is edited
+        self.cost_matrices.get(self.selected_character)
+        if not self.reachability.reachable(self.selected_character, self.current_position, self.finalPoint):
+            # No search can reach it, don't start one
+            self.stats.emit(SUMMARY, "%s: %s can't reach %s from %s", algorithm, self.selected_character,
+                            self.finalPoint, self.current_position)
+            self.SetStatusText(f"{algorithm}: the target can't be reached")
+            return
+        self.worker = SolveWorker(
+            lambda progress: self.run_search(solvers[algorithm], progress),
+            self.on_search_done,
+            on_progress=lambda expanded: self.SetStatusText(f"{algorithm}: {expanded} cells expanded"),
+            on_error=self.on_search_error,
+            post=wx.CallAfter,
+            after=self.stopping)
+        self.cancel_btn.Enable()
+        self.SetStatusText(f"{algorithm}: solving...")
+        self.worker.start()
+    def run_search(self, solve, progress):
+        # Runs on the worker thread
+        self.progress = progress
+        try:
+            solve()
+        finally:
+            self.progress = None
+    def on_search_done(self, _):
+        self.worker = None
+        self.cancel_btn.Disable()
+        self.stats.emit(SUMMARY, "%s: %s", self.selected_character, self.stats.summary())
+        self.SetStatusText(self.stats.summary())
+        # Set here, the canvas is only touched on the UI thread
+        self.canvas.set_overlay(self.overlay)
         self.select_plot_mode()
-        self.unmask_map(self.map_data, self.buttons)
+        self.unmask_map()
         self.highlight_path()
+    def on_search_error(self, error):
+        self.worker = None
+        self.cancel_btn.Disable()
+        self.SetStatusText(f"Search failed: {error}")
+    def stop_solving(self, status=""):
+        if self.worker is not None:
+            # Not joined, the UI would freeze until the search reaches its next
+            # progress check. What it posts from now on is dropped, and the
+            # next solve waits for it on its own thread
+            self.worker.cancel()
+            self.stopping, self.worker = self.worker, None
+        self.cancel_btn.Disable()
+        self.SetStatusText(status)
 
     """USER ACTIONS UTILS"""
     def handle_masked_click(self, i, j):
-        if abs(i - self.current_position[0]) + abs(j - self.current_position[1]) == 1 and self.map_data[i][j][1] not in ['I', 'V']:
-            terrain_value, _ = self.map_data[i][j]
-            terrain_name = [name for name, attributes in TERRAINS.items(
-            ) if attributes["value"] == terrain_value][0]
-            move_cost = CHARACTERS[self.selected_character][terrain_name]
-            if move_cost < 1000:  # Ensure the character can move through the terrain
+        if abs(i - self.current_position[0]) + abs(j - self.current_position[1]) == 1 and self.get_cell_value(i, j) not in ['I', 'V']:
+            move_cost = self.get_cell_cost(i, j)
+            if move_cost < IMPASSABLE:  # Ensure the character can move through the terrain
                 self.total_cost += move_cost
                 self.path.append((i, j))
-                if self.map_data[i][j][1] == 'X':
+                if self.get_cell_value(i, j) == 'X':
                     self.handle_game_over()
                 else:
                     self.handle_valid_move(i, j)
                     self.current_position = (i, j)
                     self.unmask_surroundings(i, j)
                     self.Refresh()
-    def handle_unmasked_click(self, i, j, event):
-        current_terrain, current_state = self.map_data[i][j]
+    def handle_unmasked_click(self, i, j):
         dlg = wx.SingleChoiceDialog(self, 'Set the cell value:', 'Edit Cell', [
                                     "Initial Point", "Target"])
         if dlg.ShowModal() == wx.ID_OK:
             new_state = CELL_STATES[dlg.GetStringSelection()]
-            self.map_data[i][j] = (current_terrain, new_state)
-            event.GetEventObject().SetLabel(new_state)
+            self.grid.set_state(i, j, new_state)
+            self.canvas.refresh_cell(i, j)
             if dlg.GetStringSelection() == "Initial Point":
                 self.initialPoint = (i, j)
             elif dlg.GetStringSelection() == "Target":
@@ -155,7 +267,7 @@ class MapApp(wx.Frame):
         dlg.Destroy()
 
     def handle_game_over(self):
-        print("Final path taken: ", self.path)
+        self.stats.emit(SUMMARY, "Final path taken: %s", self.path)
         dlg = wx.MessageDialog(
             self, f'You have reached the end of the game! Total cost: {self.total_cost}', 'Game Over', wx.OK)
         dlg.ShowModal()
@@ -163,11 +275,10 @@ class MapApp(wx.Frame):
 
     def handle_valid_move(self, i, j):
         if self.check_if_decision(i, j):
-            self.map_data[i][j] = (self.map_data[i][j][0], 'O')
-            self.buttons[i][j].SetLabel('O')
+            self.grid.set_state(i, j, 'O')
         else:
-            self.map_data[i][j] = (self.map_data[i][j][0], 'V')
-            self.buttons[i][j].SetLabel('V')
+            self.grid.set_state(i, j, 'V')
+        self.canvas.refresh_cell(i, j)
     def select_direction_priority(self):
         for i in range(4):
             text = f'Choose direction #{str(i + 1)}'
@@ -180,339 +291,320 @@ class MapApp(wx.Frame):
                 self, text, 'Direction Selection', available)
             if dlg.ShowModal() == wx.ID_OK:
                 selected_letter = str(dlg.GetStringSelection())
-                print(selected_letter)
+                self.stats.emit(STEP, "Direction #%d: %s", i + 1, selected_letter)
                 self.DIRECTIONS.append(DIRECTION_OF_LETTER[selected_letter])
             dlg.Destroy()  
     def auto_solve(self, _):
         # Prompt the user to select to solve either by DFS or BFS
         dlg = wx.SingleChoiceDialog(
-            self, 'Choose your algorithm:', 'Algorithm Selection', ["DFS", "BFS", "Iterative DFS", "A*"])
+            self, 'Choose your algorithm:', 'Algorithm Selection', ["DFS", "BFS", "Iterative DFS", "A*", "Incremental A*", "Hierarchical A*", "Bidirectional BFS", "Bidirectional A*", "Iterative Deepening DFS", "IDA*"])
         if dlg.ShowModal() == wx.ID_OK:
             selected_algorithm = dlg.GetStringSelection()
-            print(selected_algorithm)
+            self.stats.emit(STEP, "Algorithm: %s", selected_algorithm)
             self.solve(selected_algorithm)
         dlg.Destroy()
+    def sweep_orders(self, _):
+        # Runs the search once per direction order instead of asking for one
+        dlg = wx.SingleChoiceDialog(self, 'Choose the algorithm to sweep:', 'Direction Sweep', list(SOLVERS))
+        if dlg.ShowModal() == wx.ID_OK:
+            algorithm = dlg.GetStringSelection()
+            self.stats.emit(STEP, "Sweep: %s", algorithm)
+            self.stop_solving()
+            self.stop_playback()
+            costs = self.cost_matrices.get(self.selected_character)
+            if not self.reachability.reachable(self.selected_character, self.current_position, self.finalPoint):
+                # Checked here, the worker would race the edits of the map
+                self.SetStatusText(f"{algorithm}: the target can't be reached, no order to sweep")
+                dlg.Destroy()
+                return
+            self.worker = SolveWorker(
+                lambda progress: sweep(costs, self.grid.width, self.grid.height, self.selected_character, algorithm,
+                                       self.current_position, self.finalPoint, progress=progress),
+                lambda results: self.on_sweep_done(algorithm, results),
+                on_progress=lambda done: self.SetStatusText(f"{algorithm}: {done} of {len(ORDERS)} orders done"),
+                on_error=self.on_search_error,
+                post=wx.CallAfter,
+                after=self.stopping)
+            self.cancel_btn.Enable()
+            self.SetStatusText(f"{algorithm}: sweeping {len(ORDERS)} direction orders...")
+            self.worker.start()
+        dlg.Destroy()
+    def on_sweep_done(self, algorithm, results):
+        self.worker = None
+        self.cancel_btn.Disable()
+        table = format_table(results)
+        for line in table:
+            self.stats.emit(SUMMARY, "%s", line)
+        best = results[0]
+        self.SetStatusText(f"{algorithm}: best order {best['order']}, cost {best['cost']}, {best['expanded']} cells expanded")
+        wx.MessageBox("\n".join(table), f"{algorithm} by direction order")
     def start_masking(self):
         self.masked = True
-        for i, row in enumerate(self.map_data):
-            for j, cell in enumerate(row):
-                _, state = cell
-                if state != 'I':
-                    self.buttons[i][j].SetBackgroundColour(MASK_COLOR)
-                    self.buttons[i][j].SetLabel('')
-                else:
-                    self.current_position = (i, j)
-                    self.path.append((i, j))
-                    wx.CallLater(100, self.unmask_surroundings, i, j)
+        self.canvas.mask()
+        for index, state in self.grid.states.items():
+            if state == 'I':
+                i, j = self.grid.position(index)
+                self.canvas.reveal(i, j)
+                self.current_position = (i, j)
+                self.path.append((i, j))
+                wx.CallLater(100, self.unmask_surroundings, i, j)
 
     """MAP VALUES UTILS"""
     def get_terrain_name(self, i, j):
-        terrain_value, _ = self.map_data[i][j]
-        return [
-            name
-            for name, attributes in TERRAINS.items()
-            if attributes["value"] == terrain_value
-        ][0]
+        return TERRAIN_NAME_OF_VALUE[self.grid.get_terrain(i, j)]
     def get_cell_cost(self, i, j):
-        terrain_name = self.get_terrain_name(i, j)
-        return CHARACTERS[self.selected_character][terrain_name]
+        return self.cost_matrices.get(self.selected_character)[self.grid.index(i, j)]
     def get_cell_value(self, i, j):
-        return self.map_data[i][j][1]
+        return self.grid.get_state(i, j)
     def is_valid_cell(self, i, j):
-        return 0 <= i < len(self.map_data) and 0 <= j < len(self.map_data[0])
-    def get_terrain_color(self, terrain):
-        for _, attributes in TERRAINS.items():
-            if attributes["value"] == terrain:
-                return attributes["color"]
-        return wx.Colour(255, 255, 255)  # Default white color
+        return self.grid.is_valid_cell(i, j)
     
     """MAP VISUALIZATION UTILS"""
-    def unmask_map(self, map_data, buttons):
-        for i, row in enumerate(map_data):
-            for j, cell in enumerate(row):
-                terrain, state = cell
-                buttons[i][j].SetBackgroundColour(
-                    self.get_terrain_color(terrain))
-                buttons[i][j].SetLabel(state)
-                buttons[i][j].Refresh()
-                buttons[i][j].Update()
+    def unmask_map(self):
+        self.canvas.unmask()
+        self.canvas.Update()
     def unmask_surroundings(self, i, j):
         directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
         for dx, dy in directions:
             x, y = i + dx, j + dy
             if self.is_valid_cell(x, y):
-                terrain, state = self.map_data[x][y]
-                self.buttons[x][y].SetBackgroundColour(
-                    self.get_terrain_color(terrain))
-                self.buttons[x][y].SetLabel(state)
-                self.buttons[x][y].Refresh()
-                self.buttons[x][y].Update()
+                self.canvas.reveal(x, y)
+        self.canvas.Update()
     
     """SEARCH ALGORITHMS INITIALIZATION"""
     def init_search_root(self):
-        self.visited = set()
-        print('initial position:', self.current_position)
-        print(f"Final point:{self.finalPoint}" )
+        self.solution = SearchPath()
+        self.overlay = None
+        self.stats.emit(STEP, "Initial position: %s, final point: %s", self.current_position, self.finalPoint)
         self.root = TreeNode((self.current_position[0], self.current_position[1], 'I'))
         self.root.other = "Initial Point"
     def solve_bfs(self):
-        self.init_search_root()
-        self.bfs()
-        self.append_actions_to_nodes(self.root)
+        self.solve_headless("BFS", scratch=self.get_scratch())
     def solve_dfs(self):
-        self.init_search_root()
-        self.dfs(self.current_position[0], self.current_position[1], None)
-    
+        self.solve_headless("DFS", scratch=self.get_scratch())
     def solve_iterative_dfs(self):
-        self.init_search_root()
-        self.iterative_dfs()
-        self.append_actions_to_nodes(self.root)
+        self.solve_headless("Iterative DFS", scratch=self.get_scratch())
+    def get_scratch(self):
+        # The labels of the last search read from it, they go blank when the
+        # next search resets it
+        if self.scratch is None or self.scratch.size != self.grid.size:
+            self.scratch = SearchScratch(self.grid.size)
+        return self.scratch
     def solve_a_star(self):
         self.init_search_root()
         self.a_star()
-        self.append_actions_to_nodes(self.root)
+        with self.stats.phase("tree"):
+            self.append_actions_to_nodes(self.root)
+    def solve_incremental_a_star(self):
+        self.init_search_root()
+        self.incremental_a_star()
+        with self.stats.phase("tree"):
+            self.append_actions_to_nodes(self.root)
+    def solve_hierarchical_a_star(self):
+        self.init_search_root()
+        self.hierarchical_a_star()
+        with self.stats.phase("tree"):
+            self.append_actions_to_nodes(self.root)
+    def solve_headless(self, algorithm, **options):
+        self.init_search_root()
+        self.headless_search(algorithm, **options)
+        with self.stats.phase("tree"):
+            self.append_actions_to_nodes(self.root)
 
     """SEARCH ALGORITHM VISUALIZATION UTILS"""
     def select_plot_mode(self):
+        modes = ["Step by step", "Decision by decision", "Export to JSONL and DOT"] if self.root.children else []
+        if self.algorithm in EVENT_SEARCHES:
+            modes.append("Play the search")
+        if not modes:
+            return
         dlg = wx.SingleChoiceDialog(
-            self, 'Choose hot to display the decision tree:', 'tree display mode', ["Step by step", "Decision by decision"])
+            self, 'Choose hot to display the decision tree:', 'tree display mode', modes)
         if dlg.ShowModal() == wx.ID_OK:
             selected_mode = dlg.GetStringSelection()
-            print(selected_mode)
+            self.stats.emit(STEP, "Plot mode: %s", selected_mode)
             if selected_mode == "Decision by decision":
                 self.plot_decision_tree()
+            elif selected_mode == "Export to JSONL and DOT":
+                self.export_tree()
+            elif selected_mode == "Play the search":
+                self.play_search()
             else:
                 self.plot_step_tree()
         dlg.Destroy() 
     def highlight_path(self):
-        def traverse_tree(node):
-            if node.other == "Closed Path":
-                # change cell background color to red
-                self.buttons[node.value[0]][node.value[1]].SetBackgroundColour(wx.Colour(255, 0, 0))
-                return True
-            else:
-                for child in node.children:
-                    if traverse_tree(child):
-                        # change cell background color to red
-                        self.buttons[node.value[0]][node.value[1]].SetBackgroundColour(wx.Colour(255, 0, 0))
-                        return True
-                return False
-        traverse_tree(self.root)
+        for i, j in self.solution.positions:
+            self.canvas.set_color(i, j, (255, 0, 0))
     def plot_decision_tree(self):
-        G = nx.DiGraph()
-
-        def find_decision_maker(node):
-            if len(node.actions) > 1 or node.other == "Closed Path" or len(node.actions) == 0:
-                return node
-            for child in node.children:
-                return find_decision_maker(child)
-        def traverse_tree(node):
-            for child in node.children:
-                next_node = find_decision_maker(child)
-                if next_node is not None:
-                    G.add_edge((node.value, str(node.actions), str(node.actionsExecuted), str(node.other), str(node.cost), str(node.total_cost)), (next_node.value, str(next_node.actions), str(next_node.actionsExecuted), str(next_node.other), str(node.cost), str(node.total_cost) ))
-                    traverse_tree(next_node)
-
-        traverse_tree(self.root)
-
-        pos = hierarchy_pos(G, (self.root.value, str(self.root.actions), str(self.root.actionsExecuted), str(self.root.other), str(self.root.cost), str(self.root.total_cost) ))
-        plt.figure(figsize=(10, 10))
-        labels = {node: f"Position: ({node[0][0]},{node[0][1]}), dirTaken:{node[0][2]}\nActions:{node[1]}\nActionsExecuted:{node[2]}\nOther:{node[3]}.\nCost:{node[4]}.\nH={node[5]}" for node in G.nodes()}
-        nx.draw(G, pos=pos, with_labels=True, labels=labels, node_size=1500, node_color="skyblue", node_shape="s", alpha=0.5, linewidths=40, )
-        plt.title("Decision Tree, decision by decision")
-        plt.show()
-
+        # networkx and matplotlib are only loaded once a tree is plotted
+        from tree_plot import plot_decision_tree
+        plot_decision_tree(self.root)
     def plot_step_tree(self):
-        G = nx.DiGraph()
-
-        def traverse_tree(node):
-            for child in node.children:
-                G.add_edge((node.value, str(node.actions), str(node.actionsExecuted), str(node.other), str(node.cost), str(node.total_cost)), (child.value, str(child.actions), str(child.actionsExecuted), str(child.other), str(child.cost), str(child
-                                                                                                                                                                                                                                                   .total_cost) ))
-                traverse_tree(child)
-
-        traverse_tree(self.root)
-
-        pos = hierarchy_pos(G, (self.root.value, str(self.root.actions), str(self.root.actionsExecuted), str(self.root.other), str(self.root.cost), str(self.root.total_cost) ))
-        plt.figure(figsize=(10, 10))
-        labels = {node: f"Position: ({node[0][0]},{node[0][1]}), dirTaken:{node[0][2]}\nActions:{node[1]}\nActionsExecuted:{node[2]}\nOther:{node[3]}.\nCost:{node[4]}.\nH={node[5]}" for node in G.nodes()}
-        nx.draw(G, pos=pos, with_labels=True, labels=labels, node_size=1500, node_color="skyblue", node_shape="s", alpha=0.5, linewidths=40, )
-        plt.title("Decision Tree step by step")
-        plt.show()
+        from tree_plot import plot_step_tree
+        plot_step_tree(self.root)
+    def play_search(self):
+        # Runs the search again as a stream of events, painting one per frame.
+        # Only the search's own bookkeeping is kept, not the tree, and the
+        # search only advances when the animation asks for the next frame
+        width = self.grid.width
+        costs = self.cost_matrices.get(self.selected_character)
+        heuristics = heuristic_arguments(self.algorithm, self.selected_character, width, self.current_position, self.finalPoint)
+        stats = SearchStats(self.trace)
+        events = EVENT_SEARCHES[self.algorithm](costs, width, self.grid.height, self.current_position, self.finalPoint,
+                                                self.DIRECTIONS, stats=stats, **heuristics)
+        frames = ((*event.position, PLAYBACK_COLORS[event.kind],
+                   f"{event.cost}" if event.kind == PUSH else f"O({event.cost})")
+                  for event in events)
+        self.pause_btn.SetLabel("Pause")
+        self.pause_btn.Enable()
+        self.animation.play(frames, on_finished=lambda: self.on_playback_finished(stats))
+    def on_playback_finished(self, stats):
+        self.pause_btn.Disable()
+        self.SetStatusText(f"Replayed {self.algorithm}: {stats.expanded} expanded, {stats.pushes} pushes")
+        self.highlight_path()
+    def on_pause(self, _):
+        if self.animation.is_paused():
+            self.animation.resume()
+            self.pause_btn.SetLabel("Pause")
+        else:
+            self.animation.pause()
+            self.pause_btn.SetLabel("Resume")
+    def stop_playback(self):
+        self.animation.stop()
+        self.pause_btn.Disable()
+    def export_tree(self):
+        dlg = wx.FileDialog(self, 'Export the search tree as', defaultFile='search_tree',
+                            style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT)
+        if dlg.ShowModal() == wx.ID_OK:
+            base = os.path.splitext(dlg.GetPath())[0]
+            written = write_tree_jsonl(self.root, base + ".jsonl")
+            write_tree_dot(self.root, base + ".dot")
+            self.SetStatusText(f"Exported {written} nodes to {base}.jsonl and {base}.dot")
+        dlg.Destroy()
 
     
     """SEARCH ALGORITHMS UTILS"""
-    def manhattan_distance_to_end(self, node):
-        return (abs(node.value[0] - self.finalPoint[0]) + abs(node.value[1] - self.finalPoint[1]))
-    def label_current_cell_as_visited(self, i, j, node, visited=True):
-        if(visited == True):
-            if self.get_cell_value(i, j) == 'I':
-                self.map_data[i][j] = (self.map_data[i][j][0], f"I({node.cost},{node.total_cost})")
-            elif self.get_cell_value(i, j) == 'X':
-                self.map_data[i][j] = (self.map_data[i][j][0], f"X({node.cost},{node.total_cost})")
-            elif len(node.actions) > 1:
-                self.map_data[i][j] = (self.map_data[i][j][0], f"O({node.cost},{node.total_cost})")
-            else:
-                self.map_data[i][j] = (self.map_data[i][j][0], f"O({node.cost},{node.total_cost})")
-        else:
-            self.map_data[i][j] = (self.map_data[i][j][0], f"{node.cost},{node.total_cost}")
-    def label_not_closed(self, queue):
-        print("Not closed:")
-        while queue:
-            current_node = heapq.heappop(queue)[1]
-            x, y = current_node.value[:2]
-            if (x, y) in self.visited:
-                continue
-            self.visited.add((x, y))
-            print(f"nodo: {current_node.value}, cost: {current_node.cost}, distance:{self.manhattan_distance_to_end(current_node)}. H={self.manhattan_distance_to_end(current_node) + current_node.cost}")
-            self.label_current_cell_as_visited(x, y, current_node, visited=False)
-            
-    def direction_taken(self, i, j, parent_node):
-        if parent_node is None:
-            return 'I'
-        parent_i = int(parent_node.value[0])
-        parent_j = int(parent_node.value[1])
-        if i == parent_i and j == parent_j + 1:
-            return 'R'
-        elif i == parent_i + 1 and j == parent_j:
-            return 'D'
-        elif i == parent_i and j == parent_j - 1:
-            return 'L'
-        elif i == parent_i - 1 and j == parent_j:
-            return 'U'
-        return None
-    def possible_move(self, i, j, x, y):
-        if x == i and y == j + 1:
-            return 'R'
-        elif x == i + 1 and y == j:
-            return 'D'
-        elif x == i and y == j - 1:
-            return 'L'
-        elif x == i - 1 and y == j:
-            return 'U'
-        return None
+    def search_labels(self, g, heuristic=None, closed=None):
+        # Canvas overlay labelling the cells reached by a search, a label is
+        # only formatted when its cell is drawn. Cells outside closed, when
+        # given, are labelled as not closed
+        states = self.grid.states
+        def label(index):
+            cost = g.get(index, INFINITY)
+            if cost == INFINITY:
+                # Not reached, or waiting for an LPA* repair
+                return ""
+            total_cost = cost + heuristic(index) if heuristic else cost
+            if closed is not None and index not in closed:
+                return f"{cost},{total_cost}"
+            state = states.get(index, "")
+            return f"{state if state in ('I', 'X') else 'O'}({cost},{total_cost})"
+        return label
+    def show_search(self, cost, parent, g, heuristic=None, closed=None):
+        # Keeps the path to the target and the labels of a search that left
+        # parent links behind, and only builds the tree when it's wanted
+        width = self.grid.width
+        end_index = self.grid.index(*self.finalPoint)
+        if cost != -1:
+            self.solution = SearchPath.from_parents(parent, g, end_index, width)
+        if self.build_tree:
+            with self.stats.phase("tree"):
+                nodes = attach_search_tree(self.root, parent, g, width, heuristic)
+            if cost != -1:
+                nodes[end_index].other = "Closed Path"
+        self.overlay = self.search_labels(g, heuristic, closed)
+        return cost != -1
     def append_actions_to_nodes(self, node):
-        if node is None:
-            return
-        for child in node.children:
-            if child is not None and self.map_data[child.value[0]][child.value[1]][1] == 'V' or self.map_data[child.value[0]][child.value[1]][1] == 'O':
-                node.actionsExecuted.append(child.value[2])
-            self.append_actions_to_nodes(child)
-    
-    """ SEARCH ALGORITHMS IMPLEMENTATIONS """
-    def bfs(self):
-        queue = [self.root]
-        while queue:
-            current_node = queue.pop(0)
-            x, y = current_node.value[:2]
-            self.visited.add((x, y))
-
-            if self.get_cell_value(x, y) == 'X':
-                current_node.other = "Closed Path"
-                self.label_current_cell_as_visited(x, y, current_node)
-                return True
-
-            for dx, dy in self.DIRECTIONS:
-                new_x, new_y = x + dx, y + dy
-                if self.is_valid_cell(new_x, new_y) and (new_x, new_y) not in self.visited and self.get_cell_cost(new_x, new_y) < 1000:
-                    action = self.possible_move(x, y, new_x, new_y)
-                    current_node.actions.append(action)
-                    node = TreeNode((new_x, new_y, self.direction_taken(new_x, new_y, current_node)))
-                    node.total_cost = current_node.total_cost + self.get_cell_cost(new_x, new_y)
-                    queue.append(node)
-                    current_node.add_child(node)
-                    self.visited.add((new_x, new_y))
-
-            self.label_current_cell_as_visited(x, y, current_node)
-    def dfs(self, i, j, parent_node):
-        
-        current_node = TreeNode((i, j, self.direction_taken(i,j,parent_node) )) if parent_node else self.root
-        if parent_node:
-            current_node.total_cost = parent_node.total_cost + self.get_cell_cost(i, j)
-        
-        if parent_node:
-            print('parent:', parent_node.value, 'current:', current_node.value)
-            parent_node.add_child(current_node)
-        
-        if self.get_cell_value(i, j) == 'X':
-            current_node.other = "Closed Path"
-            self.label_current_cell_as_visited(x, y, current_node)
-            return True
-
-        self.visited.add((i, j))
-
-        for dx, dy in self.DIRECTIONS:
-            x, y = i + dx, j + dy
-            if self.is_valid_cell(x, y) and (x, y) not in self.visited and self.get_cell_cost(x, y) < 1000:
-                current_node.actions.append(self.possible_move(i,j,x,y))
-        self.label_current_cell_as_visited(i, j, current_node)
-        for dx, dy in self.DIRECTIONS:
-            x, y = i + dx, j + dy
-            if self.is_valid_cell(x, y) and (x, y) not in self.visited and self.get_cell_cost(x, y) < 1000:
-                current_node.actionsExecuted.append(self.possible_move(i,j,x,y))
-                if self.dfs(x, y, current_node):
-                    return True
-        return False
-    def iterative_dfs(self):
-        stack = [self.root]
+        # Explicit stack, deep trees would hit the recursion limit
+        stack = [node] if node is not None else []
         while stack:
-            current_node = stack.pop()
-            x, y = current_node.value[:2]
-            self.visited.add((x, y))
-
-            if self.get_cell_value(x, y) == 'X':
-                current_node.other = "Closed Path"
-                self.label_current_cell_as_visited(x, y, current_node)
-                return True
-
-            for dx, dy in self.DIRECTIONS:
-                new_x, new_y = x + dx, y + dy
-                if self.is_valid_cell(new_x, new_y) and (new_x, new_y) not in self.visited and self.get_cell_cost(new_x, new_y) < 1000:
-                    action = self.possible_move(x, y, new_x, new_y)
-                    current_node.actions.append(action)
-                    node = TreeNode((new_x, new_y, self.direction_taken(new_x, new_y, current_node)))
-                    node.total_cost = current_node.total_cost + self.get_cell_cost(new_x, new_y)
-                    stack.append(node)
-                    current_node.add_child(node)
-                    self.visited.add((new_x, new_y))
+            node = stack.pop()
+            for child in node.children:
+                if child is not None and self.get_cell_value(child.value[0], child.value[1]) in ('V', 'O'):
+                    node.actionsExecuted.append(child.value[2])
+            stack.extend(child for child in reversed(node.children) if child is not None)
+    
 
-            self.label_current_cell_as_visited(x, y, current_node)
+    """ SEARCH ALGORITHMS IMPLEMENTATIONS """
     def a_star(self):
-        self.root.total_cost = self.manhattan_distance_to_end(self.root)
-        queue = [(self.root.total_cost, self.root)]
-        heapq.heapify(queue)
-        while queue:
-            current_node = heapq.heappop(queue)[1]
-            x, y = current_node.value[:2]
-            if (x, y) in self.visited:
-                continue
-            self.visited.add((x, y))
-            print(f"nodo: {current_node.value}, cost: {current_node.cost}, distance:{self.manhattan_distance_to_end(current_node)}. H={self.manhattan_distance_to_end(current_node) + current_node.cost}")
-            if self.get_cell_value(x, y) == 'X':
-                current_node.other = "Closed Path"
-                self.label_current_cell_as_visited(x, y, current_node)
-                self.label_not_closed(queue)
-                return True
-
-            for dx, dy in self.DIRECTIONS:
-                new_x, new_y = x + dx, y + dy
-                if self.is_valid_cell(new_x, new_y) and (new_x, new_y) not in self.visited and self.get_cell_cost(new_x, new_y) < 1000:
-                    action = self.possible_move(x, y, new_x, new_y)
-                    current_node.actions.append(action)
-                    node = TreeNode((new_x, new_y, self.direction_taken(new_x, new_y, current_node)))
-                    node.cost = current_node.cost + self.get_cell_cost(new_x, new_y)
-                    node.total_cost = node.cost + self.manhattan_distance_to_end(node)
-                    heapq.heappush(queue, (node.total_cost, node))
-                    current_node.add_child(node)
-                    #self.visited.add((new_x, new_y))
-
-            self.label_current_cell_as_visited(x, y, current_node)
-        return False
-
+        width = self.grid.width
+        costs = self.cost_matrices.get(self.selected_character)
+        engine = AStar(costs, width, self.grid.height, self.DIRECTIONS)
+        provider = ScaledManhattan(self.selected_character, width)
+        heuristic = provider.for_target(self.finalPoint)
+        self.stats.emit(STEP, "A* %s: heuristic x%s", self.selected_character, provider.scale)
+        with self.stats.phase("search"):
+            cost = engine.search(self.current_position, self.finalPoint, heuristic, self.progress, self.stats)
+        # What the scale saves against plain Manhattan distance, which is the
+        # same heuristic when the cheapest terrain of the character costs 1
+        expanded = plain = self.stats.expanded
+        if provider.scale != 1:
+            reference = SearchStats()
+            with self.stats.phase("plain Manhattan"):
+                AStar(costs, width, self.grid.height, self.DIRECTIONS).search(
+                    self.current_position, self.finalPoint, None, self.progress, reference)
+            plain = reference.expanded
+        self.stats.notes["heuristic"] = f"x{provider.scale}: {expanded} expanded, {plain} with plain Manhattan"
+
+        self.root.total_cost = heuristic(self.grid.index(*self.current_position))
+        return self.show_search(cost, engine.parent, engine.g, heuristic, engine.closed)
+    def get_planner(self):
+        # Keep the planner, and its repaired state, while the query is the same
+        costs = self.cost_matrices.get(self.selected_character)
+        query = (self.selected_character, tuple(self.DIRECTIONS), self.current_position, self.finalPoint)
+        planner = self.planner
+        if planner is None or planner.costs is not costs or self.planner_query != query:
+            heuristic = ScaledManhattan(self.selected_character, self.grid.width).for_target(self.finalPoint)
+            planner = LPAStar(costs, self.grid.width, self.grid.height, self.current_position, self.finalPoint, heuristic, self.DIRECTIONS)
+            self.planner, self.planner_query = planner, query
+        return planner
+    def incremental_a_star(self):
+        planner = self.get_planner()
+        with self.stats.phase("search"):
+            cost = planner.search(self.progress, self.stats)
+
+        self.root.total_cost = planner.heuristic(planner.start)
+        if self.build_tree:
+            # Sorts every known cell, only when the tree was asked for
+            parent, g = planner.search_tree()
+            return self.show_search(cost, parent, g, planner.heuristic)
+        # A repair only costs the length of the path, whatever the map size
+        path = planner.path()
+        self.solution = SearchPath(path, (planner.g[self.grid.index(i, j)] for i, j in path))
+        self.overlay = self.search_labels(planner.g, planner.heuristic)
+        return cost != -1
+
+    def hierarchical_a_star(self):
+        # Only the refined path is known cell by cell, so the tree is that path
+        hierarchy = self.hierarchies.get(self.selected_character)
+        heuristic = ScaledManhattan(self.selected_character, self.grid.width).for_target(self.finalPoint)
+        with self.stats.phase("search"):
+            cost = hierarchy.search(self.current_position, self.finalPoint, heuristic, self.progress, self.stats)
+
+        self.root.total_cost = heuristic(self.grid.index(*self.current_position))
+        if cost == -1:
+            return False
+        return self.show_search(cost, hierarchy.parent, hierarchy.g, heuristic)
+    def headless_search(self, algorithm, **options):
+        # Runs one of SOLVERS, the tree is what the solver returns: the whole
+        # search for BFS and both DFS, the forward search and the path for the
+        # bidirectional ones, only the path for the deepening ones
+        width = self.grid.width
+        costs = self.cost_matrices.get(self.selected_character)
+        heuristics = heuristic_arguments(algorithm, self.selected_character, width, self.current_position, self.finalPoint)
+        with self.stats.phase("search"):
+            cost, _, _, (parent, g) = SOLVERS[algorithm](costs, width, self.grid.height, self.current_position, self.finalPoint,
+                                                         self.DIRECTIONS, stats=self.stats, progress=self.progress,
+                                                         **heuristics, **options)
+
+        heuristic = heuristics.get("heuristic")
+        self.root.total_cost = heuristic(self.grid.index(*self.current_position)) if heuristic else 0
+        closed = options["scratch"].closed_view(g.cells) if "scratch" in options else None
+        return self.show_search(cost, parent, g, heuristic, closed)
 
 if __name__ == '__main__':
     app = wx.App(False)
-    map_data = read_map_from_file("map_data_field.txt")
-    frame = MapApp(map_data)
+    grid = read_map_from_file("map_data_field.txt")
+    frame = MapApp(grid)
     frame.Show()
     app.MainLoop()
@@ -0,0 +1,209 @@
+from collections import deque
+
+import wx
+
+from constants import MASK_COLOR, TERRAINS
+
+COLOR_OF_TERRAIN_VALUE = {attributes["value"]: attributes["color"] for attributes in TERRAINS.values()}
+DEFAULT_COLOR = (255, 255, 255)
+BACKGROUND_COLOR = (0, 0, 0)
+
+
+class MapCanvas(wx.ScrolledWindow):
+    """
+    One window that draws every cell of a grid.
+
+    A cell shows its terrain color and its state label unless the app set a
+    color or a label for it with set_color and set_label. An overlay, a
+    function(index) returning a label or "", is asked for the label of every
+    drawn cell before its state, so labels of a search can be produced only
+    for the cells on screen. While masked, cells that were not revealed are
+    drawn with MASK_COLOR and no label. Every
+    change only invalidates the rectangle of the cell it touches, and the
+    paint handler only draws the cells inside the invalidated area.
+
+    Clicks are mapped to cells from their coordinates and passed to
+    on_left_click(i, j) and on_right_click(i, j).
+    """
+
+    def __init__(self, parent, grid, on_left_click, on_right_click, cell_size=40, gap=10):
+        super(MapCanvas, self).__init__(parent, style=wx.HSCROLL | wx.VSCROLL)
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.grid = grid
+        self.on_left_click = on_left_click
+        self.on_right_click = on_right_click
+        self.cell_size = cell_size
+        self.pitch = cell_size + gap
+        self.colors = {}
+        self.labels = {}
+        self.overlay = None
+        self.masked = False
+        self.revealed = set()
+        self.brushes = {}
+
+        size = (grid.width * self.pitch - gap, grid.height * self.pitch - gap)
+        self.SetVirtualSize(size)
+        self.SetScrollRate(self.pitch, self.pitch)
+        self.SetInitialSize(wx.Size(min(size[0], 750), min(size[1], 750)))
+
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+        self.Bind(wx.EVT_LEFT_DOWN, lambda event: self.on_click(event, self.on_left_click))
+        self.Bind(wx.EVT_RIGHT_DOWN, lambda event: self.on_click(event, self.on_right_click))
+
+    """CELL CONTENT"""
+    def set_color(self, i, j, color):
+        self.colors[self.grid.index(i, j)] = color
+        self.refresh_cell(i, j)
+    def set_label(self, i, j, label):
+        self.labels[self.grid.index(i, j)] = label
+        self.refresh_cell(i, j)
+    def set_overlay(self, overlay):
+        self.overlay = overlay
+        self.Refresh(eraseBackground=False)
+    def reveal(self, i, j):
+        self.revealed.add(self.grid.index(i, j))
+        self.refresh_cell(i, j)
+    def mask(self):
+        self.masked = True
+        self.revealed = set()
+        self.colors = {}
+        self.labels = {}
+        self.overlay = None
+        self.Refresh(eraseBackground=False)
+    def unmask(self):
+        # Back to terrain colors and state labels everywhere
+        self.masked = False
+        self.revealed = set()
+        self.colors = {}
+        self.labels = {}
+        self.Refresh(eraseBackground=False)
+
+    def cell_color(self, index):
+        if index in self.colors:
+            return self.colors[index]
+        if self.masked and index not in self.revealed:
+            return MASK_COLOR
+        return COLOR_OF_TERRAIN_VALUE.get(chr(self.grid.terrain[index]), DEFAULT_COLOR)
+    def cell_label(self, index):
+        if index in self.labels:
+            return self.labels[index]
+        if self.masked and index not in self.revealed:
+            return ""
+        if self.overlay is not None:
+            label = self.overlay(index)
+            if label:
+                return label
+        return self.grid.states.get(index, "")
+
+    """GEOMETRY"""
+    def cell_rect(self, i, j):
+        x, y = self.CalcScrolledPosition(j * self.pitch, i * self.pitch)
+        return wx.Rect(x, y, self.cell_size, self.cell_size)
+    def cell_at(self, x, y):
+        """
+        :param x: Horizontal position in window coordinates
+        :param y: Vertical position in window coordinates
+        :return: (i, j) of the cell under the point, None on a gap or outside
+        """
+        x, y = self.CalcUnscrolledPosition(x, y)
+        i, offset_i = divmod(y, self.pitch)
+        j, offset_j = divmod(x, self.pitch)
+        if offset_i >= self.cell_size or offset_j >= self.cell_size or not self.grid.is_valid_cell(i, j):
+            return None
+        return i, j
+    def refresh_cell(self, i, j):
+        self.RefreshRect(self.cell_rect(i, j), eraseBackground=False)
+
+    """EVENTS"""
+    def on_click(self, event, handler):
+        cell = self.cell_at(event.GetX(), event.GetY())
+        if cell is not None:
+            handler(*cell)
+    def brush(self, color):
+        if color not in self.brushes:
+            self.brushes[color] = wx.Brush(wx.Colour(*color))
+        return self.brushes[color]
+    def on_paint(self, _):
+        dc = wx.AutoBufferedPaintDC(self)
+        self.DoPrepareDC(dc)
+        box = self.GetUpdateRegion().GetBox()
+        left, top = self.CalcUnscrolledPosition(box.x, box.y)
+        dc.SetPen(wx.TRANSPARENT_PEN)
+        dc.SetBrush(self.brush(BACKGROUND_COLOR))
+        dc.DrawRectangle(left, top, box.width, box.height)
+
+        pitch, cell_size, width = self.pitch, self.cell_size, self.grid.width
+        first_i, first_j = top // pitch, left // pitch
+        last_i = min(self.grid.height - 1, (top + box.height) // pitch)
+        last_j = min(width - 1, (left + box.width) // pitch)
+        for i in range(first_i, last_i + 1):
+            for j in range(first_j, last_j + 1):
+                index = i * width + j
+                rect = wx.Rect(j * pitch, i * pitch, cell_size, cell_size)
+                dc.SetBrush(self.brush(self.cell_color(index)))
+                dc.DrawRectangle(rect)
+                label = self.cell_label(index)
+                if label:
+                    dc.DrawLabel(label, rect, wx.ALIGN_CENTER)
+
+
+class PathAnimation:
+    """
+    Paint cells one at a time from a wx.Timer instead of sleeping on the UI thread.
+
+    Frames are (i, j, color, label) tuples painted on the canvas at the given
+    frame rate. Playing more frames while an animation runs queues them after
+    the current ones. on_finished is called once the queue runs out.
+
+    Frames are only taken from the iterables played when they are painted, so
+    a generator, for example a search followed through search_events, never
+    runs ahead of the animation and stops where the animation is paused.
+    """
+
+    def __init__(self, canvas, frames_per_second=2.5):
+        self.canvas = canvas
+        # Iterators of the frames still to paint, in play order
+        self.frames = deque()
+        self.on_finished = None
+        self.timer = wx.Timer(canvas)
+        canvas.Bind(wx.EVT_TIMER, self.on_timer, self.timer)
+        self.set_frame_rate(frames_per_second)
+
+    def set_frame_rate(self, frames_per_second):
+        self.interval = max(1, int(1000 / frames_per_second))
+        if self.timer.IsRunning():
+            self.timer.Start(self.interval)
+    def play(self, frames, on_finished=None):
+        self.frames.append(iter(frames))
+        self.on_finished = on_finished
+        if not self.timer.IsRunning():
+            self.timer.Start(self.interval)
+    def pause(self):
+        self.timer.Stop()
+    def resume(self):
+        if self.frames and not self.timer.IsRunning():
+            self.timer.Start(self.interval)
+    def stop(self):
+        self.timer.Stop()
+        self.frames.clear()
+        self.on_finished = None
+    def is_running(self):
+        return self.timer.IsRunning()
+    def is_paused(self):
+        return bool(self.frames) and not self.timer.IsRunning()
+
+    def on_timer(self, _):
+        frame = None
+        while self.frames and frame is None:
+            frame = next(self.frames[0], None)
+            if frame is None:
+                self.frames.popleft()
+        if frame is None:
+            on_finished = self.on_finished
+            self.stop()
+            if on_finished is not None:
+                on_finished()
+            return
+        i, j, color, label = frame
+        self.canvas.set_color(i, j, color)
+        self.canvas.set_label(i, j, label)
@@ -0,0 +1,87 @@
+import mmap
+import struct
+
+from grid import Grid
+
+# magic, format version, terrain encoding, height, width, padded to 16 bytes
+HEADER = struct.Struct("<4sBBxxII")
+MAGIC = b"AIMZ"
+FORMAT_VERSION = 1
+# Cells hold the same ASCII digits as the text maps and Grid.terrain
+ENCODING_ASCII_DIGITS = 0
+
+
+def is_binary_map(filename):
+    with open(filename, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def write_binary_map(grid, filename):
+    """
+    Save the terrain of a grid as a header followed by one byte per cell.
+
+    :param grid: Grid to save, states are not stored
+    :param filename: Path of the binary map to write
+    """
+    with open(filename, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, ENCODING_ASCII_DIGITS, grid.height, grid.width))
+        file.write(grid.terrain)
+
+
+def read_binary_map(filename):
+    """
+    Open a binary map without reading its cells.
+
+    The file is memory-mapped read-only and the grid's terrain is a view over
+    the mapping, so pages are only loaded when a search touches them and
+    processes opening the same file share them. Editing the terrain raises.
+
+    :param filename: Path of a map written by write_binary_map
+    :return: Grid backed by the mapped file
+    """
+    with open(filename, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < HEADER.size:
+        raise ValueError(f"{filename} is too short to be a binary map")
+    magic, version, encoding, height, width = HEADER.unpack_from(mapped)
+    if magic != MAGIC:
+        raise ValueError(f"{filename} is not a binary map")
+    if version != FORMAT_VERSION or encoding != ENCODING_ASCII_DIGITS:
+        raise ValueError(f"{filename} uses unsupported format {version} or encoding {encoding}")
+    terrain = memoryview(mapped)[HEADER.size:HEADER.size + height * width]
+    return Grid(height, width, terrain, copy=False)
+
+
+def read_text_map(filename):
+    with open(filename, 'rb') as file:
+        return Grid.from_rows([line.strip() for line in file if line.strip()])
+
+
+def text_to_binary(text_filename, binary_filename):
+    """
+    Convert a map in the map_data*.txt digit format to the binary format.
+    """
+    write_binary_map(read_text_map(text_filename), binary_filename)
+
+
+def binary_to_text(binary_filename, text_filename):
+    """
+    Convert a binary map back to one row of terrain digits per line.
+    """
+    grid = read_binary_map(binary_filename)
+    width = grid.width
+    with open(text_filename, 'wb') as file:
+        for start in range(0, grid.size, width):
+            file.write(grid.terrain[start:start + width])
+            file.write(b"\n")
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) != 3:
+        sys.exit("usage: map_format.py SOURCE DESTINATION (text to binary, or binary to text)")
+    source, destination = sys.argv[1:]
+    if is_binary_map(source):
+        binary_to_text(source, destination)
+    else:
+        text_to_binary(source, destination)
@@ -1,19 +1,31 @@
-from time import sleep
 import wx
-import networkx as nx
-import matplotlib.pyplot as plt
-import heapq
-from networkx.drawing.nx_pydot import graphviz_layout
 
-from constants import TERRAINS, DIRECTIONS, DIRECTION_OF_LETTER, CHARACTERS, MASK_COLOR, CELL_STATES, OBJECTIVES, ROUTES
-from utils import hierarchy_pos, read_map_from_file
-from tree_node import TreeNode
+from constants import TERRAINS, TERRAIN_NAME_OF_VALUE, DIRECTIONS, CELL_STATES, OBJECTIVES, ROUTES
+from cost_matrix import CostMatrixCache
+from map_canvas import MapCanvas, PathAnimation
+from utils import read_map_from_file
+from route_matrix import RouteMatrix
+from search_scratch import SearchScratch
+from hpa_star import HierarchyCache
+from reachability import ReachabilityIndex
+from assignment import best_assignment
+from search_stats import STEP, SUMMARY, SearchStats, trace_from_environment
+from solve_worker import SolveWorker
 
 class MapApp(wx.Frame):
-    def __init__(self, map_data):
+    def __init__(self, grid, frames_per_second=2.5):
         super(MapApp, self).__init__(None, title="Map Editor", size=(800, 600))
-        self.map_data = map_data
+        self.grid = grid
+        self.cost_matrices = CostMatrixCache(grid)
+        self.hierarchies = HierarchyCache(grid, self.cost_matrices)
+        self.reachability = ReachabilityIndex(grid, self.cost_matrices)
         self.initUI()
+        self.animation = PathAnimation(self.canvas, frames_per_second)
+        self.worker = None
+        # Cancelled worker that may still be unwinding, see stop_solving
+        self.stopping = None
+        # Shared by the Dijkstra searches of every solve, see compute_routes
+        self.scratch = None
         self.masked = False
         self.hasInitialPoint = False
         self.hasFinalPoint = False
@@ -29,100 +41,121 @@ class MapApp(wx.Frame):
         self.path_costs = []
         self.path = []
         self.assignation = []
+        self.expansions = {}
+        # Set SEARCH_TRACE, e.g. to "summary", to print the route tables to stderr
+        self.trace = trace_from_environment()
+        self.stats = SearchStats(self.trace)
 
 
     
     """UI INITIALIZATION"""
     def initUI(self):
         panel = wx.Panel(self)
-        # +1 for the finish button
-        grid = wx.GridSizer(len(self.map_data) + 1,
-                            len(self.map_data[0]), 10, 10)
+        sizer = wx.BoxSizer(wx.VERTICAL)
         panel.SetBackgroundColour(wx.Colour(0, 0, 0))
 
-        self.buttons = []
-        for i, row in enumerate(self.map_data):
-            button_row = []
-            for j, cell in enumerate(row):
-                terrain, state = cell
-                btn = wx.Button(panel, label=state, size=(
-                    40, 40), style=wx.BORDER_NONE)
-                btn.SetBackgroundColour(self.get_terrain_color(terrain))
-                btn.Bind(wx.EVT_LEFT_DOWN, lambda event, x=i,
-                         y=j: self.on_left_click(event, x, y))
-                btn.Bind(wx.EVT_RIGHT_DOWN, lambda event, x=i,
-                         y=j: self.on_right_click(event, x, y))
-                grid.Add(btn, 0, wx.EXPAND)
-                button_row.append(btn)
-            self.buttons.append(button_row)
+        # One canvas draws every cell and maps clicks to cells
+        self.canvas = MapCanvas(panel, self.grid, self.on_left_click, self.on_right_click)
+        sizer.Add(self.canvas, 1, wx.EXPAND)
 
+        buttons = wx.BoxSizer(wx.HORIZONTAL)
         # Add the "Finish Editing and Start Playing" button at the bottom
         self.finish_btn = wx.Button(panel, label="Solve")
         self.finish_btn.Bind(wx.EVT_BUTTON, self.solve_game)
-        grid.Add(self.finish_btn, 0, wx.EXPAND)
+        buttons.Add(self.finish_btn, 1, wx.EXPAND)
 
-        panel.SetSizer(grid)
+        # Stops the solve running in the background and the path animation
+        self.cancel_btn = wx.Button(panel, label="Cancel")
+        self.cancel_btn.Bind(wx.EVT_BUTTON, lambda _: self.stop_solving("Cancelled"))
+        buttons.Add(self.cancel_btn, 1, wx.EXPAND)
+        self.cancel_btn.Disable()
+
+        # Answers the routes with HPA*, faster on large maps but not always optimal
+        self.hierarchical_box = wx.CheckBox(panel, label="Hierarchical")
+        buttons.Add(self.hierarchical_box, 0, wx.ALIGN_CENTER_VERTICAL | wx.LEFT, 10)
+        sizer.Add(buttons, 0, wx.EXPAND | wx.TOP, 10)
+
+        self.CreateStatusBar()
+        panel.SetSizer(sizer)
         self.Centre()
 
     
     """GENERIC UTILS"""
 
     """USER ACTIONS HANDLERS"""
-    def on_left_click(self, event, i, j):
-        self.handle_unmasked_click(i, j, event)
-    def on_right_click(self, event, i, j):
+    def on_left_click(self, i, j):
+        self.handle_unmasked_click(i, j)
+    def on_right_click(self, i, j):
         dlg = wx.SingleChoiceDialog(
             self, 'Choose terrain type:', 'Terrain Selection', list(TERRAINS.keys()))
         if dlg.ShowModal() == wx.ID_OK:
             selected_terrain = dlg.GetStringSelection()
-            self.map_data[i][j] = (
-                TERRAINS[selected_terrain]["value"], self.map_data[i][j][1])
-            event.GetEventObject().SetBackgroundColour(
-                TERRAINS[selected_terrain]["color"])
-            self.buttons[i][j].Refresh()
+            if self.worker is not None and self.worker.is_running():
+                # The running solve reads the costs being edited
+                self.stop_solving("Map edited, solve again")
+            self.grid.set_terrain(i, j, TERRAINS[selected_terrain]["value"])
+            self.cost_matrices.update_cell(i, j)
+            if self.stopping is not None and self.stopping.is_running():
+                # The cancelled solve may still be inside them, start afresh
+                self.hierarchies = HierarchyCache(self.grid, self.cost_matrices)
+                self.reachability = ReachabilityIndex(self.grid, self.cost_matrices)
+            else:
+                self.hierarchies.update_cell(i, j)
+                self.reachability.update_cell(i, j)
+            self.canvas.set_color(i, j, TERRAINS[selected_terrain]["color"])
         dlg.Destroy()
     def solve_game(self, _):
+        self.stop_solving()
         self.Refresh()
         self.Update()
         self.DIRECTIONS = DIRECTIONS
         self.solve_a_star()
         #self.highlight_path()
+    def stop_solving(self, status=""):
+        if self.worker is not None:
+            # Not joined, the UI would freeze until the search reaches its next
+            # progress check. What it posts from now on is dropped, and the
+            # next solve waits for it on its own thread
+            self.worker.cancel()
+            self.stopping, self.worker = self.worker, None
+        self.animation.stop()
+        self.cancel_btn.Disable()
+        self.SetStatusText(status)
         
     """USER ACTIONS UTILS"""
-    def handle_unmasked_click(self, i, j, event):
-        current_terrain, current_state = self.map_data[i][j]
+    def handle_unmasked_click(self, i, j):
         dlg = wx.SingleChoiceDialog(self, 'Set the cell value:', 'Edit Cell', [
                                     "Human", "Octopus", "Portal Key", "Dark Temple", "Portal"])
         if dlg.ShowModal() == wx.ID_OK:
             new_state = CELL_STATES[dlg.GetStringSelection()]
             if new_state == "H":
                 if self.is_valid_cell(self.initialHuman[0], self.initialHuman[1]):
-                    self.map_data[self.initialHuman[0]][self.initialHuman[1]] = (self.map_data[self.initialHuman[0]][self.initialHuman[1]][0], "")
-                    self.buttons[self.initialHuman[0]][self.initialHuman[1]].SetLabel("")
+                    self.grid.set_state(self.initialHuman[0], self.initialHuman[1], "")
+                    self.canvas.refresh_cell(self.initialHuman[0], self.initialHuman[1])
                 self.initialHuman = (i, j)
             elif new_state == "O":
                 if self.is_valid_cell(self.initialOctopus[0], self.initialOctopus[1]):
-                    self.map_data[self.initialOctopus[0]][self.initialOctopus[1]] = (self.map_data[self.initialOctopus[0]][self.initialHuman[1]][0], "")
-                    self.buttons[self.initialOctopus[0]][self.initialOctopus[1]].SetLabel("")
+                    self.grid.set_state(self.initialOctopus[0], self.initialOctopus[1], "")
+                    self.canvas.refresh_cell(self.initialOctopus[0], self.initialOctopus[1])
                 self.initialOctopus = (i, j)
             elif new_state == "K":
                 if self.is_valid_cell(self.portalKey[0], self.portalKey[1]):
-                    self.map_data[self.portalKey[0]][self.portalKey[1]] = (self.map_data[self.portalKey[0]][self.initialHuman[1]][0], "")
-                    self.buttons[self.portalKey[0]][self.portalKey[1]].SetLabel("")
+                    self.grid.set_state(self.portalKey[0], self.portalKey[1], "")
+                    self.canvas.refresh_cell(self.portalKey[0], self.portalKey[1])
                 self.portalKey = (i, j)
             elif new_state == "D":
                 if self.is_valid_cell(self.darkTemple[0], self.darkTemple[1]):
-                    self.map_data[self.darkTemple[0]][self.darkTemple[1]] = (self.map_data[self.darkTemple[0]][self.initialHuman[1]][0], "")
-                    self.buttons[self.darkTemple[0]][self.darkTemple[1]].SetLabel("")
+                    self.grid.set_state(self.darkTemple[0], self.darkTemple[1], "")
+                    self.canvas.refresh_cell(self.darkTemple[0], self.darkTemple[1])
                 self.darkTemple = (i, j)
             elif new_state == "P":
                 if self.is_valid_cell(self.portal[0], self.portal[1]):
-                    self.map_data[self.portal[0]][self.portal[1]] = (self.map_data[self.portal[0]][self.initialHuman[1]][0], "")
-                    self.buttons[self.portal[0]][self.portal[1]].SetLabel("")
+                    self.grid.set_state(self.portal[0], self.portal[1], "")
+                    self.canvas.refresh_cell(self.portal[0], self.portal[1])
                 self.portal = (i, j)
                 
-            self.map_data[i][j] = (current_terrain, new_state)
-            event.GetEventObject().SetLabel(new_state)
+            self.grid.set_state(i, j, new_state)
+            self.canvas.refresh_cell(i, j)
         dlg.Destroy()
 
     def handle_game_over(self):
@@ -147,53 +180,77 @@ class MapApp(wx.Frame):
             position = self.portal
         return position
     def get_terrain_name(self, i, j):
-        terrain_value, _ = self.map_data[i][j]
-        return [
-            name
-            for name, attributes in TERRAINS.items()
-            if attributes["value"] == terrain_value
-        ][0]
-    def get_cell_cost(self, i, j):
-        terrain_name = self.get_terrain_name(i, j)
-        return CHARACTERS[self.selected_character][terrain_name]
+        return TERRAIN_NAME_OF_VALUE[self.grid.get_terrain(i, j)]
     def get_cell_value(self, i, j):
-        return self.map_data[i][j][1]
+        return self.grid.get_state(i, j)
     def is_valid_cell(self, i, j):
-        return 0 <= i < len(self.map_data) and 0 <= j < len(self.map_data[0])
-    def get_terrain_color(self, terrain):
-        for _, attributes in TERRAINS.items():
-            if attributes["value"] == terrain:
-                return attributes["color"]
-        return wx.Colour(255, 255, 255)  # Default white color
+        return self.grid.is_valid_cell(i, j)
     
     """SEARCH ALGORITHMS INITIALIZATION"""
-    def init_search_root(self, start):
-        self.visited = set()
-        print('initial position:', start)
-        self.root = TreeNode((start[0], start[1], 'I'))
-        self.root.other = "Initial Point"
     def solve_a_star(self):
         characters = ["Human", "Octopus"]
+        self.routes = []
+        self.stats = SearchStats(self.trace)
         self.do_possible_routes(0)
-        self.route_costs = [[],[]]
-        start = (-1,-1)
-        end = (-1, -1)
-        for i in range(len(characters)):
-            for route in self.routes:
-                start = self.give_position(characters[i], route[0])
-                end = self.give_position(characters[i], route[1])
-                self.clear_visited_cells()
-                self.init_search_root(start)
-                self.finalPoint = end
-                cost = self.a_star(start, end, characters[i])
-                self.route_costs[i].append((route,cost))
+        self.clear_visited_cells()
+        positions = {
+            character: {letter: self.give_position(character, letter) for letter in OBJECTIVES}
+            for character in characters
+        }
+        for character in characters:
+            # Built here so the worker never rebuilds them while the map is edited
+            self.cost_matrices.get(character)
+            self.reachability.get(character)
+        hierarchies = self.hierarchies if self.hierarchical_box.GetValue() else None
+        reachability = self.reachability
+        self.worker = SolveWorker(
+            lambda progress: self.compute_routes(positions, progress, self.stats, hierarchies, reachability),
+            self.on_routes_computed,
+            on_progress=lambda pops: self.SetStatusText(f"Solving... {pops} cells popped"),
+            on_error=self.on_solve_error,
+            post=wx.CallAfter,
+            after=self.stopping)
+        self.cancel_btn.Enable()
+        self.SetStatusText("Solving...")
+        self.worker.start()
+    def compute_routes(self, positions, progress, stats, hierarchies=None, reachability=None):
+        # Runs on the worker thread, only builds new objects and fills the
+        # hierarchy caches, which the UI thread replaces instead of editing
+        # while a cancelled solve may still be running
+        if self.scratch is None or self.scratch.size != self.grid.size:
+            self.scratch = SearchScratch(self.grid.size)
+        route_matrix = RouteMatrix(self.grid, self.cost_matrices, self.DIRECTIONS, hierarchies, reachability,
+                                   self.scratch)
+        with stats.phase("routes"):
+            for character, character_positions in positions.items():
+                route_matrix.add_character(character, character_positions, progress, stats)
+        with stats.phase("assignment"):
+            return route_matrix, self.calc_best_assignation(route_matrix)
+    def on_routes_computed(self, result):
+        characters = ["Human", "Octopus"]
+        self.route_matrix, self.assignation = result
+        self.worker = None
+        self.SetStatusText(self.stats.summary())
+        self.route_costs = [
+            [(route, self.route_matrix.cost(character, route[0], route[1])) for route in self.routes]
+            for character in characters
+        ]
+        self.expansions = self.route_matrix.expansions
         self.print_routes()
+        self.print_expansions()
         self.calc_path_costs()
         self.print_path_costs()
-        self.assignation = self.calc_best_assignation()
-        self.print_assignation()
-        self.highlight_path()
-        self.handle_game_over()
+        if self.assignation[0] is None:
+            self.stats.emit(SUMMARY, "No assignation reaches every objective")
+            self.cancel_btn.Disable()
+            self.handle_game_over()
+        else:
+            self.print_assignation()
+            self.highlight_path()
+    def on_solve_error(self, error):
+        self.worker = None
+        self.cancel_btn.Disable()
+        self.SetStatusText(f"Solve failed: {error}")
 
     """SEARCH ALGORITHM VISUALIZATION UTILS"""
     def highlight_path(self):
@@ -204,155 +261,74 @@ class MapApp(wx.Frame):
         acumulated_cost = 0
         for c in range(len(characters)):
             for i in range(len(paths[c])-1):
-                start = self.give_position(characters[c], paths[c][i])
-                end = self.give_position(characters[c], paths[c][i+1])
-                self.clear_visited_cells()
-                self.init_search_root(start)
-                self.finalPoint = end
-                cost = self.a_star(start, end, characters[c])
+                cost = self.route_matrix.cost(characters[c], paths[c][i], paths[c][i+1])
                 if cost != -1:
-                    self.paint_path(characters[c], i, acumulated_cost)
+                    path = self.route_matrix.path(characters[c], paths[c][i], paths[c][i+1])
+                    self.paint_path(characters[c], i, acumulated_cost, path)
                     acumulated_cost += cost
-    def paint_path(self, character, iteration, acumulated_cost):
-        queue = []
-        def traverse_tree(node):
-            if node.other == "Closed Path":
-                # change cell background color to red
-                if character == "Human":
-                    queue.append((node.value[0], node.value[1], wx.Colour((100+(50*iteration)), 0, 0), "H", node.cost))
-                else:
-                    queue.append((node.value[0], node.value[1], wx.Colour(50+(50*iteration), 50+(50*iteration), 0), "O", node.cost))
-                return True
+        self.animation.play([], on_finished=self.on_animation_finished)
+    def on_animation_finished(self):
+        self.cancel_btn.Disable()
+        self.handle_game_over()
+    def paint_path(self, character, iteration, acumulated_cost, path):
+        # Queued on the animation timer, one cell per frame
+        frames = []
+        for x, y, cost in path:
+            if character == "Human":
+                colour, letter = ((100+(50*iteration)), 0, 0), "H"
             else:
-                for child in node.children:
-                    if traverse_tree(child):
-                        # change cell background color to red
-                        if character == "Human":
-                            queue.append((node.value[0], node.value[1], wx.Colour((100+(50*iteration)), 0, 0), "H", node.cost))
-                        else:
-                            queue.append((node.value[0], node.value[1], wx.Colour(50+(50*iteration), 50+(50*iteration), 0), "O", node.cost))                            
-                        return True
-                return False
-        def paint():
-            queue.reverse()
-            for cell in queue:
-                self.buttons[cell[0]][cell[1]].SetBackgroundColour(cell[2])
-                self.buttons[cell[0]][cell[1]].Refresh()
-                self.buttons[cell[0]][cell[1]].SetLabel(f"{cell[3]}({cell[4]+acumulated_cost})")
-                self.Update()
-                sleep(0.4)
-        traverse_tree(self.root)
-        paint()
+                colour, letter = (50+(50*iteration), 50+(50*iteration), 0), "O"
+            frames.append((x, y, colour, f"{letter}({cost+acumulated_cost})"))
+        self.animation.play(frames)
 
     
     
     """SEARCH ALGORITHMS UTILS"""
     def print_assignation(self):
-        print("\nBest Assignation:")
-        print(f"\tHuman: path {self.assignation[0][0][0]}. cost: {self.assignation[0][0][1]}")
-        print(f"\tOctopus: path {self.assignation[0][1][0]}. cost: {self.assignation[0][1][1]}")
-        print(f"\tTotal cost: {self.assignation[1]}")
-    def calc_best_assignation(self):
-        min_assignation = (None, 1000000)
-        for human_path in self.path_costs[0]:
-            for octopus_path in self.path_costs[1]:
-                if(human_path[1] == -1 or octopus_path[1] == -1):
-                    continue
-                total_cost = human_path[1] + octopus_path[1]
-                if total_cost < min_assignation[1]:
-                    completed = []
-                    for i in range(len(human_path[0])):
-                        if human_path[0][i] not in completed:
-                            completed.append(human_path[0][i])
-                    for i in range(len(octopus_path[0])):
-                        if octopus_path[0][i] not in completed:
-                            completed.append(octopus_path[0][i])
-                    visited_all = True
-                    for point in "IKDP":
-                        if point not in completed:
-                            visited_all = False
-                            break
-                    if visited_all == True:
-                        min_assignation = ((human_path, octopus_path), total_cost)
-        return min_assignation
-                
+        self.stats.emit(SUMMARY, "Best Assignation:")
+        self.stats.emit(SUMMARY, "\tHuman: path %s. cost: %s", *self.assignation[0][0])
+        self.stats.emit(SUMMARY, "\tOctopus: path %s. cost: %s", *self.assignation[0][1])
+        self.stats.emit(SUMMARY, "\tTotal cost: %s", self.assignation[1])
+    def calc_best_assignation(self, route_matrix):
+        characters = ["Human", "Octopus"]
+        objectives = [letter for letter in OBJECTIVES if letter not in ("I", "P")]
+        return best_assignment(characters, objectives, route_matrix.cost, start="I", terminal="P")
+
     def print_path_costs(self):
-        print("\nHuman:")
-        for path in self.path_costs[0]:
-            print(f"\t{path[0]}: {path[1]}")
-        print("Octopus:")
-        for path in self.path_costs[1]:
-            print(f"\t{path[0]}: {path[1]}")
+        for name, path_costs in zip(("Human", "Octopus"), self.path_costs):
+            self.stats.emit(SUMMARY, "%s:", name)
+            for path in path_costs:
+                self.stats.emit(SUMMARY, "\t%s: %s", path[0], path[1])
     def calc_path_costs(self):
+        characters = ["Human", "Octopus"]
         self.path_costs = [[],[]]
         for c in range(2):
             for path in ROUTES:
                 cost = 0
-                start = path[0]
                 for i in range(1, len(path)):
-                    end = path[i]
-                    for route in self.route_costs[c]:
-                        if route[0][0] == start and route[0][1] == end:
-                            if(route[1] == -1):
-                                cost = -1
-                                start = end
-                                break
-                            cost += route[1]
-                            start = end
-                            break
-                    if cost == -1:
+                    route_cost = self.route_matrix.cost(characters[c], path[i-1], path[i])
+                    if route_cost == -1:
+                        cost = -1
                         break
-                   
+                    cost += route_cost
                 self.path_costs[c].append((path,cost))
     def print_routes(self):
-        print("")
-        print("\t", end="")
-        for rout in self.routes:
-            print(f"{rout[0]}->{rout[1]}\t", end="")
-        print("")
-        char_name = 1
-        for character in self.route_costs:
-            if char_name == 1:
-                print(f"H:", end='\t')
-                char_name = 2
-            else:
-                print(f"O:", end='\t')
-            for rout in character:
-                print(f"{rout[1]}", end="\t")
-            print("")
+        # Only formatted when the trace asks for summaries
+        if self.trace is None or not self.trace.enabled(SUMMARY):
+            return
+        self.stats.emit(SUMMARY, "\t" + "\t".join(f"{rout[0]}->{rout[1]}" for rout in self.routes))
+        for letter, character in zip("HO", self.route_costs):
+            self.stats.emit(SUMMARY, f"{letter}:\t" + "\t".join(str(rout[1]) for rout in character))
+    def print_expansions(self):
+        self.stats.emit(SUMMARY, "Expanded cells:")
+        for character, expanded in self.expansions.items():
+            self.stats.emit(SUMMARY, "\t%s: %s", character, expanded)
     def clear_visited_cells(self):
-        for i, row in enumerate(self.map_data):
-            for j, cell in enumerate(row):
-                terrain, state = cell
-                if state == 'V' or state == 'C':
-                    self.map_data[i][j] = (terrain, '')
-                    self.buttons[i][j].SetLabel('')
-    def manhattan_distance_to_end(self, node):
-        return (abs(node.value[0] - self.finalPoint[0]) + abs(node.value[1] - self.finalPoint[1]))
-    def direction_taken(self, i, j, parent_node):
-        if parent_node is None:
-            return 'I'
-        parent_i = int(parent_node.value[0])
-        parent_j = int(parent_node.value[1])
-        if i == parent_i and j == parent_j + 1:
-            return 'R'
-        elif i == parent_i + 1 and j == parent_j:
-            return 'D'
-        elif i == parent_i and j == parent_j - 1:
-            return 'L'
-        elif i == parent_i - 1 and j == parent_j:
-            return 'U'
-        return None
-    def possible_move(self, i, j, x, y):
-        if x == i and y == j + 1:
-            return 'R'
-        elif x == i + 1 and y == j:
-            return 'D'
-        elif x == i and y == j - 1:
-            return 'L'
-        elif x == i - 1 and y == j:
-            return 'U'
-        return None
+        for index, state in list(self.grid.states.items()):
+            if state == 'V' or state == 'C':
+                del self.grid.states[index]
+                i, j = self.grid.position(index)
+                self.canvas.refresh_cell(i, j)
     
     """ SEARCH ALGORITHMS IMPLEMENTATIONS """
     def do_possible_routes(self, start):
@@ -361,39 +337,12 @@ class MapApp(wx.Frame):
             for j in range(1,len(OBJECTIVES)):
                 if i != j and (i,j) not in used:
                     self.routes.append((OBJECTIVES[i], OBJECTIVES[j], -1))
-                    print(f"start: {OBJECTIVES[i]}, end: {OBJECTIVES[j]}")
+                    self.stats.emit(STEP, "start: %s, end: %s", OBJECTIVES[i], OBJECTIVES[j])
                     used.add((i,j))
 
-    def a_star(self, start, end, character):
-        self.selected_character = character
-        self.current_position = start
-        self.root.total_cost = self.manhattan_distance_to_end(self.root)
-        queue = [(self.root.total_cost, self.root)]
-        heapq.heapify(queue)
-        while queue:
-            current_node = heapq.heappop(queue)[1]
-            x, y = current_node.value[:2]
-            self.visited.add((x, y))
-
-            if current_node.value[:2] == end:
-                current_node.other = "Closed Path"
-                return current_node.cost
-
-            for dx, dy in self.DIRECTIONS:
-                new_x, new_y = x + dx, y + dy
-                if self.is_valid_cell(new_x, new_y) and (new_x, new_y) not in self.visited and self.get_cell_cost(new_x, new_y) < 1000:
-                    action = self.possible_move(x, y, new_x, new_y)
-                    current_node.actions.append(action)
-                    node = TreeNode((new_x, new_y, self.direction_taken(new_x, new_y, current_node)))
-                    node.cost = current_node.cost + self.get_cell_cost(new_x, new_y)
-                    node.total_cost = node.cost + self.manhattan_distance_to_end(node)
-                    heapq.heappush(queue, (node.total_cost, node))
-                    current_node.add_child(node)
-        return -1
-
 if __name__ == '__main__':
     app = wx.App(False)
-    map_data = read_map_from_file("map_data_proyecto.txt")
-    frame = MapApp(map_data)
+    grid = read_map_from_file("map_data_proyecto.txt")
+    frame = MapApp(grid)
     frame.Show()
     app.MainLoop()
@@ -0,0 +1,167 @@
+import re
+from array import array
+
+from constants import DIRECTIONS, IMPASSABLE
+
+# Runs of passable cells in a passability mask
+PASSABLE_RUN = re.compile(rb"\x01+")
+
+
+class Components:
+    """
+    Connected components of the cells one character can enter.
+
+    Every cell holds the id of the run of passable cells it was labelled
+    with, -1 if impassable, and runs that touch are merged in a union-find
+    over the run ids, so the component of a cell is the root of its run.
+    """
+
+    def __init__(self, labels, parent, version):
+        self.labels = labels
+        self.parent = parent
+        self.version = version
+
+    def find(self, run):
+        parent = self.parent
+        while parent[run] != run:
+            parent[run] = parent[parent[run]]
+            run = parent[run]
+        return run
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+
+    def component(self, index):
+        """
+        :return: Id of the component of a cell, -1 if the cell is impassable
+        """
+        run = self.labels[index]
+        return -1 if run < 0 else self.find(run)
+
+
+class ReachabilityIndex:
+    """
+    Which cells every character can reach from which, kept next to a
+    CostMatrixCache.
+
+    The components of a character are labelled on first use, one row at a
+    time: the runs of passable cells of a row are found by a regular
+    expression over the passability mask, which the grid's terrain gives with
+    a single bytes.translate, and each run is merged with the runs it touches
+    in the row above. Building is linear in the number of cells and a query
+    is a couple of union-find lookups.
+
+    update_cell keeps the components in step with single-cell terrain edits:
+    a cell that opens joins its neighbours' components in place. A cell that
+    closes can split its component, so unless it had a single passable
+    neighbour the character's components are relabelled on the next query.
+    """
+
+    def __init__(self, grid, cost_matrices, directions=DIRECTIONS):
+        self.grid = grid
+        self.directions = directions
+        self.masks = {name: bytes(1 if cost < IMPASSABLE else 0 for cost in table)
+                      for name, table in cost_matrices.tables.items()}
+        self.components = {}
+
+    def build(self, character):
+        grid = self.grid
+        width = grid.width
+        mask = bytes(grid.terrain).translate(self.masks[character])
+        labels = array('i', [-1]) * grid.size
+        components = Components(labels, array('i'), grid.version)
+        parent = components.parent
+        previous = []
+        for row_start in range(0, grid.size, width):
+            current = []
+            for match in PASSABLE_RUN.finditer(mask, row_start, row_start + width):
+                start, end = match.span()
+                run = len(parent)
+                parent.append(run)
+                labels[start:end] = array('i', [run]) * (end - start)
+                current.append((start - row_start, end - row_start, run))
+            # Both rows are sorted, a run above touches a run below when they overlap
+            above = below = 0
+            while above < len(previous) and below < len(current):
+                above_start, above_end, above_run = previous[above]
+                below_start, below_end, below_run = current[below]
+                if above_start < below_end and below_start < above_end:
+                    components.union(above_run, below_run)
+                if above_end < below_end:
+                    above += 1
+                else:
+                    below += 1
+            previous = current
+        self.components[character] = components
+        return components
+
+    def get(self, character):
+        """
+        Components of a character for the current version of the grid.
+
+        :param character: Name of the character, a key of CHARACTERS
+        :return: Components
+        """
+        components = self.components.get(character)
+        if components is None or components.version != self.grid.version:
+            components = self.build(character)
+        return components
+
+    def reachable(self, character, start, end):
+        """
+        Whether a character can walk from one cell to another.
+
+        The start cell itself doesn't have to be passable, like in the
+        searches, which never pay for entering it.
+
+        :param start: (i, j) position where the walk starts
+        :param end: (i, j) position of the target
+        :return: True if some path links the two cells
+        """
+        grid = self.grid
+        if not (grid.is_valid_cell(*start) and grid.is_valid_cell(*end)):
+            return False
+        if start == end:
+            return True
+        components = self.get(character)
+        target = components.component(grid.index(*end))
+        if target < 0:
+            return False
+        if components.component(grid.index(*start)) == target:
+            return True
+        i, j = start
+        return any(grid.is_valid_cell(i + di, j + dj) and components.component(grid.index(i + di, j + dj)) == target
+                   for di, dj in self.directions)
+
+    def update_cell(self, i, j):
+        """
+        Report a terrain edit of a single cell.
+
+        :param i: Row of the edited cell
+        :param j: Column of the edited cell
+        """
+        grid = self.grid
+        index = grid.index(i, j)
+        for character, components in self.components.items():
+            if components.version != grid.version - 1:
+                # Some other edit was missed, relabelled on the next query
+                continue
+            components.version = grid.version
+            passable = self.masks[character][grid.terrain[index]]
+            was_passable = components.labels[index] >= 0
+            if passable == was_passable:
+                continue
+            neighbours = [grid.index(i + di, j + dj) for di, dj in self.directions
+                          if grid.is_valid_cell(i + di, j + dj) and components.labels[grid.index(i + di, j + dj)] >= 0]
+            if passable:
+                run = len(components.parent)
+                components.parent.append(run)
+                components.labels[index] = run
+                for neighbour in neighbours:
+                    components.union(run, components.labels[neighbour])
+            else:
+                components.labels[index] = -1
+                if len(neighbours) > 1:
+                    components.version = -1
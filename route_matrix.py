@@ -0,0 +1,206 @@
+import heapq
+
+from constants import DIRECTIONS, IMPASSABLE
+from search_path import SearchPath
+from search_scratch import SearchScratch
+from solve_worker import PROGRESS_INTERVAL
+
+
+class Dijkstra:
+    """
+    Single-source Dijkstra that stops once every requested target is settled.
+
+    The g values, parent links and settled flags live in a SearchScratch, so
+    searches run back to back, like RouteMatrix runs one from every objective,
+    start with an epoch increment instead of fresh dictionaries. Engines over
+    grids of the same size can share one scratch as long as they don't search
+    at the same time.
+
+    After a search ``expanded`` is the number of settled cells, ``pushes``,
+    ``pops`` and ``stale_pops`` count heap operations and ``peak_open`` is the
+    largest size the heap reached, like in AStar.
+    """
+
+    def __init__(self, costs, width, height, directions=DIRECTIONS, scratch=None):
+        self.costs = costs
+        self.width = width
+        self.height = height
+        self.directions = directions
+        self.scratch = scratch if scratch is not None else SearchScratch(width * height)
+        self.reset()
+
+    def reset(self):
+        self.scratch.reset()
+        self.expanded = 0
+        self.pushes = 0
+        self.pops = 0
+        self.stale_pops = 0
+        self.peak_open = 0
+
+    def search_targets(self, start, targets, progress=None, stats=None):
+        """
+        Settle cells by increasing cost from start until all targets are settled.
+
+        :param start: (i, j) position where the search starts
+        :param targets: Iterable of (i, j) positions to reach
+        :param progress: Function(pops) called every PROGRESS_INTERVAL pops,
+            it may raise to abandon the search
+        :param stats: SearchStats that receives the counters of the search
+        :return: Dictionary {target: cost of the cheapest path, -1 if unreachable}
+        """
+        self.reset()
+        costs, width, height = self.costs, self.width, self.height
+        scratch = self.scratch
+        g, parent, reached, closed, epoch = scratch.g, scratch.parent, scratch.reached, scratch.closed, scratch.epoch
+        heappush, heappop = heapq.heappush, heapq.heappop
+        trace = stats.node_trace() if stats is not None else None
+
+        targets = set(targets)
+        results = {target: -1 for target in targets}
+        if not (0 <= start[0] < height and 0 <= start[1] < width):
+            return results
+        pending = {target[0] * width + target[1]: target for target in targets
+                   if 0 <= target[0] < height and 0 <= target[1] < width}
+        start_index = start[0] * width + start[1]
+        g[start_index], parent[start_index], reached[start_index] = 0, -1, epoch
+        open_heap = [(0, start_index)]
+        pushes, pops, stale_pops, peak_open, expanded = 1, 0, 0, 1, 0
+
+        while open_heap and pending:
+            if len(open_heap) > peak_open:
+                peak_open = len(open_heap)
+            cost, index = heappop(open_heap)
+            pops += 1
+            if progress is not None and not pops % PROGRESS_INTERVAL:
+                progress(pops)
+            if closed[index] == epoch or cost != g[index]:
+                stale_pops += 1
+                continue
+            closed[index] = epoch
+            expanded += 1
+            if trace is not None:
+                trace("settle %d,%d g=%d open=%d", *divmod(index, width), cost, len(open_heap))
+            if index in pending:
+                results[pending.pop(index)] = cost
+
+            i, j = divmod(index, width)
+            for di, dj in self.directions:
+                x, y = i + di, j + dj
+                if not (0 <= x < height and 0 <= y < width):
+                    continue
+                neighbour = x * width + y
+                step = costs[neighbour]
+                if step >= IMPASSABLE or closed[neighbour] == epoch:
+                    continue
+                new_cost = cost + step
+                if reached[neighbour] != epoch or new_cost < g[neighbour]:
+                    g[neighbour], parent[neighbour], reached[neighbour] = new_cost, index, epoch
+                    heappush(open_heap, (new_cost, neighbour))
+                    pushes += 1
+
+        self.expanded, self.pushes, self.pops, self.stale_pops, self.peak_open = expanded, pushes, pops, stale_pops, peak_open
+        if stats is not None:
+            stats.record(expanded, pushes, pops, stale_pops, peak_open)
+        return results
+
+    def path(self, end):
+        """
+        Cells of the path to a settled target of the last search.
+
+        :param end: (i, j) position of the target
+        :return: SearchPath, empty if the target wasn't settled or is off
+            the map, like the (-1, -1) of an objective that wasn't placed
+        """
+        i, j = end
+        if not (0 <= i < self.height and 0 <= j < self.width):
+            return SearchPath()
+        return self.scratch.path(i * self.width + j, self.width)
+
+
+class RouteMatrix:
+    """
+    Cost and path between every pair of objectives, for every character.
+
+    One Dijkstra runs from each objective of a character and stops when all the
+    other objectives are settled, so the matrix needs one search per objective
+    instead of one per pair. The paths to the objectives are read off each
+    search as soon as it ends, so all the searches share one SearchScratch,
+    which can be the caller's so that successive matrices reuse it too.
+
+    Given a HierarchyCache, every pair is answered by an HPA* query instead,
+    which is much cheaper on large maps at the price of slightly dearer paths.
+
+    Given a ReachabilityIndex, pairs that can't be linked get -1 without being
+    searched for, so a Dijkstra no longer floods the whole component of its
+    source looking for an objective that lies outside it.
+    """
+
+    def __init__(self, grid, cost_matrices, directions=DIRECTIONS, hierarchies=None, reachability=None, scratch=None):
+        self.grid = grid
+        self.cost_matrices = cost_matrices
+        self.directions = directions
+        self.hierarchies = hierarchies
+        self.reachability = reachability
+        self.positions = {}
+        self.costs = {}
+        self.paths = {}
+        self.scratch = scratch
+        self.expansions = {}
+
+    def add_character(self, character, positions, progress=None, stats=None):
+        """
+        Run one Dijkstra from each objective of a character, or one HPA*
+        query per pair of objectives when the matrix has hierarchies.
+
+        :param character: Name of the character, a key of CHARACTERS
+        :param positions: Dictionary {objective letter: (i, j) position}
+        :param progress: Passed to every search, see Dijkstra.search_targets
+        :param stats: SearchStats that receives the counters of every search
+        """
+        costs = self.cost_matrices.get(character)
+        self.positions[character] = positions
+        self.expansions[character] = 0
+        if self.hierarchies is not None:
+            self.add_hierarchical(character, positions, progress, stats)
+            return
+        if self.scratch is None or self.scratch.size != self.grid.size:
+            self.scratch = SearchScratch(self.grid.size)
+        engine = Dijkstra(costs, self.grid.width, self.grid.height, self.directions, self.scratch)
+        for source, start in positions.items():
+            targets = [end for end in positions.values() if self.reachable(character, start, end)]
+            reached = engine.search_targets(start, targets, progress, stats)
+            for target, end in positions.items():
+                self.costs[(character, source, target)] = reached.get(end, -1)
+                self.paths[(character, source, target)] = engine.path(end)
+            self.expansions[character] += engine.expanded
+
+    def add_hierarchical(self, character, positions, progress=None, stats=None):
+        hierarchy = self.hierarchies.get(character)
+        for source, start in positions.items():
+            for target, end in positions.items():
+                if not self.reachable(character, start, end):
+                    self.costs[(character, source, target)] = -1
+                    self.paths[(character, source, target)] = SearchPath()
+                    continue
+                cost = hierarchy.search(start, end, progress=progress, stats=stats)
+                self.costs[(character, source, target)] = cost
+                self.paths[(character, source, target)] = SearchPath.from_parents(
+                    hierarchy.parent, hierarchy.g, self.grid.index(*end), self.grid.width)
+                self.expansions[character] += hierarchy.expanded
+
+    def reachable(self, character, start, end):
+        return self.reachability is None or self.reachability.reachable(character, start, end)
+
+    def cost(self, character, source, target):
+        """
+        :return: Cost of going from one objective to another, -1 if unreachable
+        """
+        return self.costs[(character, source, target)]
+
+    def path(self, character, source, target):
+        """
+        Cells walked from one objective to another.
+
+        :return: SearchPath from source to target, empty if unreachable
+        """
+        return self.paths[(character, source, target)]
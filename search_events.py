@@ -0,0 +1,246 @@
+from collections import deque, namedtuple
+
+from constants import DIRECTIONS, IMPASSABLE
+from search_scratch import SparseScratch
+from solve_worker import PROGRESS_INTERVAL
+
+# Kinds of search events
+PUSH, EXPAND, GOAL = "push", "expand", "goal"
+
+# position and parent are (i, j) positions, parent is None for the start and
+# cost is the cost of the path from the start to position
+SearchEvent = namedtuple("SearchEvent", ["kind", "position", "cost", "parent"])
+
+
+def run(search):
+    """
+    Run a search generator to its end, ignoring the events it yields.
+
+    :param search: Generator of this module, usually created with events=False
+    :return: What the search returned, see bfs_events
+    """
+    while True:
+        try:
+            next(search)
+        except StopIteration as finished:
+            return finished.value
+
+
+def path_from_parents(parent, end_index, width):
+    """
+    Walk parent links back from the target to the start.
+
+    :param parent: Parent index of every reached cell, -1 for the start
+    :param end_index: Flat index of the target
+    :param width: Width of the grid the indexes refer to
+    :return: List of (i, j) positions from start to end
+    """
+    path = [end_index]
+    index = parent[end_index]
+    while index >= 0:
+        path.append(index)
+        index = parent[index]
+    path.reverse()
+    return [divmod(index, width) for index in path]
+
+
+def report(stats, expanded, reached, peak_frontier):
+    # Every reached cell was queued exactly once, the start included
+    if stats is not None:
+        stats.record(expanded, len(reached), expanded, 0, peak_frontier)
+
+
+def start_search(scratch, size, start_index):
+    # Without a scratch of the caller's the search only takes memory for the
+    # cells it reaches, which keeps huge tiled maps searchable
+    if scratch is None:
+        scratch = SparseScratch(size)
+    scratch.reset()
+    scratch.g[start_index], scratch.parent[start_index], scratch.reached[start_index] = 0, -1, scratch.epoch
+    return scratch
+
+
+def bfs_events(costs, width, height, start, end, directions=DIRECTIONS, stats=None, progress=None, scratch=None,
+               events=True):
+    """
+    Breadth-first search as a stream of events, cells are marked visited when
+    they are queued. solvers.bfs and the map app run it with events=False.
+
+    Cells are pushed when they are queued and expanded when they are taken out
+    of the queue. The target is reported by a GOAL event in place of its EXPAND
+    event, after which the generator stops. Nothing runs between two events,
+    so the consumer sets the pace and can stop pulling at any time.
+
+    :param costs: Cost array indexed like a Grid (i * width + j)
+    :param start: (i, j) position where the search starts
+    :param end: (i, j) position of the target
+    :param directions: Order in which neighbours are queued
+    :param stats: SearchStats that receives the counters of the search
+    :param progress: Function(expanded) called every PROGRESS_INTERVAL
+        expanded cells, it may raise to abandon the search
+    :param scratch: SearchScratch of the grid's size the search resets and
+        fills, a SparseScratch of its own if None
+    :param events: Yield a SearchEvent at every step, when False the search
+        runs to its end at the first next()
+    :return: Generator of SearchEvent, it ends without a GOAL event if the
+        target can't be reached. Its return value is the tuple (cost, path,
+        expanded, tree), cost -1 and an empty path if the target can't be
+        reached. tree is a (parent, g) pair of read-only mappings indexed by
+        flat cell index, as attach_search_tree takes them, see
+        SearchScratch.tree. They read from the scratch, so they're only
+        valid until its next reset
+    """
+    start_index, end_index = start[0] * width + start[1], end[0] * width + end[1]
+    scratch = start_search(scratch, width * height, start_index)
+    g, parent, reached, closed, epoch = scratch.g, scratch.parent, scratch.reached, scratch.closed, scratch.epoch
+    cells = [start_index]
+    queue = deque([start_index])
+    expanded = peak = 0
+    trace = stats.node_trace() if stats is not None else None
+    if events:
+        yield SearchEvent(PUSH, start, 0, None)
+    while queue:
+        if len(queue) > peak:
+            peak = len(queue)
+        index = queue.popleft()
+        closed[index] = epoch
+        expanded += 1
+        if progress is not None and not expanded % PROGRESS_INTERVAL:
+            progress(expanded)
+        if trace is not None:
+            trace("expand %d,%d g=%d", *divmod(index, width), g[index])
+        if index == end_index:
+            report(stats, expanded, cells, peak)
+            if events:
+                yield SearchEvent(GOAL, divmod(index, width), g[index], divmod(parent[index], width) if parent[index] >= 0 else None)
+            return g[index], path_from_parents(parent, index, width), expanded, scratch.tree(cells)
+        i, j = position = divmod(index, width)
+        if events:
+            yield SearchEvent(EXPAND, position, g[index], divmod(parent[index], width) if parent[index] >= 0 else None)
+        for di, dj in directions:
+            x, y = i + di, j + dj
+            if 0 <= x < height and 0 <= y < width:
+                neighbour = x * width + y
+                if reached[neighbour] != epoch and costs[neighbour] < IMPASSABLE:
+                    reached[neighbour] = epoch
+                    parent[neighbour] = index
+                    g[neighbour] = g[index] + costs[neighbour]
+                    cells.append(neighbour)
+                    queue.append(neighbour)
+                    if events:
+                        yield SearchEvent(PUSH, (x, y), g[neighbour], position)
+    report(stats, expanded, cells, peak)
+    return -1, [], expanded, scratch.tree(cells)
+
+
+def iterative_dfs_events(costs, width, height, start, end, directions=DIRECTIONS, stats=None, progress=None, scratch=None,
+                         events=True):
+    """
+    Explicit-stack depth-first search as a stream of events, same visiting
+    rules as bfs_events with a stack in place of the queue.
+    solvers.iterative_dfs runs it with events=False.
+
+    :return: Generator of SearchEvent, see bfs_events
+    """
+    start_index, end_index = start[0] * width + start[1], end[0] * width + end[1]
+    scratch = start_search(scratch, width * height, start_index)
+    g, parent, reached, closed, epoch = scratch.g, scratch.parent, scratch.reached, scratch.closed, scratch.epoch
+    cells = [start_index]
+    stack = [start_index]
+    expanded = peak = 0
+    trace = stats.node_trace() if stats is not None else None
+    if events:
+        yield SearchEvent(PUSH, start, 0, None)
+    while stack:
+        if len(stack) > peak:
+            peak = len(stack)
+        index = stack.pop()
+        closed[index] = epoch
+        expanded += 1
+        if progress is not None and not expanded % PROGRESS_INTERVAL:
+            progress(expanded)
+        if trace is not None:
+            trace("expand %d,%d g=%d", *divmod(index, width), g[index])
+        if index == end_index:
+            report(stats, expanded, cells, peak)
+            if events:
+                yield SearchEvent(GOAL, divmod(index, width), g[index], divmod(parent[index], width) if parent[index] >= 0 else None)
+            return g[index], path_from_parents(parent, index, width), expanded, scratch.tree(cells)
+        i, j = position = divmod(index, width)
+        if events:
+            yield SearchEvent(EXPAND, position, g[index], divmod(parent[index], width) if parent[index] >= 0 else None)
+        for di, dj in directions:
+            x, y = i + di, j + dj
+            if 0 <= x < height and 0 <= y < width:
+                neighbour = x * width + y
+                if reached[neighbour] != epoch and costs[neighbour] < IMPASSABLE:
+                    reached[neighbour] = epoch
+                    parent[neighbour] = index
+                    g[neighbour] = g[index] + costs[neighbour]
+                    cells.append(neighbour)
+                    stack.append(neighbour)
+                    if events:
+                        yield SearchEvent(PUSH, (x, y), g[neighbour], position)
+    report(stats, expanded, cells, peak)
+    return -1, [], expanded, scratch.tree(cells)
+
+
+def dfs_events(costs, width, height, start, end, directions=DIRECTIONS, stats=None, progress=None, scratch=None,
+               events=True):
+    """
+    Depth-first search as a stream of events, entering cells in the same order
+    as a recursive depth-first search. solvers.dfs runs it with events=False.
+
+    Each stack frame keeps its own iterator over the directions, so the
+    search goes as deep as the map allows without hitting the recursion limit.
+    Cells are expanded as soon as they are entered, there are no PUSH events.
+
+    :return: Generator of SearchEvent, see bfs_events
+    """
+    start_index, end_index = start[0] * width + start[1], end[0] * width + end[1]
+    scratch = start_search(scratch, width * height, start_index)
+    g, parent, reached, closed, epoch = scratch.g, scratch.parent, scratch.reached, scratch.closed, scratch.epoch
+    closed[start_index] = epoch
+    cells = [start_index]
+    expanded = peak = 1
+    trace = stats.node_trace() if stats is not None else None
+    if start_index == end_index:
+        report(stats, expanded, cells, peak)
+        if events:
+            yield SearchEvent(GOAL, start, 0, None)
+        return 0, [start], expanded, scratch.tree(cells)
+    if events:
+        yield SearchEvent(EXPAND, start, 0, None)
+    stack = [(start_index, iter(directions))]
+    while stack:
+        if len(stack) > peak:
+            peak = len(stack)
+        index, moves = stack[-1]
+        i, j = divmod(index, width)
+        for di, dj in moves:
+            x, y = i + di, j + dj
+            if 0 <= x < height and 0 <= y < width:
+                neighbour = x * width + y
+                if reached[neighbour] != epoch and costs[neighbour] < IMPASSABLE:
+                    reached[neighbour] = closed[neighbour] = epoch
+                    parent[neighbour] = index
+                    g[neighbour] = g[index] + costs[neighbour]
+                    cells.append(neighbour)
+                    expanded += 1
+                    if progress is not None and not expanded % PROGRESS_INTERVAL:
+                        progress(expanded)
+                    if trace is not None:
+                        trace("enter %d,%d g=%d depth=%d", x, y, g[neighbour], len(stack))
+                    if neighbour == end_index:
+                        report(stats, expanded, cells, peak)
+                        if events:
+                            yield SearchEvent(GOAL, (x, y), g[neighbour], (i, j))
+                        return g[neighbour], path_from_parents(parent, neighbour, width), expanded, scratch.tree(cells)
+                    if events:
+                        yield SearchEvent(EXPAND, (x, y), g[neighbour], (i, j))
+                    stack.append((neighbour, iter(directions)))
+                    break
+        else:
+            stack.pop()
+    report(stats, expanded, cells, peak)
+    return -1, [], expanded, scratch.tree(cells)
@@ -0,0 +1,78 @@
+from constants import LETTER_OF_DIRECTION
+
+
+class SearchPath:
+    """
+    Cells walked from the start of a search to its target.
+
+    Built by walking parent links back from the target, so it costs the length
+    of the path whatever the size of the search that found it. Iterating
+    gives (i, j, cost so far) tuples from the start, the start costing 0.
+
+    :param positions: (i, j) positions from start to target, empty if the
+        target wasn't reached
+    :param cumulative: Cost of the path from the start to every position
+    """
+
+    def __init__(self, positions=(), cumulative=()):
+        self.positions = list(positions)
+        self.cumulative = list(cumulative)
+
+    @classmethod
+    def from_parents(cls, parent, g, end_index, width):
+        """
+        :param parent: Dictionary {index: parent index} of every reached cell but the start
+        :param g: Dictionary {index: cost from the start} of every reached cell
+        :param end_index: Flat index of the target, the path is empty if it isn't in g
+        :param width: Width of the grid the indexes refer to
+        """
+        if end_index not in g:
+            return cls()
+        indexes = [end_index]
+        while indexes[-1] in parent:
+            indexes.append(parent[indexes[-1]])
+        indexes.reverse()
+        return cls((divmod(index, width) for index in indexes), (g[index] for index in indexes))
+
+    @classmethod
+    def from_node(cls, node):
+        """
+        Path ending at a TreeNode whose nodes were linked with add_child.
+
+        The cost so far is read from total_cost, which is what the uninformed
+        searches of MapApp fill.
+        """
+        nodes = [node]
+        while nodes[-1].parent is not None:
+            nodes.append(nodes[-1].parent)
+        nodes.reverse()
+        return cls((tuple(node.value[:2]) for node in nodes), (node.total_cost for node in nodes))
+
+    @property
+    def cost(self):
+        """
+        Cost of the whole path, -1 if the target wasn't reached.
+        """
+        return self.cumulative[-1] if self.cumulative else -1
+
+    @property
+    def steps(self):
+        """
+        Cost of entering every cell of the path, 0 for the start.
+        """
+        return [after - before for before, after in zip([0] + self.cumulative, self.cumulative)]
+
+    @property
+    def moves(self):
+        """
+        Direction letters of the path, 'I' for the start like in the search trees.
+        """
+        return ['I'] + [LETTER_OF_DIRECTION[(i - before_i, j - before_j)]
+                        for (before_i, before_j), (i, j) in zip(self.positions, self.positions[1:])]
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        for (i, j), cost in zip(self.positions, self.cumulative):
+            yield i, j, cost
@@ -0,0 +1,142 @@
+from array import array
+from collections.abc import Mapping
+
+from search_path import SearchPath
+
+# Largest epoch the stamp arrays can hold
+MAX_EPOCH = 0xFFFFFFFF
+
+
+class SearchScratch:
+    """
+    Per-cell state of a search, kept in flat arrays reused from one search to
+    the next.
+
+    Every cell has a g value, a parent index and two stamps: the epoch in
+    which it was reached and the one in which it was closed. Entries stamped
+    with an older epoch are leftovers of earlier searches and read as missing,
+    so reset() is an increment of the epoch instead of clearing or allocating
+    per-search dictionaries. Searches read and write the arrays directly.
+
+    :param size: Number of cells, the size of the grid searched
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.g = array('q', bytes(8 * size))
+        self.parent = array('i', bytes(4 * size))
+        self.reached = array('I', bytes(4 * size))
+        self.closed = array('I', bytes(4 * size))
+        self.epoch = 0
+
+    def reset(self):
+        """
+        Forget every cell, in O(1) but once every 2**32 resets.
+        """
+        if self.epoch == MAX_EPOCH:
+            self.reached = array('I', bytes(4 * self.size))
+            self.closed = array('I', bytes(4 * self.size))
+            self.epoch = 0
+        self.epoch += 1
+
+    def cost(self, index):
+        """
+        :return: Best known cost of a cell in the current search, -1 if it wasn't reached
+        """
+        return self.g[index] if self.reached[index] == self.epoch else -1
+
+    def is_closed(self, index):
+        return self.closed[index] == self.epoch
+
+    def path(self, end_index, width):
+        """
+        Path of the current search from its start to a closed cell.
+
+        :param end_index: Flat index of the last cell of the path
+        :param width: Width of the grid the indexes refer to
+        :return: SearchPath, empty if the cell isn't closed
+        """
+        if self.closed[end_index] != self.epoch:
+            return SearchPath()
+        g, parent = self.g, self.parent
+        indexes = [end_index]
+        while parent[indexes[-1]] >= 0:
+            indexes.append(parent[indexes[-1]])
+        indexes.reverse()
+        return SearchPath((divmod(index, width) for index in indexes), (g[index] for index in indexes))
+
+    def tree(self, cells):
+        """
+        Parent links and g values of the current search, as attach_search_tree
+        takes them, without copying them out of the scratch.
+
+        :param cells: Flat indexes of the reached cells, in the order they were
+            reached, which is the order the views iterate in
+        :return: Tuple (parent, g) of ScratchView, the start is left out of parent
+        """
+        return ScratchView(self, self.parent, self.reached, cells), ScratchView(self, self.g, self.reached, cells)
+
+    def closed_view(self, cells):
+        """
+        :param cells: Flat indexes of the reached cells, see tree
+        :return: ScratchView {index: g} of the cells closed in the current search
+        """
+        return ScratchView(self, self.g, self.closed, cells)
+
+
+class Stamps(dict):
+    # Cells never stamped read as epoch 0, which no search uses
+    def __missing__(self, index):
+        return 0
+
+
+class SparseScratch(SearchScratch):
+    """
+    SearchScratch keeping only the cells a search reaches, in dictionaries, for
+    grids too large to allocate flat arrays for. reset() clears them, so its
+    memory follows the size of the last search instead of the size of the grid.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.g, self.parent = {}, {}
+        self.reached, self.closed = Stamps(), Stamps()
+        self.epoch = 1
+
+    def reset(self):
+        self.g.clear()
+        self.parent.clear()
+        self.reached.clear()
+        self.closed.clear()
+        self.epoch += 1
+
+
+class ScratchView(Mapping):
+    """
+    Read-only mapping {index: value} over the cells of the current search of a
+    scratch. A cell is in the view while its stamp is the epoch of the scratch
+    and its value isn't negative, which leaves the start out of the parent
+    links. It reads as empty once the scratch is reset.
+    """
+
+    def __init__(self, scratch, values, stamps, cells):
+        self.scratch = scratch
+        self.values = values
+        self.stamps = stamps
+        self.cells = cells
+        self.epoch = scratch.epoch
+
+    def __contains__(self, index):
+        return (self.epoch == self.scratch.epoch and 0 <= index < self.scratch.size
+                and self.stamps[index] == self.epoch and self.values[index] >= 0)
+
+    def __getitem__(self, index):
+        if index not in self:
+            raise KeyError(index)
+        return self.values[index]
+
+    def __iter__(self):
+        return (index for index in self.cells if index in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Trace levels, from the least to the most detailed
+SUMMARY, STEP, NODE = 1, 2, 3
+TRACE_LEVELS = {"summary": SUMMARY, "step": STEP, "node": NODE}
+
+
+class TraceSink:
+    """
+    Leveled destination for search traces.
+
+    Messages above the sink's level are dropped before they are formatted.
+    NODE messages, one per expanded cell, can also be sampled so only one in
+    ``sample`` is written. Messages are formatted with ``message % args``.
+
+    :param level: Most detailed level written, SUMMARY, STEP or NODE
+    :param sample: Write one NODE message out of this many
+    :param write: Function(line) that outputs a formatted message,
+        a print to stderr when omitted
+    """
+
+    def __init__(self, level=SUMMARY, sample=1, write=None):
+        self.level = level
+        self.sample = max(1, sample)
+        self.write = write or (lambda line: print(line, file=sys.stderr))
+        self.nodes_seen = 0
+
+    def enabled(self, level):
+        return level <= self.level
+
+    def emit(self, level, message, *args):
+        if level > self.level:
+            return
+        if level == NODE:
+            self.nodes_seen += 1
+            if (self.nodes_seen - 1) % self.sample:
+                return
+        self.write(message % args if args else message)
+
+    @classmethod
+    def from_spec(cls, spec, write=None):
+        """
+        Build a sink from a "level" or "level/sample" string, e.g. "node/100".
+
+        :return: TraceSink, None if spec is empty
+        """
+        if not spec:
+            return None
+        level, _, sample = spec.partition("/")
+        if level not in TRACE_LEVELS:
+            raise ValueError(f"Unknown trace level {level!r}, expected one of {', '.join(TRACE_LEVELS)}")
+        return cls(TRACE_LEVELS[level], int(sample) if sample else 1, write)
+
+
+def trace_from_environment(variable="SEARCH_TRACE"):
+    """
+    Sink described by an environment variable, see TraceSink.from_spec.
+
+    :return: TraceSink, None when the variable isn't set
+    """
+    return TraceSink.from_spec(os.environ.get(variable, ""))
+
+
+class SearchStats:
+    """
+    Counters and phase timers that searches report into.
+
+    Engines keep their counters in local variables and record them once the
+    search ends, so passing stats costs nothing per expanded cell. Counters
+    add up over several recorded searches, except peak_frontier which keeps
+    the largest value. Per-cell tracing only happens when the trace sink
+    asks for NODE messages, see node_trace. ``notes`` holds figures a
+    solve adds beside the counters, {name: text}, shown after them.
+
+    :param trace: TraceSink receiving the search messages, None for no trace
+    """
+
+    COUNTERS = ("expanded", "pushes", "pops", "stale_pops")
+
+    def __init__(self, trace=None):
+        self.trace = trace
+        self.expanded = 0
+        self.pushes = 0
+        self.pops = 0
+        self.stale_pops = 0
+        self.peak_frontier = 0
+        self.timings = {}
+        self.notes = {}
+
+    def record(self, expanded=0, pushes=0, pops=0, stale_pops=0, peak_frontier=0):
+        self.expanded += expanded
+        self.pushes += pushes
+        self.pops += pops
+        self.stale_pops += stale_pops
+        if peak_frontier > self.peak_frontier:
+            self.peak_frontier = peak_frontier
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a block of code, the time adds to timings[name].
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - started
+
+    def emit(self, level, message, *args):
+        if self.trace is not None:
+            self.trace.emit(level, message, *args)
+
+    def node_trace(self):
+        """
+        Function(message, *args) for per-cell messages, None when they would
+        be dropped. Searches fetch it once, before their main loop.
+        """
+        if self.trace is None or not self.trace.enabled(NODE):
+            return None
+        return lambda message, *args: self.trace.emit(NODE, message, *args)
+
+    def as_dict(self):
+        counters = {name: getattr(self, name) for name in self.COUNTERS}
+        counters["peak_frontier"] = self.peak_frontier
+        counters["timings"] = dict(self.timings)
+        if self.notes:
+            counters["notes"] = dict(self.notes)
+        return counters
+
+    def summary(self):
+        text = (f"{self.expanded} expanded, {self.pushes} pushes, {self.pops} pops, "
+                f"{self.stale_pops} stale pops, peak frontier {self.peak_frontier}")
+        if self.timings:
+            text += ", " + ", ".join(f"{name} {seconds:.3f} s" for name, seconds in self.timings.items())
+        if self.notes:
+            text += ", " + ", ".join(f"{name} {note}" for name, note in self.notes.items())
+        return text
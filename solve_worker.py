@@ -0,0 +1,75 @@
+import threading
+
+# Searches report progress once every this many expanded cells
+PROGRESS_INTERVAL = 1024
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+class SolveWorker:
+    """
+    Run a solve on a background thread and hand its outcome to the UI thread.
+
+    The solve is called with a progress function that searches call every
+    PROGRESS_INTERVAL expansions. It forwards the count to on_progress and
+    raises SearchCancelled once cancel() was called, which unwinds the search.
+    Every callback goes through post, wx.CallAfter in the apps, so they all
+    run on the UI thread. Progress and results that reach the UI thread after
+    cancel() are dropped, so the apps cancel a worker and forget it without
+    waiting for it to unwind.
+
+    A worker started with after waits on its own thread for that one to end
+    before solving, so a solve never overlaps the cancelled one it replaces.
+    """
+
+    def __init__(self, solve, on_done, on_progress=None, on_cancelled=None, on_error=None, post=None, after=None):
+        self.solve = solve
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.on_cancelled = on_cancelled
+        self.on_error = on_error
+        self.post = post or (lambda function, *args: function(*args))
+        self.after = after
+        self.cancelled = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+    def cancel(self):
+        self.cancelled.set()
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+    def is_running(self):
+        return self.thread.is_alive()
+
+    def progress(self, done):
+        if self.cancelled.is_set():
+            raise SearchCancelled()
+        if self.on_progress is not None:
+            self.post(self.deliver, self.on_progress, done)
+    def deliver(self, function, *args):
+        if not self.cancelled.is_set():
+            function(*args)
+
+    def run(self):
+        if self.after is not None:
+            self.after.join()
+            self.after = None
+        try:
+            result = self.solve(self.progress)
+        except SearchCancelled:
+            if self.on_cancelled is not None:
+                self.post(self.on_cancelled)
+            return
+        except Exception as error:
+            if self.on_error is None:
+                raise
+            self.post(self.deliver, self.on_error, error)
+            return
+        if self.cancelled.is_set():
+            if self.on_cancelled is not None:
+                self.post(self.on_cancelled)
+            return
+        self.post(self.deliver, self.on_done, result)
@@ -0,0 +1,445 @@
+import heapq
+from itertools import count
+
+from a_star import AStar
+from constants import DIRECTIONS, IMPASSABLE
+from heuristics import ScaledManhattan
+from search_events import bfs_events, dfs_events, iterative_dfs_events, report, run
+from search_stats import STEP
+from solve_worker import PROGRESS_INTERVAL
+
+# Cells the deepening searches remember per iteration, about 20 MB of dictionary
+TABLE_SIZE = 1 << 18
+
+
+def bfs(costs, width, height, start, end, directions=DIRECTIONS, stats=None, progress=None, scratch=None):
+    """
+    Breadth-first search, cells are marked visited when they are queued.
+
+    :param costs: Cost array indexed like a Grid (i * width + j)
+    :param start: (i, j) position where the search starts
+    :param end: (i, j) position of the target
+    :param directions: Order in which neighbours are queued
+    :param stats: SearchStats that receives the counters of the search
+    :param progress: Function(expanded) called every PROGRESS_INTERVAL
+        expanded cells, it may raise to abandon the search
+    :param scratch: SearchScratch the search reuses, see search_events.bfs_events
+    :return: Tuple (cost, path, expanded, tree), see search_events.bfs_events
+    """
+    return run(bfs_events(costs, width, height, start, end, directions, stats, progress, scratch, events=False))
+
+
+def iterative_dfs(costs, width, height, start, end, directions=DIRECTIONS, stats=None, progress=None, scratch=None):
+    """
+    Explicit-stack depth-first search, same visiting rules as bfs with a stack.
+
+    :return: Tuple (cost, path, expanded, tree), see bfs
+    """
+    return run(iterative_dfs_events(costs, width, height, start, end, directions, stats, progress, scratch, events=False))
+
+
+def dfs(costs, width, height, start, end, directions=DIRECTIONS, stats=None, progress=None, scratch=None):
+    """
+    Depth-first search entering cells in the same order as a recursive one.
+
+    :return: Tuple (cost, path, expanded, tree), see bfs
+    """
+    return run(dfs_events(costs, width, height, start, end, directions, stats, progress, scratch, events=False))
+
+
+def a_star(costs, width, height, start, end, directions=DIRECTIONS, heuristic=None, stats=None):
+    """
+    A* search, see AStar.search.
+
+    :param heuristic: Function(index) -> estimated cost to the target,
+        Manhattan distance when omitted
+    :return: Tuple (cost, path, expanded, tree), see bfs
+    """
+    engine = AStar(costs, width, height, directions)
+    cost = engine.search(start, end, heuristic, stats=stats)
+    return cost, engine.path(end), len(engine.closed), (engine.parent, engine.g)
+
+
+def a_star_events(costs, width, height, start, end, directions=DIRECTIONS, heuristic=None, stats=None):
+    """
+    A* search as a stream of events, see AStar.search_steps.
+
+    :return: Generator of SearchEvent, see search_events.bfs_events
+    """
+    return AStar(costs, width, height, directions).search_steps(start, end, heuristic, stats=stats)
+
+
+def manhattan(width, end):
+    end_i, end_j = end
+    def heuristic(index):
+        i, j = divmod(index, width)
+        return abs(i - end_i) + abs(j - end_j)
+    return heuristic
+
+
+def join_halves(parent, g, costs, meet, backward_parent):
+    """
+    Rebuild the path found by a bidirectional search.
+
+    The half found from the target is hung under the meeting cell of the
+    forward tree, so parent and g describe a single tree rooted at the start.
+
+    :param parent: Dictionary {index: parent index} of the forward search, completed in place
+    :param g: Dictionary {index: cost from the start} of the forward search, completed in place
+    :param meet: Flat index of the cell where the two searches met
+    :param backward_parent: Dictionary {index: next index towards the target}
+    :return: List of flat indexes from start to target
+    """
+    path = [meet]
+    while path[-1] in parent:
+        path.append(parent[path[-1]])
+    path.reverse()
+    index = meet
+    while index in backward_parent:
+        following = backward_parent[index]
+        parent[following] = index
+        g[following] = g[index] + costs[following]
+        path.append(following)
+        index = following
+    return path
+
+
+def bidirectional_bfs(costs, width, height, start, end, directions=DIRECTIONS, stats=None, progress=None):
+    """
+    Breadth-first search from both ends that stops when the two meet.
+
+    The side with the smaller frontier expands a whole level at a time. Among
+    the cells where that level meets the other side, the one on the path with
+    the fewest steps is kept, so the path has as few steps as the one BFS
+    finds. On open maps each side only covers about half the distance, which
+    is a small fraction of the cells a single BFS reaches.
+
+    :param progress: Function(expanded) called every PROGRESS_INTERVAL
+        expanded cells, it may raise to abandon the search
+    :return: Tuple (cost, path, expanded, tree), see bfs. tree only holds the
+        forward search and the path
+    """
+    start_index, end_index = start[0] * width + start[1], end[0] * width + end[1]
+    parent, g = {}, {start_index: 0}
+    if start_index == end_index:
+        report(stats, 1, g, 1)
+        return 0, [start], 1, (parent, g)
+    if costs[end_index] >= IMPASSABLE:
+        report(stats, 0, g, 1)
+        return -1, [], 0, (parent, g)
+    # Steps from the start and from the target, and the next cell towards the target
+    steps_forward, steps_backward, backward_parent = {start_index: 0}, {end_index: 0}, {}
+    forward, backward = [start_index], [end_index]
+    expanded, peak = 0, 2
+    trace = stats.node_trace() if stats is not None else None
+    best = None
+    while forward and backward and best is None:
+        if len(forward) + len(backward) > peak:
+            peak = len(forward) + len(backward)
+        from_start = len(forward) <= len(backward)
+        level = forward if from_start else backward
+        reached, other = (steps_forward, steps_backward) if from_start else (steps_backward, steps_forward)
+        following = []
+        for index in level:
+            expanded += 1
+            if progress is not None and not expanded % PROGRESS_INTERVAL:
+                progress(expanded)
+            if trace is not None:
+                trace("expand %d,%d %s", *divmod(index, width), "forward" if from_start else "backward")
+            i, j = divmod(index, width)
+            for di, dj in directions:
+                x, y = i + di, j + dj
+                if not (0 <= x < height and 0 <= y < width):
+                    continue
+                neighbour = x * width + y
+                # Walking backwards the neighbour is left, not entered, only the start may be blocked
+                if neighbour in reached or (costs[neighbour] >= IMPASSABLE and neighbour != start_index):
+                    continue
+                reached[neighbour] = reached[index] + 1
+                if from_start:
+                    parent[neighbour] = index
+                    g[neighbour] = g[index] + costs[neighbour]
+                else:
+                    backward_parent[neighbour] = index
+                following.append(neighbour)
+                if neighbour in other:
+                    total = reached[neighbour] + other[neighbour]
+                    if best is None or total < best[0]:
+                        best = (total, neighbour)
+        if from_start:
+            forward = following
+        else:
+            backward = following
+
+    report(stats, expanded, g, peak)
+    if best is None:
+        return -1, [], expanded, (parent, g)
+    path = join_halves(parent, g, costs, best[1], backward_parent)
+    return g[end_index], [divmod(index, width) for index in path], expanded, (parent, g)
+
+
+def bidirectional_a_star(costs, width, height, start, end, directions=DIRECTIONS, heuristic=None, stats=None,
+                         backward_heuristic=None, progress=None):
+    """
+    A* from both ends, stopping once no cheaper meeting is possible.
+
+    Both sides share one potential, half the difference of the estimates to
+    the target and from the start, so a cell's keys on the two sides add up
+    to twice the cost of the best path through it. Each side keeps its own
+    heap and the one with fewer queued cells is expanded next. Every time a
+    side reaches a cell the other side already reached, the cost through that
+    cell is a candidate. Any cheaper path still has a queued cell on each
+    side, so the search stops once the two smallest keys add up to twice the
+    best candidate. Keys are doubled to stay integers.
+
+    :param heuristic: Function(index) -> estimated cost to the target,
+        Manhattan distance when omitted
+    :param backward_heuristic: Function(index) -> estimated cost from the
+        start to the cell, Manhattan distance when omitted. Both estimates
+        must be consistent
+    :param progress: Function(pops) called every PROGRESS_INTERVAL pops,
+        it may raise to abandon the search
+    :return: Tuple (cost, path, expanded, tree), see bfs. tree only holds the
+        forward search and the path
+    """
+    if heuristic is None:
+        heuristic = manhattan(width, end)
+    if backward_heuristic is None:
+        backward_heuristic = manhattan(width, start)
+    start_index, end_index = start[0] * width + start[1], end[0] * width + end[1]
+    parent, g = {}, {start_index: 0}
+    backward_parent, backward_g = {}, {end_index: 0}
+    if costs[end_index] >= IMPASSABLE and start_index != end_index:
+        report(stats, 0, g, 1)
+        return -1, [], 0, (parent, g)
+    potential = lambda index: heuristic(index) - backward_heuristic(index)
+    sequence = count()
+    heappush, heappop = heapq.heappush, heapq.heappop
+    # One (g, parent, closed, heap, sign of the potential) bundle per side
+    sides = (
+        (g, parent, set(), [(potential(start_index), 0, next(sequence), start_index)], 1),
+        (backward_g, backward_parent, set(), [(-potential(end_index), 0, next(sequence), end_index)], -1),
+    )
+    best_cost, meet = (0, start_index) if start_index == end_index else (float("inf"), None)
+    pushes, pops, stale_pops, peak = 2, 0, 0, 2
+    trace = stats.node_trace() if stats is not None else None
+    try:
+        while sides[0][3] and sides[1][3]:
+            if len(sides[0][3]) + len(sides[1][3]) > peak:
+                peak = len(sides[0][3]) + len(sides[1][3])
+            if sides[0][3][0][0] + sides[1][3][0][0] >= 2 * best_cost:
+                break
+            from_start = len(sides[0][3]) <= len(sides[1][3])
+            own_g, own_parent, closed, open_heap, sign = sides[0 if from_start else 1]
+            other_g = sides[1 if from_start else 0][0]
+            _, neg_cost, _, index = heappop(open_heap)
+            pops += 1
+            if progress is not None and not pops % PROGRESS_INTERVAL:
+                progress(pops)
+            cost = -neg_cost
+            if index in closed or cost != own_g[index]:
+                stale_pops += 1
+                continue
+            closed.add(index)
+            if trace is not None:
+                trace("expand %d,%d g=%d %s", *divmod(index, width), cost, "forward" if from_start else "backward")
+            i, j = divmod(index, width)
+            for di, dj in directions:
+                x, y = i + di, j + dj
+                if not (0 <= x < height and 0 <= y < width):
+                    continue
+                neighbour = x * width + y
+                step = costs[neighbour]
+                if neighbour in closed or (step >= IMPASSABLE and not (neighbour == start_index and not from_start)):
+                    continue
+                # Forwards the neighbour is entered, backwards the current cell is
+                new_cost = cost + (step if from_start else costs[index])
+                if new_cost < own_g.get(neighbour, new_cost + 1):
+                    own_g[neighbour] = new_cost
+                    own_parent[neighbour] = index
+                    heappush(open_heap, (2 * new_cost + sign * potential(neighbour), -new_cost, next(sequence), neighbour))
+                    pushes += 1
+                    if neighbour in other_g and new_cost + other_g[neighbour] < best_cost:
+                        best_cost, meet = new_cost + other_g[neighbour], neighbour
+    finally:
+        if stats is not None:
+            stats.record(len(sides[0][2]) + len(sides[1][2]), pushes, pops, stale_pops, peak)
+    expanded = len(sides[0][2]) + len(sides[1][2])
+    if meet is None:
+        return -1, [], expanded, (parent, g)
+    path = join_halves(parent, g, costs, meet, backward_parent)
+    return best_cost, [divmod(index, width) for index in path], expanded, (parent, g)
+
+
+def deepening(costs, width, height, start, end, directions, heuristic, unit_steps, stats, progress, table_size):
+    """
+    Depth-first searches under a growing bound on g + heuristic.
+
+    Each iteration explores every path whose g + heuristic stays under the
+    bound, with an explicit stack of (cell, g, directions left) frames, and
+    the next bound is the smallest value that went over. Only the current
+    path is kept, plus an optional table of the cheapest g each cell was
+    entered with during the iteration: a cell entered again at no lower cost
+    can't lead anywhere new. The table stops growing at table_size cells, so
+    memory stays bounded whatever the map size.
+
+    While the table holds every entered cell it also tells when the target
+    can't be reached: once no move over the bound leads to a cell outside the
+    table, every reachable cell was entered. Without it, an unreachable
+    target is only given up when no path at all goes over the bound.
+
+    :param unit_steps: Count steps instead of terrain costs in g, for
+        iterative deepening on the path length
+    :param table_size: Most cells remembered per iteration, 0 to only keep
+        the current path
+    :return: Tuple (cost, path, expanded, tree), see bfs. tree only holds the path
+    """
+    start_index, end_index = start[0] * width + start[1], end[0] * width + end[1]
+    if start_index == end_index:
+        report(stats, 1, {start_index: 0}, 1)
+        return 0, [start], 1, ({}, {start_index: 0})
+    if costs[end_index] >= IMPASSABLE:
+        report(stats, 0, {}, 0)
+        return -1, [], 0, ({}, {start_index: 0})
+    trace = stats.node_trace() if stats is not None else None
+    bound = heuristic(start_index)
+    expanded = peak = 0
+    found = None
+    while found is None:
+        frames = [(start_index, 0, iter(directions))]
+        on_path = {start_index}
+        seen = {start_index: 0}
+        # Cells only reached over the bound, while complete is still True
+        outside = set()
+        complete = table_size > 0
+        next_bound = None
+        while frames:
+            if len(frames) > peak:
+                peak = len(frames)
+            index, cost, moves = frames[-1]
+            i, j = divmod(index, width)
+            for di, dj in moves:
+                x, y = i + di, j + dj
+                if not (0 <= x < height and 0 <= y < width):
+                    continue
+                neighbour = x * width + y
+                step = costs[neighbour]
+                if step >= IMPASSABLE or neighbour in on_path:
+                    continue
+                new_cost = cost + (1 if unit_steps else step)
+                if seen.get(neighbour, new_cost + 1) <= new_cost:
+                    continue
+                estimate = new_cost + heuristic(neighbour)
+                if estimate > bound:
+                    if next_bound is None or estimate < next_bound:
+                        next_bound = estimate
+                    if complete and neighbour not in seen:
+                        if len(outside) < table_size:
+                            outside.add(neighbour)
+                        else:
+                            complete = False
+                    continue
+                if neighbour in seen or len(seen) < table_size:
+                    seen[neighbour] = new_cost
+                else:
+                    complete = False
+                expanded += 1
+                if progress is not None and not expanded % PROGRESS_INTERVAL:
+                    progress(expanded)
+                if trace is not None:
+                    trace("enter %d,%d g=%d bound=%d", x, y, new_cost, bound)
+                if neighbour == end_index:
+                    found = [frame[0] for frame in frames] + [neighbour]
+                    break
+                frames.append((neighbour, new_cost, iter(directions)))
+                on_path.add(neighbour)
+                break
+            else:
+                frames.pop()
+                on_path.discard(index)
+                continue
+            if found is not None:
+                break
+        if stats is not None:
+            stats.emit(STEP, "bound %d: %d expanded so far", bound, expanded)
+        if found is None:
+            if next_bound is None or (complete and outside.issubset(seen)):
+                # Every reachable cell was entered
+                report(stats, expanded, {start_index: 0}, peak)
+                return -1, [], expanded, ({}, {start_index: 0})
+            bound = next_bound
+
+    parent, g = {}, {start_index: 0}
+    for previous, index in zip(found, found[1:]):
+        parent[index] = previous
+        g[index] = g[previous] + costs[index]
+    report(stats, expanded, g, peak)
+    return g[end_index], [divmod(index, width) for index in found], expanded, (parent, g)
+
+
+def iterative_deepening_dfs(costs, width, height, start, end, directions=DIRECTIONS, stats=None, progress=None,
+                            table_size=TABLE_SIZE):
+    """
+    Depth-limited DFS repeated with a limit growing one step at a time.
+
+    Finds a path with as few steps as BFS's while keeping memory linear in the
+    path length, plus the bounded table of deepening.
+
+    :param progress: Function(expanded) called every PROGRESS_INTERVAL
+        entered cells, it may raise to abandon the search
+    :param table_size: See deepening
+    :return: Tuple (cost, path, expanded, tree), see bfs. tree only holds the path
+    """
+    return deepening(costs, width, height, start, end, directions, lambda index: 0, True, stats, progress, table_size)
+
+
+def ida_star(costs, width, height, start, end, directions=DIRECTIONS, heuristic=None, stats=None, progress=None,
+             table_size=TABLE_SIZE):
+    """
+    Iterative-deepening A*, same costs and result as A* with linear memory.
+
+    :param heuristic: Function(index) -> estimated cost to the target,
+        Manhattan distance when omitted. Must be admissible
+    :param progress: Function(expanded) called every PROGRESS_INTERVAL
+        entered cells, it may raise to abandon the search
+    :param table_size: See deepening
+    :return: Tuple (cost, path, expanded, tree), see bfs. tree only holds the path
+    """
+    if heuristic is None:
+        heuristic = manhattan(width, end)
+    return deepening(costs, width, height, start, end, directions, heuristic, False, stats, progress, table_size)
+
+
+def heuristic_arguments(algorithm, character, width, start, end):
+    """
+    Heuristics an algorithm of SOLVERS takes for a character, as keyword arguments.
+
+    :return: Dictionary, empty for the uninformed searches
+    """
+    provider = ScaledManhattan(character, width)
+    if algorithm in ("A*", "IDA*"):
+        return {"heuristic": provider.for_target(end)}
+    if algorithm == "Bidirectional A*":
+        return {"heuristic": provider.for_target(end), "backward_heuristic": provider.for_target(start)}
+    return {}
+
+
+# Same names as the algorithm chooser of MapApp.auto_solve
+SOLVERS = {
+    "DFS": dfs,
+    "BFS": bfs,
+    "Iterative DFS": iterative_dfs,
+    "A*": a_star,
+    "Bidirectional BFS": bidirectional_bfs,
+    "Bidirectional A*": bidirectional_a_star,
+    "Iterative Deepening DFS": iterative_deepening_dfs,
+    "IDA*": ida_star,
+}
+
+# Searches that can be followed event by event, with the arguments of SOLVERS
+EVENT_SEARCHES = {
+    "DFS": dfs_events,
+    "BFS": bfs_events,
+    "Iterative DFS": iterative_dfs_events,
+    "A*": a_star_events,
+}
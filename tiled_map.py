@@ -0,0 +1,208 @@
+import struct
+from array import array
+from collections import OrderedDict
+
+from constants import CHARACTERS
+from cost_matrix import byte_tables, terrain_cost_table
+
+# magic, format version, terrain encoding, height, width, tile size, padded to 20 bytes
+HEADER = struct.Struct("<4sBBxxIII")
+MAGIC = b"AIMT"
+FORMAT_VERSION = 1
+# Cells hold the same ASCII digits as the text maps and Grid.terrain
+ENCODING_ASCII_DIGITS = 0
+# Cells past the right and bottom edges of the map, impassable for everyone
+PADDING = b"\0"
+
+TILE_SIZE = 256
+# Bytes of decoded tiles kept in memory by default
+MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+def is_tiled_map(filename):
+    with open(filename, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def write_tiled_map(grid, filename, tile_size=TILE_SIZE):
+    """
+    Save the terrain of a grid as a header followed by square tiles.
+
+    Tiles are stored row by row, each one as tile_size rows of tile_size
+    bytes, so loading the neighbourhood of a cell reads one contiguous block.
+    Tiles on the right and bottom edges are padded with impassable cells.
+    The grid is read one band of tile rows at a time, a memory-mapped binary
+    map is never loaded whole.
+
+    :param grid: Grid to save, states are not stored
+    :param filename: Path of the tiled map to write
+    :param tile_size: Side of the tiles, in cells
+    """
+    width, height = grid.width, grid.height
+    tiles_across = -(-width // tile_size)
+    with open(filename, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, ENCODING_ASCII_DIGITS, height, width, tile_size))
+        for band in range(0, height, tile_size):
+            rows = [bytes(grid.terrain[i * width:(i + 1) * width]) + PADDING * (tiles_across * tile_size - width)
+                    for i in range(band, min(band + tile_size, height))]
+            rows += [PADDING * (tiles_across * tile_size)] * (tile_size - len(rows))
+            for tile_j in range(tiles_across):
+                start = tile_j * tile_size
+                file.write(b"".join(row[start:start + tile_size] for row in rows))
+
+
+class TiledCosts:
+    """
+    Cost array of one character over a TiledMap, for the search engines.
+
+    Indexing it like the arrays of CostMatrixCache (i * width + j) loads the
+    tile of the cell through the map's cache. The last tile used is kept at
+    hand, so expanding the neighbours of a cell rarely goes to the cache.
+    ``reused`` counts the cells read from that tile, which the map adds to
+    its cache hits.
+    """
+
+    def __init__(self, world, character):
+        self.world = world
+        self.character = character
+        self.width = world.width
+        self.tile_size = world.tile_size
+        self.tiles_across = world.tiles_across
+        self.key = -1
+        self.tile = None
+        self.reused = 0
+
+    def __len__(self):
+        return self.world.size
+
+    def __getitem__(self, index):
+        i, j = divmod(index, self.width)
+        tile_i, row = divmod(i, self.tile_size)
+        tile_j, column = divmod(j, self.tile_size)
+        key = tile_i * self.tiles_across + tile_j
+        if key != self.key:
+            self.tile = self.world.tile(self.character, key)
+            self.key = key
+        else:
+            self.reused += 1
+        return self.tile[row * self.tile_size + column]
+
+
+class TiledMap:
+    """
+    Read-only map stored as tiles on disk, for maps too large to hold in memory.
+
+    Tiles are read from the file when a search first touches them and decoded
+    into the cost array of the character searching, like CostMatrixCache does
+    for whole grids. Decoded tiles are kept in a least recently used cache
+    that holds as many tiles as memory_budget allows, at two bytes per cell.
+    ``hits``, ``misses`` and ``evictions`` count what the cache did,
+    cache_stats adds the reads the TiledCosts answered from their last tile.
+
+    The map offers the cell validity of a Grid and, through costs, the cost
+    arrays of CostMatrixCache, so the searches of solvers and AStar run on it
+    unchanged.
+
+    :param filename: Path of a map written by write_tiled_map
+    :param memory_budget: Bytes of decoded tiles kept in memory, at least one tile
+    :param characters: Dictionary {name: {terrain name: cost}} of the characters
+    """
+
+    def __init__(self, filename, memory_budget=MEMORY_BUDGET, characters=CHARACTERS):
+        self.file = open(filename, 'rb')
+        header = self.file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            self.file.close()
+            raise ValueError(f"{filename} is too short to be a tiled map")
+        magic, version, encoding, self.height, self.width, self.tile_size = HEADER.unpack(header)
+        if magic != MAGIC:
+            self.file.close()
+            raise ValueError(f"{filename} is not a tiled map")
+        if version != FORMAT_VERSION or encoding != ENCODING_ASCII_DIGITS:
+            self.file.close()
+            raise ValueError(f"{filename} uses unsupported format {version} or encoding {encoding}")
+        self.size = self.height * self.width
+        self.tiles_across = -(-self.width // self.tile_size)
+        self.tile_bytes = self.tile_size * self.tile_size
+        self.capacity = max(1, memory_budget // (2 * self.tile_bytes))
+        self.byte_tables = {name: byte_tables(terrain_cost_table(costs)) for name, costs in characters.items()}
+        self.tiles = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Every TiledCosts handed out, for their reused counts
+        self.views = []
+
+    def close(self):
+        self.file.close()
+    def __enter__(self):
+        return self
+    def __exit__(self, *_):
+        self.close()
+
+    def index(self, i, j):
+        return i * self.width + j
+    def position(self, index):
+        return divmod(index, self.width)
+    def is_valid_cell(self, i, j):
+        return 0 <= i < self.height and 0 <= j < self.width
+
+    def costs(self, character):
+        """
+        Cost array of a character, see TiledCosts.
+
+        :param character: Name of the character, a key of characters
+        """
+        view = TiledCosts(self, character)
+        self.views.append(view)
+        return view
+
+    def tile(self, character, key):
+        """
+        Decoded costs of one tile, from the cache or the file.
+
+        :param character: Name of the character
+        :param key: Tile number, tile_i * tiles_across + tile_j
+        :return: Array of tile_size * tile_size costs, row by row
+        """
+        tiles = self.tiles
+        cached = tiles.get((character, key))
+        if cached is not None:
+            self.hits += 1
+            tiles.move_to_end((character, key))
+            return cached
+        self.misses += 1
+        self.file.seek(HEADER.size + key * self.tile_bytes)
+        terrain = self.file.read(self.tile_bytes)
+        first, second = self.byte_tables[character]
+        cells = bytearray(2 * len(terrain))
+        cells[0::2] = terrain.translate(first)
+        cells[1::2] = terrain.translate(second)
+        decoded = array('H')
+        decoded.frombytes(cells)
+        tiles[(character, key)] = decoded
+        if len(tiles) > self.capacity:
+            tiles.popitem(last=False)
+            self.evictions += 1
+        return decoded
+
+    def cache_stats(self):
+        """
+        :return: Dictionary with the cache counters and hit rate, hits counts
+            the reads answered from the last tile of a TiledCosts too, and
+            last_tile_hits how many of them
+        """
+        reused = sum(view.reused for view in self.views)
+        hits = self.hits + reused
+        lookups = hits + self.misses
+        return {"hits": hits, "last_tile_hits": reused, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "tiles_cached": len(self.tiles), "capacity": self.capacity}
+
+
+if __name__ == '__main__':
+    import sys
+    from utils import read_map_from_file
+    if len(sys.argv) not in (3, 4):
+        sys.exit("usage: tiled_map.py SOURCE DESTINATION [TILE_SIZE] (text or binary map to tiled map)")
+    write_tiled_map(read_map_from_file(sys.argv[1]), sys.argv[2], int(sys.argv[3]) if len(sys.argv) == 4 else TILE_SIZE)
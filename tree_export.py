@@ -0,0 +1,84 @@
+import json
+
+
+def walk_tree(root):
+    """
+    Visit a TreeNode tree depth first without recursion.
+
+    Nodes get increasing ids in the order they are yielded, so a node's parent
+    always comes before it. The stack only holds the pending siblings along
+    the current branch; nothing proportional to the tree size is kept.
+
+    :param root: Root TreeNode
+    :return: Iterator of (id, parent id or None, node) tuples
+    """
+    next_id = 0
+    stack = [(root, None)]
+    while stack:
+        node, parent_id = stack.pop()
+        node_id = next_id
+        next_id += 1
+        yield node_id, parent_id, node
+        # Reversed so children come out in the order they were added
+        for child in reversed(node.children):
+            stack.append((child, node_id))
+
+
+def node_record(node_id, parent_id, node):
+    return {
+        "id": node_id,
+        "parent": parent_id,
+        "position": [node.value[0], node.value[1]],
+        "direction": node.value[2],
+        "actions": node.actions,
+        "actionsExecuted": node.actionsExecuted,
+        "other": node.other,
+        "cost": node.cost,
+        "total_cost": node.total_cost,
+    }
+
+
+def write_tree_jsonl(root, filename):
+    """
+    Stream a search tree to a JSON Lines file, one node per line.
+
+    :param root: Root TreeNode
+    :param filename: Path of the file to write
+    :return: Number of nodes written
+    """
+    written = 0
+    with open(filename, 'w') as file:
+        for node_id, parent_id, node in walk_tree(root):
+            file.write(json.dumps(node_record(node_id, parent_id, node)))
+            file.write("\n")
+            written += 1
+    return written
+
+
+def write_tree_dot(root, filename, name="search_tree"):
+    """
+    Stream a search tree to a Graphviz DOT file.
+
+    Each node is written with its edge from the parent as soon as it is
+    visited, so the file can be rendered with dot or diffed line by line.
+
+    :param root: Root TreeNode
+    :param filename: Path of the file to write
+    :param name: Name of the digraph
+    :return: Number of nodes written
+    """
+    written = 0
+    with open(filename, 'w') as file:
+        file.write(f"digraph {name} {{\n")
+        file.write("    node [shape=box];\n")
+        for node_id, parent_id, node in walk_tree(root):
+            label = f"({node.value[0]},{node.value[1]}) {node.value[2]}\ncost {node.cost}, total {node.total_cost}"
+            if node.other:
+                label += f"\n{node.other}"
+            # JSON string escaping is also valid DOT, newlines become \n
+            file.write(f"    n{node_id} [label={json.dumps(label)}];\n")
+            if parent_id is not None:
+                file.write(f"    n{parent_id} -> n{node_id};\n")
+            written += 1
+        file.write("}\n")
+    return written
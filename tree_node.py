@@ -1,6 +1,9 @@
+from constants import LETTER_OF_DIRECTION
+
 class TreeNode:
     def __init__(self, value):
         self.value = value
+        self.parent = None
         self.children = []
         self.actions = []
         self.actionsExecuted = []
@@ -12,4 +15,31 @@ class TreeNode:
         return self.total_cost < other.total_cost
 
     def add_child(self, child_node):
-        self.children.append(child_node)
\ No newline at end of file
+        child_node.parent = self
+        self.children.append(child_node)
+
+def attach_search_tree(root, parent, g, width, heuristic=None):
+    """
+    Rebuild under root the tree described by the parent links of a search.
+
+    :param root: TreeNode of the start cell
+    :param parent: Dictionary {index: parent index} of every reached cell
+    :param g: Dictionary {index: cost from the start} of every reached cell
+    :param width: Width of the grid the indexes refer to
+    :param heuristic: Function(index) -> estimate added to total_cost, if any
+    :return: Dictionary {index: TreeNode} of the nodes created
+    """
+    nodes = {}
+    for index, parent_index in parent.items():
+        i, j = divmod(index, width)
+        parent_i, parent_j = divmod(parent_index, width)
+        node = TreeNode((i, j, LETTER_OF_DIRECTION[(i - parent_i, j - parent_j)]))
+        node.cost = g[index]
+        node.total_cost = g[index] + heuristic(index) if heuristic else g[index]
+        nodes[index] = node
+    start_index = root.value[0] * width + root.value[1]
+    nodes[start_index] = root
+    for index, parent_index in parent.items():
+        nodes[parent_index].add_child(nodes[index])
+        nodes[parent_index].actions.append(nodes[index].value[2])
+    return nodes
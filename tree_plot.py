@@ -0,0 +1,134 @@
+import networkx as nx
+import matplotlib.pyplot as plt
+
+# Nodes drawn at most in one plot, the rest is folded into summary nodes
+MAX_PLOTTED_NODES = 200
+
+def hierarchy_pos(G, root=None, width=1., vert_gap=1, vert_loc=0, xcenter=0.5):
+    """
+    Compute the positions for nodes in a tree layout.
+
+    Every node splits its horizontal space evenly between its children. The
+    tree is walked with an explicit stack, so deep trees don't hit the
+    recursion limit, and each node is placed once.
+
+    :param G: NetworkX graph or list of nodes
+    :param root: Root node for the tree layout
+    :param width: Horizontal space allocated for the whole tree
+    :param vert_gap: Gap between levels of the tree
+    :param vert_loc: Vertical location of the root
+    :param xcenter: Horizontal location of the root
+    :return: Dictionary of positions {node: (x, y)}
+    """
+
+    directed = isinstance(G, nx.DiGraph)
+    pos = {}
+    stack = [(root, None, width, vert_loc, xcenter)]
+    while stack:
+        node, parent, width, vert_loc, xcenter = stack.pop()
+        pos[node] = (xcenter, vert_loc)
+        children = [child for child in G.neighbors(node) if directed or (child != parent and child not in pos)]
+        if children:
+            dx = width / len(children)
+            nextx = xcenter - width/2 - dx/2
+            for child in children:
+                nextx += dx
+                stack.append((child, node, dx, vert_loc - vert_gap, nextx))
+    return pos
+
+def decision_children(node):
+    """
+    Next decision point under each child of a node.
+
+    Chains of nodes with a single action are skipped, as plot_decision_tree
+    only shows the nodes where the search had to choose.
+    """
+    found = []
+    for child in node.children:
+        while not (len(child.actions) > 1 or child.other == "Closed Path" or len(child.actions) == 0):
+            if not child.children:
+                child = None
+                break
+            child = child.children[0]
+        if child is not None:
+            found.append(child)
+    return found
+
+def step_children(node):
+    return node.children
+
+def budget_tree(root, children_of, max_nodes=MAX_PLOTTED_NODES, max_depth=None):
+    """
+    Pick the nodes to draw, breadth first, and fold the rest into summaries.
+
+    A node keeps its children while the budget allows it; otherwise its
+    subtree is replaced by one summary node holding the number of nodes left
+    out. Each node of the tree is visited at most once.
+
+    :param root: Root TreeNode
+    :param children_of: Function(node) -> children to show under the node
+    :param max_nodes: Most tree nodes drawn, summaries not included
+    :param max_depth: Deepest level drawn, None for no limit
+    :return: Tuple (nodes, edges, summaries): nodes maps an integer id to a
+        TreeNode, edges lists (parent id, child id) pairs and summaries maps
+        the id of a summary node to the number of nodes it stands for
+    """
+    nodes = {0: root}
+    edges = []
+    summaries = {}
+    frontier = [(0, root, 0)]
+    next_id = 1
+    while frontier:
+        following = []
+        for node_id, node, depth in frontier:
+            children = children_of(node)
+            if not children:
+                continue
+            if (max_depth is not None and depth >= max_depth) or len(nodes) + len(children) > max_nodes:
+                summaries[next_id] = count_subtree(children, children_of)
+                edges.append((node_id, next_id))
+                next_id += 1
+                continue
+            for child in children:
+                nodes[next_id] = child
+                edges.append((node_id, next_id))
+                following.append((next_id, child, depth + 1))
+                next_id += 1
+        frontier = following
+    return nodes, edges, summaries
+
+def count_subtree(nodes, children_of):
+    total = 0
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        total += 1
+        stack.extend(children_of(node))
+    return total
+
+def node_label(node):
+    return f"Position: ({node.value[0]},{node.value[1]}), dirTaken:{node.value[2]}\nActions:{node.actions}\nActionsExecuted:{node.actionsExecuted}\nOther:{node.other}.\nCost:{node.cost}.\nH={node.total_cost}"
+
+def plot_tree(root, children_of, title, max_nodes=MAX_PLOTTED_NODES, max_depth=None):
+    nodes, edges, summaries = budget_tree(root, children_of, max_nodes, max_depth)
+    G = nx.DiGraph()
+    G.add_node(0)
+    G.add_edges_from(edges)
+
+    pos = hierarchy_pos(G, 0)
+    plt.figure(figsize=(10, 10))
+    # Labels are only built for the nodes that are drawn
+    labels = {node_id: node_label(node) for node_id, node in nodes.items()}
+    labels.update({node_id: f"+{count} nodes" for node_id, count in summaries.items()})
+    colors = ["lightgray" if node_id in summaries else "skyblue" for node_id in G.nodes()]
+    nx.draw(G, pos=pos, with_labels=True, labels=labels, node_size=1500, node_color=colors, node_shape="s", alpha=0.5, linewidths=40, )
+    if summaries:
+        title += f" ({len(nodes)} nodes shown, {sum(summaries.values())} folded)"
+    plt.title(title)
+    plt.show()
+
+def plot_decision_tree(root, max_nodes=MAX_PLOTTED_NODES, max_depth=None):
+    plot_tree(root, decision_children, "Decision Tree, decision by decision", max_nodes, max_depth)
+
+def plot_step_tree(root, max_nodes=MAX_PLOTTED_NODES, max_depth=None):
+    plot_tree(root, step_children, "Decision Tree step by step", max_nodes, max_depth)